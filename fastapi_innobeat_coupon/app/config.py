@@ -0,0 +1,125 @@
+import os
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    return value.lower() in ("1", "true", "yes", "on") if value else default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+# 환경 변수 기반 애플리케이션 설정
+class Settings:
+    # DB 엔진/커넥션 풀 (워커 프로세스마다 적용)
+    DB_ECHO = _env_bool("DB_ECHO", False)
+    DB_POOL_SIZE = _env_int("DB_POOL_SIZE", 10)
+    DB_MAX_OVERFLOW = _env_int("DB_MAX_OVERFLOW", 10)
+    # 커넥션을 얻기까지 기다리는 최대 시간(초)
+    DB_POOL_TIMEOUT = _env_float("DB_POOL_TIMEOUT", 30.0)
+    # MariaDB wait_timeout보다 짧게 설정하여 끊어진 커넥션을 재사용하지 않도록 합니다.
+    DB_POOL_RECYCLE = _env_int("DB_POOL_RECYCLE", 1800)
+    DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+    # 워커 시작 시 미리 열어 둘 커넥션 수 (첫 요청들이 커넥션 생성을 기다리지 않도록)
+    DB_POOL_WARM = _env_int("DB_POOL_WARM", 5)
+    # 워커 시작 시 마이그레이션 적용 여부 (로컬 개발용. 운영에서는 python -m app.migrate를 먼저 실행)
+    MIGRATE_ON_STARTUP = _env_bool("MIGRATE_ON_STARTUP", False)
+    # 쿼리 실행 시간 제한 (0이면 제한 없음)
+    DB_STATEMENT_TIMEOUT_MS = _env_int("DB_STATEMENT_TIMEOUT_MS", 0)
+    # 느린 쿼리 기준 시간과 보관 건수 (/api/metrics/db)
+    DB_SLOW_QUERY_MS = _env_float("DB_SLOW_QUERY_MS", 200.0)
+    DB_SLOW_QUERY_LOG_SIZE = _env_int("DB_SLOW_QUERY_LOG_SIZE", 100)
+
+    # 요청 계측 (/metrics, /api/metrics/slow-requests, /api/metrics/profiles)
+    # 느린 요청 기준 시간과 보관 건수
+    SLOW_REQUEST_MS = _env_float("SLOW_REQUEST_MS", 1000.0)
+    SLOW_REQUEST_LOG_SIZE = _env_int("SLOW_REQUEST_LOG_SIZE", 100)
+    # 프로파일링할 요청 비율 (0~1). 프로파일은 SLOW_REQUEST_MS 이상 걸린 요청만 보관합니다.
+    PROFILE_SAMPLE_RATE = _env_float("PROFILE_SAMPLE_RATE", 0.0)
+    # X-Profile 헤더에 이 값을 보내면 해당 요청을 프로파일링합니다. (비워 두면 사용하지 않음)
+    PROFILE_HEADER_TOKEN = os.getenv("PROFILE_HEADER_TOKEN", "")
+    PROFILE_KEEP = _env_int("PROFILE_KEEP", 20)
+
+    # 수신자 대량 등록: 한 번의 INSERT(executemany)로 처리할 행 수
+    RECIPIENT_INSERT_CHUNK_SIZE = _env_int("RECIPIENT_INSERT_CHUNK_SIZE", 2000)
+    # 수신자 파일 업로드: 한 번에 읽어 검증/적재할 행 수, 파일당 최대 행 수
+    RECIPIENT_UPLOAD_BATCH_SIZE = _env_int("RECIPIENT_UPLOAD_BATCH_SIZE", 5000)
+    RECIPIENT_UPLOAD_MAX_ROWS = _env_int("RECIPIENT_UPLOAD_MAX_ROWS", 1_000_000)
+    # 발송 요청에 사용되지 않은 업로드는 이 시간이 지나면 만료(expired)되고 적재된 번호가 삭제됩니다.
+    RECIPIENT_UPLOAD_TTL_HOURS = _env_int("RECIPIENT_UPLOAD_TTL_HOURS", 24)
+
+    # 예약 발송 실행 (dispatch_datetime이 된 발송 건 처리)
+    DISPATCH_POLL_INTERVAL_SEC = _env_int("DISPATCH_POLL_INTERVAL_SEC", 10)
+    # 발송 시각보다 이 시간(초) 먼저 쿠폰 발급/UMS 적재를 시작합니다. (UMS_MSG.REQ_DATE로 예약 발송)
+    DISPATCH_LEAD_SEC = _env_int("DISPATCH_LEAD_SEC", 600)
+    # 워커당 동시에 처리할 발송 건 수
+    DISPATCH_MAX_CONCURRENT = _env_int("DISPATCH_MAX_CONCURRENT", 2)
+    # 점유 갱신이 이 시간(초) 이상 없으면 중단된 작업으로 보고 다른 워커가 이어서 처리합니다.
+    DISPATCH_LEASE_SEC = _env_int("DISPATCH_LEASE_SEC", 120)
+    DISPATCH_MAX_ATTEMPTS = _env_int("DISPATCH_MAX_ATTEMPTS", 3)
+    # 실패(일부 쿠폰 발급 실패 포함)한 발송 건은 이 시간(초) * 2^(시도 횟수 - 1) 뒤에 다시 시도합니다.
+    DISPATCH_RETRY_BACKOFF_SEC = _env_int("DISPATCH_RETRY_BACKOFF_SEC", 60)
+    # 같은 이벤트명/상품으로 최근 이 기간(일) 안에 생성된 발송 건의 수신자 번호는 적재하지 않습니다. (0이면 발송 건 내 중복만 제외)
+    DISPATCH_DEDUP_DAYS = _env_int("DISPATCH_DEDUP_DAYS", 30)
+    # 발송 요청 Idempotency-Key 보관 기간(시간). 기간 안에 같은 키로 다시 요청하면 처음 응답을 그대로 반환합니다.
+    IDEMPOTENCY_KEY_TTL_HOURS = _env_int("IDEMPOTENCY_KEY_TTL_HOURS", 24)
+
+    # 쿠펀 B2C API (MyDocuments/01_쿠폰공급사API)
+    COUFUN_BASE_URL = os.getenv("COUFUN_BASE_URL", "https://tcorp.coufun.kr:446/b2c_api")
+    COUFUN_POC_ID = os.getenv("COUFUN_POC_ID", "")
+    COUFUN_TIMEOUT = _env_float("COUFUN_TIMEOUT", 10.0)
+    COUFUN_MAX_CONNECTIONS = _env_int("COUFUN_MAX_CONNECTIONS", 20)
+    COUFUN_RATE_PER_SEC = _env_float("COUFUN_RATE_PER_SEC", 20.0)
+    COUFUN_MAX_RETRIES = _env_int("COUFUN_MAX_RETRIES", 3)
+    # 쿠폰 발급 시 동시에 진행할 쿠폰생성 요청 수
+    COUFUN_ISSUE_CONCURRENCY = _env_int("COUFUN_ISSUE_CONCURRENCY", 10)
+    # TR_ID 접두어 (고객사 고유 ID, 최대 50byte)
+    COUFUN_TR_ID_PREFIX = os.getenv("COUFUN_TR_ID_PREFIX", "IBC")
+    # 쿠펀 교환정보 콜백: 모아서 반영하는 주기(초)와 한 번에 반영할 쿠폰 수
+    EXCHANGE_FLUSH_INTERVAL_SEC = _env_float("EXCHANGE_FLUSH_INTERVAL_SEC", 2.0)
+    EXCHANGE_FLUSH_BATCH_SIZE = _env_int("EXCHANGE_FLUSH_BATCH_SIZE", 1000)
+    # 받은 이벤트를 반영 전까지 기록할 로컬 디렉터리 (비워 두면 메모리에만 보관)
+    EXCHANGE_JOURNAL_DIR = os.getenv("EXCHANGE_JOURNAL_DIR", "")
+    # 콜백을 허용할 쿠펀 서버 IP (쉼표 구분, 비워 두면 모두 허용)
+    EXCHANGE_ALLOWED_IPS = [ip.strip() for ip in os.getenv("EXCHANGE_ALLOWED_IPS", "").split(",") if ip.strip()]
+    # 쿠폰 상태조회/취소 일괄 처리: 한 번에 조회할 수신자 수와 동시 요청 수
+    COUPON_SWEEP_PAGE_SIZE = _env_int("COUPON_SWEEP_PAGE_SIZE", 500)
+    COUPON_SWEEP_CONCURRENCY = _env_int("COUPON_SWEEP_CONCURRENCY", 10)
+    # 체크포인트 갱신이 이 시간 이상 끊긴 실행 중 작업은 중단된 것으로 보고 이어서 실행할 수 있습니다.
+    COUPON_SWEEP_LEASE_SEC = _env_int("COUPON_SWEEP_LEASE_SEC", 300)
+    # 상품 동기화 시 한 번의 INSERT ... ON DUPLICATE KEY UPDATE로 반영할 상품 수
+    PRODUCT_SYNC_BATCH_SIZE = _env_int("PRODUCT_SYNC_BATCH_SIZE", 500)
+    # 상품 검색 색인 유효 시간 (다른 워커에서 동기화한 내용을 반영하는 주기)
+    PRODUCT_INDEX_TTL_SEC = _env_int("PRODUCT_INDEX_TTL_SEC", 300)
+
+    # LG U+ SNAP Agent UMS_MSG 적재 (MyDocuments/02_LG유플러스)
+    # 비워 두면 애플리케이션 DB(DATABASE_URL)에 적재합니다.
+    UMS_DATABASE_URL = os.getenv("UMS_DATABASE_URL", "")
+    UMS_POOL_SIZE = _env_int("UMS_POOL_SIZE", 5)
+    UMS_INSERT_BATCH_SIZE = _env_int("UMS_INSERT_BATCH_SIZE", 500)
+    # 프로세스당 초당 최대 적재 메시지 수
+    UMS_MAX_PER_SEC = _env_float("UMS_MAX_PER_SEC", 500.0)
+    UMS_TRAFFIC_TYPE = os.getenv("UMS_TRAFFIC_TYPE", "batch")
+    # CLIENT_KEY 접두어 (같은 Agent를 쓰는 다른 시스템/환경과 구분)
+    UMS_CLIENT_KEY_PREFIX = os.getenv("UMS_CLIENT_KEY_PREFIX", "IBC")
+    # UMS_LOG_YYYYMM 테이블이 애플리케이션 DB와 다른 스키마(같은 서버)에 있을 때 스키마명
+    UMS_LOG_SCHEMA = os.getenv("UMS_LOG_SCHEMA", "")
+
+    # 발송 결과 반영 (UMS_LOG_YYYYMM -> recipients)
+    RECONCILE_INTERVAL_SEC = _env_int("RECONCILE_INTERVAL_SEC", 30)
+    RECONCILE_BATCH_SIZE = _env_int("RECONCILE_BATCH_SIZE", 5000)
+    # 이번 달을 포함하여 확인할 월별 로그 테이블 수
+    RECONCILE_MONTHS = _env_int("RECONCILE_MONTHS", 2)
+    # 매 실행마다 워터마크보다 이 시간(초)만큼 앞의 로그부터 다시 확인합니다.
+    # DONE_DATE가 워터마크보다 이전인 로그가 늦게 기록되는 최대 지연보다 길게 설정해야 합니다.
+    RECONCILE_OVERLAP_SEC = _env_int("RECONCILE_OVERLAP_SEC", 600)
+
+
+settings = Settings()
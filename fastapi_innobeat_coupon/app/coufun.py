@@ -0,0 +1,225 @@
+import asyncio
+import codecs
+import random
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+
+import httpx
+
+from .config import settings
+from .instrumentation import span
+from .ratelimit import TokenBucket
+
+# 쿠펀 API 결과 코드 (MyDocuments/01_쿠폰공급사API/6.코드정의서)
+RESULT_SUCCESS = "00"
+RESULT_TR_ID_DUPLICATED = "12"
+
+# 한 번의 쿠폰생성(coufunCreate.do) 요청으로 발급 가능한 최대 쿠폰 수
+MAX_CREATE_CNT = 10
+
+# 요청이 서버에 전달되기 전에 실패한 오류 (멱등하지 않은 요청도 재시도 가능)
+_NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class CoufunError(Exception):
+    """
+    재시도 후에도 쿠펀 API 호출에 실패한 경우 발생합니다.
+    maybe_processed는 응답을 받지 못해 요청이 서버에서 처리되었을 수도 있는지를 나타냅니다.
+    """
+    def __init__(self, message: str, maybe_processed: bool = False):
+        super().__init__(message)
+        self.maybe_processed = maybe_processed
+
+
+@dataclass
+class CoufunResponse:
+    # 루트 바로 아래의 단일 필드 (RESULT_CODE, RESULT_MSG, ORDER_ID 등)
+    fields: dict[str, str] = field(default_factory=dict)
+    # 반복되는 레코드 블록 (ORDER_INFO, PRODUCT_INFO 등)
+    records: list[dict[str, str]] = field(default_factory=list)
+
+    @property
+    def result_code(self) -> str | None:
+        return self.fields.get("RESULT_CODE")
+
+    @property
+    def result_msg(self) -> str | None:
+        return self.fields.get("RESULT_MSG")
+
+    @property
+    def ok(self) -> bool:
+        return self.result_code == RESULT_SUCCESS
+
+
+async def iter_xml_records(chunks, record_tag: str, fields: dict[str, str] | None = None, encoding: str = "euc-kr"):
+    """
+    바이트 청크 스트림을 점진적으로 파싱하여 record_tag 블록을 하나씩 dict로 반환합니다.
+    파싱이 끝난 엘리먼트는 즉시 비우므로 응답 크기와 무관하게 메모리 사용량이 일정합니다.
+    fields가 주어지면 레코드 밖의 단일 필드(RESULT_CODE 등)를 채워 넣습니다.
+
+    expat은 EUC-KR 같은 멀티바이트 인코딩을 직접 처리하지 못하므로,
+    증분 디코더로 문자열로 바꾼 뒤 파서에 전달합니다.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    parser = ET.XMLPullParser(events=("start", "end"))
+    depth = 0
+    root = None
+    record: dict[str, str] | None = None
+
+    def drain():
+        nonlocal depth, root, record
+        for event, elem in parser.read_events():
+            if event == "start":
+                if root is None:
+                    root = elem
+                depth += 1
+                if elem.tag == record_tag:
+                    record = {}
+                continue
+            depth -= 1
+            if elem.tag == record_tag:
+                yield record
+                record = None
+                # 처리가 끝난 하위 엘리먼트를 루트에서 떼어내 트리가 커지지 않도록 함
+                root.clear()
+            elif record is not None:
+                record[elem.tag] = (elem.text or "").strip()
+            elif depth == 1 and fields is not None:
+                fields[elem.tag] = (elem.text or "").strip()
+                elem.clear()
+
+    async for chunk in chunks:
+        parser.feed(decoder.decode(chunk))
+        for item in drain():
+            yield item
+    parser.feed(decoder.decode(b"", final=True))
+    parser.close()
+    for item in drain():
+        yield item
+
+
+class CoufunClient:
+    """
+    쿠펀 B2C API 클라이언트입니다.
+    커넥션 풀을 공유하는 httpx.AsyncClient 하나로 모든 요청을 보내며,
+    토큰 버킷으로 초당 요청 수를 제한하고 네트워크/5xx 오류는 지수 백오프로 재시도합니다.
+    멱등하지 않은 요청(쿠폰생성)은 요청이 전달되지 않은 것이 확실한 연결 실패만 재시도합니다.
+    """
+    def __init__(
+        self,
+        base_url: str = settings.COUFUN_BASE_URL,
+        poc_id: str = settings.COUFUN_POC_ID,
+        max_connections: int = settings.COUFUN_MAX_CONNECTIONS,
+        rate_per_sec: float = settings.COUFUN_RATE_PER_SEC,
+        max_retries: int = settings.COUFUN_MAX_RETRIES,
+        timeout: float = settings.COUFUN_TIMEOUT,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.poc_id = poc_id
+        self.max_retries = max_retries
+        self.rate_limiter = TokenBucket(rate_per_sec)
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            # 테스트/성능 측정 시 스텁 서버를 프로세스 내에서 호출하는 경우 (httpx.ASGITransport)
+            transport=transport,
+        )
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def request(self, path: str, data: dict, record_tag: str, idempotent: bool = True) -> CoufunResponse:
+        """
+        POST 요청을 보내고 XML 응답을 스트리밍으로 파싱합니다.
+        idempotent=False이면 요청이 서버에 전달되었을 수 있는 오류(읽기 시간 초과, 5xx 등)는 재시도하지 않고
+        CoufunError를 발생시킵니다. 같은 요청을 다시 보내면 처리가 중복될 수 있는 경로에 사용합니다.
+        """
+        payload = {"POC_ID": self.poc_id, **data}
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire()
+            try:
+                with span(f"coufun.{path.strip('/').removesuffix('.do')}"):
+                    async with self._client.stream("POST", path, data=payload) as response:
+                        response.raise_for_status()
+                        result = CoufunResponse()
+                        async for record in iter_xml_records(response.aiter_bytes(), record_tag, fields=result.fields):
+                            result.records.append(record)
+                        return result
+            except (httpx.TransportError, httpx.HTTPStatusError, ET.ParseError) as e:
+                if isinstance(e, httpx.HTTPStatusError) and e.response.status_code < 500:
+                    raise CoufunError(f"{path} 요청 실패: HTTP {e.response.status_code}") from e
+                maybe_processed = not isinstance(e, _NOT_SENT_ERRORS)
+                if not idempotent and maybe_processed:
+                    raise CoufunError(f"{path} 요청 실패 (처리 여부 불명, 재시도하지 않음): {e}", maybe_processed=True) from e
+                if attempt == self.max_retries:
+                    raise CoufunError(f"{path} 요청 실패 ({attempt + 1}회 시도): {e}", maybe_processed=maybe_processed) from e
+                # 지수 백오프 + 지터
+                await asyncio.sleep(min(0.5 * 2 ** attempt, 10.0) * (0.5 + random.random()))
+
+    async def iter_records(self, path: str, data: dict, record_tag: str, fields: dict[str, str] | None = None):
+        """
+        응답 전체를 받기 전에 record_tag 블록을 하나씩 반환합니다. (상품목록처럼 큰 응답용)
+        이미 반환한 레코드를 되돌릴 수 없으므로 재시도하지 않습니다.
+        """
+        await self.rate_limiter.acquire()
+        async with self._client.stream("POST", path, data={"POC_ID": self.poc_id, **data}) as response:
+            response.raise_for_status()
+            async for record in iter_xml_records(response.aiter_bytes(), record_tag, fields=fields):
+                yield record
+
+    async def create_coupons(self, goods_id: str, count: int, tr_id: str) -> CoufunResponse:
+        """
+        쿠폰생성(coufunCreate.do) API로 쿠폰을 최대 10개까지 발급합니다.
+        발급된 쿠폰번호는 records[i]["BARCODE_NUM"]에 담깁니다.
+        응답을 받지 못한 요청은 발급되었을 수 있으므로 연결 실패 외에는 재시도하지 않습니다.
+        """
+        if not 0 < count <= MAX_CREATE_CNT:
+            raise ValueError(f"CREATE_CNT는 1~{MAX_CREATE_CNT} 사이여야 합니다: {count}")
+        return await self.request(
+            "/coufunCreate.do",
+            {"GOODS_ID": goods_id, "CREATE_CNT": count, "TR_ID": tr_id},
+            record_tag="ORDER_INFO",
+            idempotent=False,
+        )
+
+    async def get_coupon_status(self, goods_id: str, barcode_num: str) -> CoufunResponse:
+        """
+        쿠폰상태조회(coufunPartAmountStatus.do) API로 쿠폰 하나의 상태(STATUS: 000 미사용, 001 사용, 100 취소)를 조회합니다.
+        상태 필드는 루트 아래 또는 ORDER_INFO 블록(records)에 담깁니다.
+        """
+        return await self.request(
+            "/coufunPartAmountStatus.do",
+            {"GOODS_ID": goods_id, "BARCODE_NUM": barcode_num},
+            record_tag="ORDER_INFO",
+        )
+
+    async def cancel_coupon(self, goods_id: str, barcode_num: str) -> CoufunResponse:
+        """
+        쿠폰취소(coufunPartCancel.do) API로 쿠폰 하나를 취소합니다.
+        """
+        return await self.request(
+            "/coufunPartCancel.do",
+            {"GOODS_ID": goods_id, "BARCODE_NUM": barcode_num},
+            record_tag="ORDER_INFO",
+        )
+
+
+_client: CoufunClient | None = None
+
+
+def get_coufun_client() -> CoufunClient:
+    """
+    프로세스 전체에서 공유하는 CoufunClient를 반환합니다.
+    """
+    global _client
+    if _client is None:
+        _client = CoufunClient()
+    return _client
+
+
+async def close_coufun_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,209 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, or_, update
+from sqlalchemy.future import select
+
+from . import crud, models
+from .config import settings
+from .coufun import CoufunClient, CoufunError, get_coufun_client
+from .database import SessionLocal
+from .dispatch_jobs import WORKER_ID
+from .exchange import EXCHANGE_STATUS, RESULT_OK
+from .jobs import Job
+
+SWEEP_MODES = ("status", "cancel")
+
+
+def _parse_date(value: str | None) -> datetime | None:
+    try:
+        return datetime.strptime(value, "%Y%m%d%H%M%S") if value else None
+    except ValueError:
+        return None
+
+
+def _status_fields(response) -> dict[str, str]:
+    # 상태 필드는 루트 바로 아래 또는 ORDER_INFO 블록에 담겨 옵니다.
+    return response.records[0] if response.records else response.fields
+
+
+async def _check_status(client: CoufunClient, semaphore: asyncio.Semaphore, goods_id: str, barcode: str):
+    """
+    쿠폰 하나의 상태를 조회하여 (수신자 쿠폰 상태, 변경 시각)을 반환합니다. 실패하면 None을 반환합니다.
+    """
+    async with semaphore:
+        try:
+            response = await client.get_coupon_status(goods_id, barcode)
+        except CoufunError as e:
+            print(f"[쿠폰상태조회] {barcode} 요청 실패: {e}")
+            return None
+    if not response.ok:
+        print(f"[쿠폰상태조회] {barcode} 조회 실패: {response.result_code} {response.result_msg}")
+        return None
+
+    fields = _status_fields(response)
+    status = EXCHANGE_STATUS.get(fields.get("STATUS", ""))
+    if status is None:
+        return None
+    if status == "교환":
+        return status, _parse_date(fields.get("EXCHANGE_DATE"))
+    if status == "폐기":
+        return status, _parse_date(fields.get("CANCEL_DATE"))
+    return status, None
+
+
+async def _cancel(client: CoufunClient, semaphore: asyncio.Semaphore, goods_id: str, barcode: str):
+    """
+    쿠폰 하나를 취소하고, 성공하면 ("폐기", 취소 시각)을 반환합니다.
+    취소가 거절되면 쿠폰 상태를 조회하여 실제 상태(이미 사용된 쿠폰이면 교환 등)를 반환하고,
+    취소와 상태조회가 모두 실패한 경우에만 None을 반환합니다.
+    """
+    async with semaphore:
+        try:
+            response = await client.cancel_coupon(goods_id, barcode)
+        except CoufunError as e:
+            print(f"[쿠폰취소] {barcode} 요청 실패: {e}")
+            return None
+    if response.result_code != RESULT_OK:
+        # 이미 사용되었거나, 이전 실행에서 취소는 되었으나 결과를 반영하지 못한 쿠폰일 수 있으므로 상태를 확인합니다.
+        checked = await _check_status(client, semaphore, goods_id, barcode)
+        if checked is None or checked[0] != "폐기":
+            print(f"[쿠폰취소] {barcode} 취소 실패: {response.result_code} {response.result_msg} (현재 상태: {checked[0] if checked else '조회 실패'})")
+        return checked
+    return "폐기", datetime.now()
+
+
+def _target_filter(sweep: models.CouponSweep) -> list:
+    """
+    작업 대상 수신자 조건: 쿠폰이 발급된 수신자 중 발송 건 또는 발송일시 구간에 해당하는 수신자.
+    상태조회는 폐기(최종 상태)가 아닌 쿠폰을, 취소는 미교환 쿠폰만 대상으로 합니다.
+    """
+    Recipient, Dispatch = models.Recipient, models.Dispatch
+    conditions = [Recipient.coupon_code.is_not(None)]
+    if sweep.mode == "cancel":
+        conditions.append(Recipient.status == "미교환")
+    else:
+        conditions.append(Recipient.status != "폐기")
+    if sweep.dispatch_id is not None:
+        conditions.append(Recipient.dispatch_id == sweep.dispatch_id)
+    if sweep.date_from is not None:
+        conditions.append(Dispatch.dispatch_datetime >= sweep.date_from)
+    if sweep.date_to is not None:
+        conditions.append(Dispatch.dispatch_datetime < sweep.date_to)
+    return conditions
+
+
+async def claim_sweep(sweep_id: int) -> bool:
+    """
+    작업을 이 워커가 실행하도록 점유합니다. 완료된 작업이거나 다른 워커가 실행 중(점유 갱신이
+    COUPON_SWEEP_LEASE_SEC 이내)이면 False를 반환합니다.
+    """
+    now = datetime.now()
+    CouponSweep = models.CouponSweep
+    async with SessionLocal() as session:
+        result = await session.execute(
+            update(CouponSweep)
+            .where(
+                CouponSweep.id == sweep_id,
+                CouponSweep.status != "done",
+                or_(
+                    CouponSweep.status != "running",
+                    CouponSweep.claimed_at.is_(None),
+                    CouponSweep.claimed_at < now - timedelta(seconds=settings.COUPON_SWEEP_LEASE_SEC),
+                ),
+            )
+            .values(status="running", claimed_by=WORKER_ID, claimed_at=now, error=None)
+        )
+        await session.commit()
+        return result.rowcount == 1
+
+
+async def _update_sweep(session, sweep_id: int, **values) -> bool:
+    """
+    이 워커가 점유한 작업을 갱신합니다. 점유를 다른 워커가 가져가 갱신되지 않았으면 False를 반환합니다.
+    """
+    result = await session.execute(
+        update(models.CouponSweep)
+        .where(models.CouponSweep.id == sweep_id, models.CouponSweep.claimed_by == WORKER_ID)
+        .values(**values)
+    )
+    await session.commit()
+    return result.rowcount == 1
+
+
+async def run_coupon_sweep(
+    job: Job,
+    sweep_id: int,
+    page_size: int = settings.COUPON_SWEEP_PAGE_SIZE,
+    concurrency: int = settings.COUPON_SWEEP_CONCURRENCY,
+):
+    """
+    점유한 쿠폰 상태조회/취소 작업을 실행합니다.
+
+    대상 수신자를 ID 순서로 page_size명씩 키셋 조회하여 쿠펀 API를 최대 concurrency건씩 동시에 호출하고,
+    바뀐 상태는 페이지마다 crud.apply_recipient_status_changes로 한꺼번에 반영합니다.
+    페이지를 마칠 때마다 마지막 수신자 ID를 체크포인트로 저장하므로, 중단된 작업은 resume으로 이어서 진행합니다.
+    체크포인트를 저장하지 못하면(다른 워커가 점유를 가져감) 다음 페이지를 진행하지 않고 끝냅니다.
+    호출 속도는 쿠펀 클라이언트의 요청 속도 제한(COUFUN_RATE_PER_SEC)을 따릅니다.
+    """
+    Recipient, Dispatch, Product = models.Recipient, models.Dispatch, models.Product
+    client = get_coufun_client()
+    semaphore = asyncio.Semaphore(concurrency)
+    try:
+        async with SessionLocal() as session:
+            sweep = await session.get(models.CouponSweep, sweep_id)
+            conditions = _target_filter(sweep)
+            last_id = sweep.last_recipient_id or 0
+            counts = {"scanned": sweep.scanned or 0, "changed": sweep.changed or 0, "failed": sweep.failed or 0}
+            mode = sweep.mode
+            call = _cancel if mode == "cancel" else _check_status
+
+            remaining = await session.scalar(
+                select(func.count())
+                .select_from(Recipient)
+                .join(Dispatch, Dispatch.id == Recipient.dispatch_id)
+                .filter(Recipient.id > last_id, *conditions)
+            )
+            job.set_stage(mode, remaining)
+
+            while True:
+                result = await session.execute(
+                    select(Recipient.id, Recipient.coupon_code, Product.goods_id)
+                    .join(Dispatch, Dispatch.id == Recipient.dispatch_id)
+                    .join(Product, Product.id == Dispatch.product_id)
+                    .filter(Recipient.id > last_id, *conditions)
+                    .order_by(Recipient.id)
+                    .limit(page_size)
+                )
+                rows = result.all()
+                if not rows:
+                    break
+                last_id = rows[-1].id
+
+                results = await asyncio.gather(*(
+                    call(client, semaphore, row.goods_id, row.coupon_code) for row in rows
+                ))
+                changes, changed_at = {}, {}
+                for row, item in zip(rows, results):
+                    if item is None:
+                        counts["failed"] += 1
+                        continue
+                    changes[row.coupon_code], at = item
+                    if at:
+                        changed_at[row.coupon_code] = at
+                if changes:
+                    counts["changed"] += await crud.apply_recipient_status_changes(session, changes, changed_at)
+                counts["scanned"] += len(rows)
+
+                if not await _update_sweep(session, sweep_id, last_recipient_id=last_id, claimed_at=datetime.now(), **counts):
+                    # 점유 갱신이 끊긴 사이 다른 워커가 이어서 처리 중이므로 다음 페이지를 진행하지 않습니다.
+                    print(f"{sweep_id}번 쿠폰 {mode} 작업을 다른 워커가 가져가 중단합니다.")
+                    return
+                job.advance(len(rows))
+
+            await _update_sweep(session, sweep_id, status="done", claimed_by=None, finished_at=datetime.now())
+        print(f"{sweep_id}번 쿠폰 {mode} 작업 완료: {counts}")
+    except Exception as e:
+        async with SessionLocal() as session:
+            await _update_sweep(session, sweep_id, status="failed", claimed_by=None, error=str(e)[:500])
+        raise
@@ -1,7 +1,19 @@
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, bindparam, delete, exists, func, insert, literal, or_, update
+from sqlalchemy.dialects import mysql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from . import models, schemas
 
+# 수신자 쿠폰 상태 -> models.Dispatch 상태별 건수 컬럼
+STATUS_COUNTER_COLUMNS = {
+    "미교환": "unexchanged_count",
+    "교환": "exchanged_count",
+    "폐기": "discarded_count",
+}
+
 async def get_product_by_goods_id(db: AsyncSession, goods_id: str):
     """
     goods_id를 기준으로 상품을 조회합니다.
@@ -13,7 +25,7 @@ async def search_products_by_name(db: AsyncSession, product_name: str):
     """
     상품명(goods_name)에 검색어가 포함된 상품들을 조회합니다.
     """
-    query = select(models.Product)
+    query = select(models.Product).filter(models.Product.deleted_at.is_(None))
     if product_name:
         query = query.filter(models.Product.goods_name.contains(product_name))
     
@@ -42,3 +54,309 @@ async def upsert_product(db: AsyncSession, product: schemas.ProductCreate):
     await db.refresh(db_product)
     return db_product
 
+async def bulk_upsert_products(db: AsyncSession, rows: list[dict]):
+    """
+    upsert_product의 대량 처리 버전입니다.
+    rows는 models.Product 컬럼명을 키로 하는 dict 목록이며, 모든 행의 키 구성이 같아야 합니다.
+    다중 행 INSERT ... ON DUPLICATE KEY UPDATE 한 번으로 처리하고 커밋합니다. (goods_id 기준)
+    판매 중단으로 표시된 상품이 다시 들어오면 deleted_at을 해제합니다.
+    """
+    if not rows:
+        return
+    update_columns = [key for key in rows[0] if key not in ("id", "goods_id")]
+
+    if db.get_bind().dialect.name == "sqlite":
+        # 로컬 벤치마크(SQLite)용
+        stmt = sqlite.insert(models.Product).values(rows)
+        excluded = stmt.excluded
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["goods_id"],
+            set_={**{key: excluded[key] for key in update_columns}, "deleted_at": None, "updated_at": func.now()},
+        )
+    else:
+        stmt = mysql.insert(models.Product).values(rows)
+        stmt = stmt.on_duplicate_key_update(
+            {**{key: stmt.inserted[key] for key in update_columns}, "deleted_at": None, "updated_at": func.now()}
+        )
+    await db.execute(stmt)
+    await db.commit()
+
+
+async def _add_loaded(db: AsyncSession, dispatch_id: int, count: int, duplicates: int = 0):
+    # 새로 적재한 수신자는 미교환 상태이므로 적재와 같은 트랜잭션에서 건수를 더합니다.
+    # 중복으로 제외한 수신자는 발송 수량(quantity)에서 뺍니다.
+    await db.execute(
+        update(models.Dispatch)
+        .where(models.Dispatch.id == dispatch_id)
+        .values(
+            unexchanged_count=models.Dispatch.unexchanged_count + count,
+            duplicate_count=models.Dispatch.duplicate_count + duplicates,
+            quantity=models.Dispatch.quantity - duplicates,
+        )
+    )
+
+async def _already_included(db: AsyncSession, dispatch_id: int, dedup_days: int):
+    """
+    수신자 번호가 이 발송 건 또는 같은 이벤트명/상품으로 최근 dedup_days일 안에 생성된 발송 건에 이미 있는지
+    확인하는 조건을 (수신자 테이블 별칭, 조건)으로 반환합니다. 실패한 발송 건은 쿠폰이 발급된 수신자만 포함으로 봅니다.
+    발송 건 ID와 번호로만 조회하므로 ix_dispatches_event_product_created, ix_recipients_dispatch_phone 인덱스를 사용합니다.
+    """
+    Dispatch = models.Dispatch
+    active_ids, failed_ids = [dispatch_id], []
+    if dedup_days > 0:
+        dispatch = (await db.execute(
+            select(Dispatch.event_name, Dispatch.product_id).where(Dispatch.id == dispatch_id)
+        )).one()
+        result = await db.execute(
+            select(Dispatch.id, Dispatch.status).where(
+                Dispatch.event_name == dispatch.event_name,
+                Dispatch.product_id == dispatch.product_id,
+                Dispatch.created_at >= datetime.now() - timedelta(days=dedup_days),
+                Dispatch.id != dispatch_id,
+            )
+        )
+        for row in result:
+            (failed_ids if row.status == "failed" else active_ids).append(row.id)
+
+    included = models.Recipient.__table__.alias("included")
+    condition = included.c.dispatch_id.in_(active_ids)
+    if failed_ids:
+        condition = or_(condition, and_(included.c.dispatch_id.in_(failed_ids), included.c.coupon_code.is_not(None)))
+    return included, condition
+
+async def bulk_insert_recipients(db: AsyncSession, dispatch_id: int, phone_numbers: list[str], chunk_size: int, dedup_days: int = 0, on_progress=None):
+    """
+    수신자를 chunk_size 단위의 executemany INSERT로 대량 등록합니다.
+    ORM 객체를 만들지 않으므로 세션의 identity map에 쌓이지 않으며, 청크마다 커밋합니다.
+    쿠폰번호(coupon_code)는 비워 두며, 이후 쿠폰 발급 단계에서 채워집니다.
+    이미 이 발송 건이나 최근 같은 이벤트/상품 발송 건에 있는 번호는 적재하지 않고 duplicate_count에 더합니다. (_already_included)
+    on_progress(count)가 주어지면 청크가 커밋될 때마다 호출합니다.
+    """
+    table = models.Recipient.__table__
+    included, condition = await _already_included(db, dispatch_id, dedup_days)
+    for start in range(0, len(phone_numbers), chunk_size):
+        chunk = phone_numbers[start:start + chunk_size]
+        result = await db.execute(select(included.c.phone_number).where(condition, included.c.phone_number.in_(chunk)))
+        existing = set(result.scalars().all())
+        rows = [{"dispatch_id": dispatch_id, "phone_number": phone_number} for phone_number in chunk if phone_number not in existing]
+        if rows:
+            await db.execute(insert(table), rows)
+        await _add_loaded(db, dispatch_id, len(rows), len(chunk) - len(rows))
+        await db.commit()
+        if on_progress:
+            on_progress(len(chunk))
+
+async def bulk_insert_staged_recipients(db: AsyncSession, upload_id: int, phone_numbers: list[str]):
+    """
+    업로드된 수신자 번호를 staged_recipients에 executemany INSERT로 적재하고 커밋합니다.
+    """
+    if not phone_numbers:
+        return
+    rows = [{"upload_id": upload_id, "phone_number": phone_number} for phone_number in phone_numbers]
+    await db.execute(insert(models.StagedRecipient.__table__), rows)
+    await db.commit()
+
+async def delete_staged_recipients(db: AsyncSession, upload_id: int, chunk_size: int) -> int:
+    """
+    업로드로 적재된 수신자 번호를 ID 구간(chunk_size건) 단위로 삭제하고 구간마다 커밋합니다. 삭제한 행 수를 반환합니다.
+    """
+    staged = models.StagedRecipient.__table__
+    deleted = 0
+    while True:
+        result = await db.execute(
+            select(staged.c.id).where(staged.c.upload_id == upload_id).order_by(staged.c.id).limit(chunk_size)
+        )
+        ids = result.scalars().all()
+        if not ids:
+            return deleted
+        result = await db.execute(delete(staged).where(staged.c.upload_id == upload_id, staged.c.id <= ids[-1]))
+        await db.commit()
+        deleted += result.rowcount
+
+async def copy_staged_recipients(db: AsyncSession, dispatch_id: int, upload_id: int, chunk_size: int, dedup_days: int = 0, on_progress=None):
+    """
+    업로드로 적재된 수신자 목록을 발송 건의 수신자로 복사합니다.
+    staged_recipients를 ID 구간으로 나누어 구간마다 INSERT ... SELECT 한 번으로 처리하고 커밋합니다.
+    이미 이 발송 건이나 최근 같은 이벤트/상품 발송 건에 있는 번호는 복사하지 않고 duplicate_count에 더합니다. (_already_included)
+    구간 단위로 커밋되므로 이미 처리된 수신자 수(복사 + 중복 제외)만큼 건너뛰면 중단된 복사를 이어서 진행할 수 있습니다.
+    """
+    staged = models.StagedRecipient.__table__
+    recipients = models.Recipient.__table__
+    included, condition = await _already_included(db, dispatch_id, dedup_days)
+    last_id = 0
+    copied = await db.scalar(select(func.count()).select_from(recipients).where(recipients.c.dispatch_id == dispatch_id))
+    duplicates = await db.scalar(select(models.Dispatch.duplicate_count).where(models.Dispatch.id == dispatch_id))
+    processed = copied + (duplicates or 0)
+    if processed:
+        last_id = await db.scalar(
+            select(staged.c.id).where(staged.c.upload_id == upload_id).order_by(staged.c.id).offset(processed - 1).limit(1)
+        )
+        if on_progress:
+            on_progress(processed)
+    while True:
+        result = await db.execute(
+            select(staged.c.id)
+            .where(staged.c.upload_id == upload_id, staged.c.id > last_id)
+            .order_by(staged.c.id)
+            .limit(chunk_size)
+        )
+        ids = result.scalars().all()
+        if not ids:
+            break
+        result = await db.execute(
+            insert(recipients).from_select(
+                ["dispatch_id", "phone_number", "status"],
+                select(literal(dispatch_id), staged.c.phone_number, literal("미교환"))
+                .where(
+                    staged.c.upload_id == upload_id, staged.c.id > last_id, staged.c.id <= ids[-1],
+                    ~exists().where(condition, included.c.phone_number == staged.c.phone_number),
+                )
+                .order_by(staged.c.id),
+            )
+        )
+        await _add_loaded(db, dispatch_id, result.rowcount, len(ids) - result.rowcount)
+        await db.commit()
+        last_id = ids[-1]
+        if on_progress:
+            on_progress(len(ids))
+
+async def apply_recipient_status_changes(db: AsyncSession, changes: dict[str, str], changed_at: dict[str, datetime] | None = None) -> int:
+    """
+    쿠폰번호별 새 상태(미교환/교환/폐기)를 수신자에 반영하고, 발송 건의 상태별 건수를 같은 트랜잭션에서 증감합니다.
+    현재 상태를 잠근 뒤(SELECT ... FOR UPDATE) 실제로 바뀌는 수신자만 executemany UPDATE로 갱신하고,
+    발송 건별 증감분은 발송 건마다 UPDATE 한 번으로 반영합니다. 상태가 바뀐 수신자 수를 반환합니다.
+    changed_at(쿠폰번호별 변경 시각)이 주어지면 이미 반영된 변경보다 이전 시각의 변경은 무시합니다.
+    """
+    changed_at = changed_at or {}
+    table = models.Recipient.__table__
+    result = await db.execute(
+        select(table.c.id, table.c.dispatch_id, table.c.coupon_code, table.c.status, table.c.exchanged_at)
+        .where(table.c.coupon_code.in_(list(changes)))
+        .with_for_update()
+    )
+    rows = []
+    for row in result.all():
+        at = changed_at.get(row.coupon_code)
+        if at and row.exchanged_at and at < row.exchanged_at:
+            continue
+        # 상태가 같더라도 변경 시각은 기록해야 이후에 늦게 도착한 이전 변경을 걸러낼 수 있습니다.
+        if row.status != changes[row.coupon_code] or (at and at != row.exchanged_at):
+            rows.append(row)
+    if not rows:
+        await db.commit()
+        return 0
+
+    await db.execute(
+        update(table)
+        .where(table.c.id == bindparam("recipient_id"))
+        .values(status=bindparam("new_status"), exchanged_at=func.coalesce(bindparam("changed_at"), table.c.exchanged_at)),
+        [
+            {"recipient_id": row.id, "new_status": changes[row.coupon_code], "changed_at": changed_at.get(row.coupon_code)}
+            for row in rows
+        ],
+    )
+
+    deltas: dict[int, Counter] = defaultdict(Counter)
+    rows = [row for row in rows if row.status != changes[row.coupon_code]]
+    for row in rows:
+        if row.status in STATUS_COUNTER_COLUMNS:
+            deltas[row.dispatch_id][STATUS_COUNTER_COLUMNS[row.status]] -= 1
+        if changes[row.coupon_code] in STATUS_COUNTER_COLUMNS:
+            deltas[row.dispatch_id][STATUS_COUNTER_COLUMNS[changes[row.coupon_code]]] += 1
+    for dispatch_id, delta in deltas.items():
+        values = {column: getattr(models.Dispatch, column) + count for column, count in delta.items() if count}
+        if values:
+            await db.execute(update(models.Dispatch).where(models.Dispatch.id == dispatch_id).values(**values))
+
+    await db.commit()
+    return len(rows)
+
+async def list_dispatches(
+    db: AsyncSession,
+    limit: int,
+    cursor: int | None = None,
+    client_name: str | None = None,
+    event_name: str | None = None,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+):
+    """
+    발송 건을 최신순(ID 내림차순)으로 조회합니다. cursor가 주어지면 그 ID보다 이전 건부터 조회합니다. (키셋 페이지)
+    상품명은 JOIN으로 함께 가져오고, 상태별 건수는 발송 건에 유지되는 값을 사용합니다.
+    """
+    Dispatch = models.Dispatch
+    query = (
+        select(Dispatch, models.Product.goods_name, models.Product.goods_price)
+        .outerjoin(models.Product, Dispatch.product_id == models.Product.id)
+        .order_by(Dispatch.id.desc())
+        .limit(limit)
+    )
+    if cursor is not None:
+        query = query.filter(Dispatch.id < cursor)
+    if client_name:
+        query = query.filter(Dispatch.client_name.contains(client_name))
+    if event_name:
+        query = query.filter(Dispatch.event_name.contains(event_name))
+    if date_from:
+        query = query.filter(Dispatch.dispatch_datetime >= date_from)
+    if date_to:
+        query = query.filter(Dispatch.dispatch_datetime < date_to)
+    result = await db.execute(query)
+    return result.all()
+
+async def get_dispatch_summary(db: AsyncSession, dispatch_id: int):
+    result = await db.execute(
+        select(models.Dispatch, models.Product.goods_name, models.Product.goods_price)
+        .outerjoin(models.Product, models.Dispatch.product_id == models.Product.id)
+        .filter(models.Dispatch.id == dispatch_id)
+    )
+    return result.first()
+
+async def list_dispatch_recipients(db: AsyncSession, dispatch_id: int, limit: int, cursor: int | None = None, status: str | None = None):
+    """
+    발송 건의 수신자를 ID 오름차순으로 조회합니다. cursor가 주어지면 그 ID 다음부터 조회합니다. (키셋 페이지)
+    """
+    table = models.Recipient.__table__
+    query = select(table).where(table.c.dispatch_id == dispatch_id).order_by(table.c.id).limit(limit)
+    if cursor is not None:
+        query = query.where(table.c.id > cursor)
+    if status:
+        query = query.where(table.c.status == status)
+    result = await db.execute(query)
+    return result.all()
+
+async def list_coupon_issue_failures(db: AsyncSession, dispatch_id: int):
+    """
+    발송 건에서 발급 결과를 확인하지 못한 쿠폰생성 요청(TR_ID) 목록을 조회합니다.
+    """
+    result = await db.execute(
+        select(models.CouponIssueFailure)
+        .filter(models.CouponIssueFailure.dispatch_id == dispatch_id)
+        .order_by(models.CouponIssueFailure.created_at)
+    )
+    return result.scalars().all()
+
+async def find_recipients_by_phone(db: AsyncSession, phone_number: str, limit: int, cursor: int | None = None):
+    """
+    CS 조회: 휴대폰 번호로 받은 쿠폰을 발송 건/상품 정보와 함께 최신순으로 조회합니다. (phone_number 인덱스 사용)
+    """
+    table = models.Recipient.__table__
+    query = (
+        select(
+            table,
+            models.Dispatch.client_name,
+            models.Dispatch.event_name,
+            models.Dispatch.dispatch_datetime,
+            models.Dispatch.sender_phone,
+            models.Product.goods_name,
+        )
+        .join(models.Dispatch, table.c.dispatch_id == models.Dispatch.id)
+        .outerjoin(models.Product, models.Dispatch.product_id == models.Product.id)
+        .where(table.c.phone_number == phone_number)
+        .order_by(table.c.id.desc())
+        .limit(limit)
+    )
+    if cursor is not None:
+        query = query.where(table.c.id < cursor)
+    result = await db.execute(query)
+    return result.all()
@@ -1,23 +1,68 @@
 import os
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 
+from .config import settings
+from .db_metrics import TimedQueuePool, instrument_engine, register_pool
+
 # docker-compose.yml에서 설정한 환경 변수 사용
 DB_HOST = os.getenv("DB_HOST", "mariadb_innobeat_coupon")
 DB_USER = os.getenv("DB_USER", "coupon_user")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "coupon_pass")
 DB_NAME = os.getenv("DB_NAME", "innobeat_coupon_db")
+# 읽기 전용 복제본(replica) 호스트. 비워 두면 조회도 기본 DB에서 처리합니다.
+DB_READ_HOST = os.getenv("DB_READ_HOST", "")
+
+# DATABASE_URL을 지정하면 DB_* 설정 대신 사용합니다. (예: 로컬 테스트용 sqlite+aiosqlite)
+DATABASE_URL = os.getenv("DATABASE_URL") or f"mysql+aiomysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
+READ_DATABASE_URL = f"mysql+aiomysql://{DB_USER}:{DB_PASSWORD}@{DB_READ_HOST}/{DB_NAME}" if DB_READ_HOST else ""
+
+
+def create_engine(url: str, name: str, pool_size: int = settings.DB_POOL_SIZE, max_overflow: int = settings.DB_MAX_OVERFLOW) -> AsyncEngine:
+    """
+    환경 변수 설정(DB_POOL_*, DB_STATEMENT_TIMEOUT_MS 등)으로 비동기 엔진을 만들고 풀/쿼리 지표 수집을 연결합니다.
+    워커 프로세스마다 풀이 따로 생기므로 DB의 max_connections는 (pool_size + max_overflow) x 워커 수 이상이어야 합니다.
+    """
+    options = {"echo": settings.DB_ECHO, "pool_logging_name": name}
+    if make_url(url).get_backend_name() != "sqlite":
+        options.update(
+            poolclass=TimedQueuePool,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_pre_ping=settings.DB_POOL_PRE_PING,
+        )
+        if settings.DB_STATEMENT_TIMEOUT_MS:
+            # MariaDB: 세션 단위 쿼리 실행 시간 제한 (초 단위)
+            options["connect_args"] = {
+                "init_command": f"SET SESSION max_statement_time={settings.DB_STATEMENT_TIMEOUT_MS / 1000}"
+            }
+        register_pool(name, pool_size + max_overflow)
+
+    engine = create_async_engine(url, **options)
+    instrument_engine(engine, name)
+    return engine
 
-DATABASE_URL = f"mysql+aiomysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
 
 # 비동기 엔진 생성
-engine = create_async_engine(DATABASE_URL, echo=True)
+engine = create_engine(DATABASE_URL, "app")
+# 조회 전용 엔진 (복제본이 없으면 기본 엔진을 그대로 사용)
+read_engine = create_engine(READ_DATABASE_URL, "read") if READ_DATABASE_URL else engine
 
 # 비동기 세션 생성
 SessionLocal = sessionmaker(
-    autocommit=False, 
-    autoflush=False, 
-    bind=engine, 
+    autocommit=False,
+    autoflush=False,
+    bind=engine,
+    class_=AsyncSession
+)
+
+ReadSessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=read_engine,
     class_=AsyncSession
 )
 
@@ -28,3 +73,8 @@ Base = declarative_base()
 async def get_db():
     async with SessionLocal() as session:
         yield session
+
+# 조회 전용 API에서 사용하는 세션 의존성 함수 (복제본 지연이 허용되는 조회에만 사용)
+async def get_read_db():
+    async with ReadSessionLocal() as session:
+        yield session
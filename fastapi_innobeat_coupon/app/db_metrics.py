@@ -0,0 +1,168 @@
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+
+from sqlalchemy import event, exc
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from .config import settings
+
+
+class LatencyStats:
+    """
+    최근 max_samples건의 소요 시간(ms)으로 평균/p50/p99/최대값을 계산합니다.
+    """
+    def __init__(self, max_samples: int = 2000):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._samples: deque[float] = deque(maxlen=max_samples)
+
+    def add(self, ms: float):
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self._samples.append(ms)
+
+    def summary(self) -> dict:
+        samples = sorted(self._samples)
+
+        def percentile(p: float) -> float:
+            return round(samples[min(len(samples) - 1, int(len(samples) * p))], 3) if samples else 0.0
+
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "p50_ms": percentile(0.50),
+            "p99_ms": percentile(0.99),
+            "max_ms": round(self.max_ms, 3),
+        }
+
+
+class PoolStats:
+    def __init__(self, limit: int):
+        # 동시에 체크아웃할 수 있는 최대 커넥션 수 (pool_size + max_overflow)
+        self.limit = limit
+        self.checkout = LatencyStats()
+        self.timeouts = 0
+        self.peak_checked_out = 0
+
+
+class RouteStats:
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.max_queries = 0
+        self.db_ms = 0.0
+
+
+class RequestStats:
+    """
+    요청 하나에서 실행된 쿼리 수와 DB 소요 시간, 구간(span)별 소요 시간(ms)입니다.
+    """
+    __slots__ = ("queries", "db_ms", "spans")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_ms = 0.0
+        self.spans: dict[str, float] | None = None
+
+
+pools: dict[str, PoolStats] = {}
+routes: dict[str, RouteStats] = {}
+slow_queries: deque[dict] = deque(maxlen=settings.DB_SLOW_QUERY_LOG_SIZE)
+current_request: ContextVar[RequestStats | None] = ContextVar("current_request", default=None)
+current_route: ContextVar[str | None] = ContextVar("current_route", default=None)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """
+    커넥션 체크아웃 대기 시간과 타임아웃 횟수를 기록하는 커넥션 풀입니다.
+    엔진의 pool_logging_name으로 pools 항목을 찾으므로 dispose() 후 다시 만들어진 풀도 같은 항목에 기록합니다.
+    """
+    def _do_get(self):
+        stats = pools.get(self._orig_logging_name)
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            if stats:
+                stats.timeouts += 1
+            raise
+        finally:
+            if stats:
+                stats.checkout.add((time.perf_counter() - start) * 1000)
+                stats.peak_checked_out = max(stats.peak_checked_out, self.checkedout())
+
+
+def register_pool(name: str, limit: int):
+    pools.setdefault(name, PoolStats(limit))
+
+
+def instrument_engine(engine: AsyncEngine, name: str):
+    """
+    엔진에서 실행되는 모든 쿼리의 소요 시간을 측정하여 요청별 쿼리 수/DB 시간을 집계하고,
+    DB_SLOW_QUERY_MS 이상 걸린 쿼리를 slow_queries에 남깁니다.
+    """
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        ms = (time.perf_counter() - conn.info["query_start"].pop()) * 1000
+        request = current_request.get()
+        if request is not None:
+            request.queries += 1
+            request.db_ms += ms
+        if ms >= settings.DB_SLOW_QUERY_MS:
+            slow_queries.append({
+                "engine": name,
+                "route": current_route.get(),
+                "duration_ms": round(ms, 3),
+                "statement": statement[:1000],
+                "executemany": executemany,
+                "at": datetime.now().isoformat(timespec="seconds"),
+            })
+
+
+def snapshot(engines: dict[str, AsyncEngine]) -> dict:
+    """
+    /api/metrics/db 응답: 풀 상태(사용률, 체크아웃 대기 시간), 느린 쿼리, 라우트별 쿼리 수
+    """
+    pool_metrics = {}
+    for name, engine in engines.items():
+        pool = engine.sync_engine.pool
+        stats = pools.get(name)
+        item = {"status": pool.status()}
+        if isinstance(pool, TimedQueuePool) and stats:
+            checked_out = pool.checkedout()
+            item.update({
+                "size": pool.size(),
+                "checked_out": checked_out,
+                "overflow": pool.overflow(),
+                "limit": stats.limit,
+                "saturation": round(checked_out / stats.limit, 3) if stats.limit else 0.0,
+                "peak_checked_out": stats.peak_checked_out,
+                "timeouts": stats.timeouts,
+                "checkout": stats.checkout.summary(),
+            })
+        pool_metrics[name] = item
+
+    return {
+        "pools": pool_metrics,
+        "slow_query_ms": settings.DB_SLOW_QUERY_MS,
+        "slow_queries": list(slow_queries),
+        "routes": {
+            name: {
+                "requests": stats.requests,
+                "queries": stats.queries,
+                "avg_queries": round(stats.queries / stats.requests, 2) if stats.requests else 0.0,
+                "max_queries": stats.max_queries,
+                "avg_db_ms": round(stats.db_ms / stats.requests, 3) if stats.requests else 0.0,
+            }
+            for name, stats in sorted(routes.items())
+        },
+    }
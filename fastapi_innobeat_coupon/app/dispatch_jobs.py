@@ -0,0 +1,293 @@
+import asyncio
+import os
+import socket
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, or_, update
+from sqlalchemy.future import select
+
+from . import crud, models
+from .config import settings
+from .coufun import get_coufun_client
+from .database import SessionLocal
+from .issuance import issue_dispatch_coupons
+from .jobs import Job, jobs
+from .recipient_upload import delete_staged
+from .scheduler import scheduler
+from .ums import write_dispatch_messages
+
+# 발송 건 점유(claimed_by)에 기록하는 워커 식별자
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+EXECUTOR_JOB_ID = "dispatch-executor"
+
+# 이 워커에서 처리 중인 발송 건 ID
+_running: set[int] = set()
+
+
+async def _set_status(dispatch_id: int, status: str, **values):
+    """
+    이 워커가 점유한 발송 건의 상태를 바꿉니다. 다른 워커가 점유를 가져간 경우에는 바꾸지 않습니다.
+    """
+    async with SessionLocal() as session:
+        await session.execute(
+            update(models.Dispatch)
+            .where(models.Dispatch.id == dispatch_id, models.Dispatch.claimed_by == WORKER_ID)
+            .values(status=status, **values)
+        )
+        await session.commit()
+
+
+async def _heartbeat(dispatch_id: int):
+    # 작업이 진행되는 동안 점유 시각을 갱신합니다.
+    while True:
+        await asyncio.sleep(settings.DISPATCH_LEASE_SEC / 3)
+        try:
+            async with SessionLocal() as session:
+                await session.execute(
+                    update(models.Dispatch)
+                    .where(models.Dispatch.id == dispatch_id, models.Dispatch.claimed_by == WORKER_ID)
+                    .values(claimed_at=datetime.now())
+                )
+                await session.commit()
+        except Exception as e:
+            print(f"{dispatch_id}번 발송 건 점유 갱신 중 오류 발생: {e}")
+
+
+def _retry_at(attempts: int) -> datetime:
+    return datetime.now() + timedelta(seconds=settings.DISPATCH_RETRY_BACKOFF_SEC * 2 ** max(attempts - 1, 0))
+
+
+async def _finish_if_empty(dispatch_id: int) -> bool:
+    """
+    적재한 수신자가 없으면(모두 중복으로 제외됨) 쿠폰 발급/발송을 진행하지 않고 failed로 끝냅니다.
+    """
+    async with SessionLocal() as session:
+        quantity = await session.scalar(select(models.Dispatch.quantity).where(models.Dispatch.id == dispatch_id))
+    if quantity:
+        return False
+    await _set_status(
+        dispatch_id, "failed", claimed_by=None, claimed_at=None, finished_at=datetime.now(),
+        error="중복을 제외하면 발송할 수신자가 없습니다.",
+    )
+    print(f"{dispatch_id}번 발송 건은 중복을 제외하면 수신자가 없어 발송하지 않습니다.")
+    return True
+
+
+async def load_dispatch(job: Job, dispatch_id: int, phone_numbers: list[str], upload_id: int | None = None):
+    """
+    발송 건의 수신자 목록(또는 업로드된 수신자 파일)을 청크 단위로 적재하고 발송 대기(scheduled) 상태로 바꿉니다.
+    중복을 제외하여 적재한 수신자가 없으면 발송하지 않고 failed로 끝냅니다.
+    쿠폰 발급과 MMS 발송 요청은 발송 시각이 되면 run_due_dispatches가 진행합니다.
+    요청 처리용 세션과 분리된 별도 세션을 사용합니다.
+    """
+    heartbeat = asyncio.create_task(_heartbeat(dispatch_id))
+    try:
+        async with SessionLocal() as session:
+            job.set_stage("load", job.total)
+            if upload_id is not None:
+                await crud.copy_staged_recipients(
+                    session,
+                    dispatch_id=dispatch_id,
+                    upload_id=upload_id,
+                    chunk_size=settings.RECIPIENT_INSERT_CHUNK_SIZE,
+                    dedup_days=settings.DISPATCH_DEDUP_DAYS,
+                    on_progress=job.advance,
+                )
+            else:
+                await crud.bulk_insert_recipients(
+                    session,
+                    dispatch_id=dispatch_id,
+                    phone_numbers=phone_numbers,
+                    chunk_size=settings.RECIPIENT_INSERT_CHUNK_SIZE,
+                    dedup_days=settings.DISPATCH_DEDUP_DAYS,
+                    on_progress=job.advance,
+                )
+        print(f"{dispatch_id}번 발송 건 수신자 {job.processed}건 적재 완료. (중복 제외 포함)")
+    finally:
+        heartbeat.cancel()
+
+    if not await _finish_if_empty(dispatch_id):
+        await _set_status(dispatch_id, "scheduled", claimed_by=None, claimed_at=None)
+        wake_executor()
+    if upload_id is not None:
+        # 적재가 끝난(loading 상태를 벗어난) 뒤에 삭제하므로 중단된 복사를 이어서 진행할 때는 번호가 남아 있습니다.
+        # 중단 후 이어서 적재한 업로드의 번호는 purge_staged_recipients가 삭제합니다.
+        await delete_staged(upload_id)
+
+
+async def execute_dispatch(job: Job, dispatch_id: int, attempts: int, resume_load: bool = False):
+    """
+    점유한 발송 건의 쿠폰을 발급하고 LG U+ UMS_MSG 테이블에 MMS 발송 요청을 적재합니다.
+    두 단계 모두 처리되지 않은 수신자만 이어서 진행하므로, 중단 후 다른 워커가 다시 실행해도 중복 발급/발송되지 않습니다.
+
+    발급에 실패한 수신자가 있으면 발급된 수신자의 발송 요청은 적재하고, 재시도 횟수(DISPATCH_MAX_ATTEMPTS)가 남아 있으면
+    백오프 후 다시 점유되도록 scheduled로 돌려놓습니다. 재시도 횟수를 모두 썼거나 남은 실패가 수동 확인이 필요한
+    TR_ID 중복뿐이면 partial(일부 발급) 또는 failed(발급 0건)로 끝냅니다.
+    """
+    heartbeat = asyncio.create_task(_heartbeat(dispatch_id))
+    try:
+        async with SessionLocal() as session:
+            dispatch = (await session.execute(
+                select(models.Dispatch.upload_id, models.Dispatch.quantity, models.Dispatch.dispatch_datetime)
+                .filter(models.Dispatch.id == dispatch_id)
+            )).first()
+
+            if resume_load:
+                job.set_stage("load", dispatch.quantity)
+                await crud.copy_staged_recipients(
+                    session,
+                    dispatch_id=dispatch_id,
+                    upload_id=dispatch.upload_id,
+                    chunk_size=settings.RECIPIENT_INSERT_CHUNK_SIZE,
+                    dedup_days=settings.DISPATCH_DEDUP_DAYS,
+                    on_progress=job.advance,
+                )
+                if await _finish_if_empty(dispatch_id):
+                    return
+                if dispatch.dispatch_datetime > datetime.now() + timedelta(seconds=settings.DISPATCH_LEAD_SEC):
+                    # 아직 발송 시각 전이면 대기 상태로 돌려놓습니다.
+                    await _set_status(dispatch_id, "scheduled", claimed_by=None, claimed_at=None)
+                    return
+                await _set_status(dispatch_id, "running")
+
+            job.set_stage("issue", dispatch.quantity)
+            summary = await issue_dispatch_coupons(session, get_coufun_client(), dispatch_id, on_progress=job.advance)
+            print(f"{dispatch_id}번 발송 건 쿠폰 발급 완료: 성공 {summary['issued']}건, 실패 {summary['failed']}건 (수동 확인 필요 {summary['duplicated']}건)")
+
+            job.set_stage("send", summary["issued"])
+            written = await write_dispatch_messages(session, dispatch_id, on_progress=job.advance)
+            print(f"{dispatch_id}번 발송 건 MMS 발송 요청 {written}건 적재 완료.")
+
+        if not summary["failed"]:
+            await _set_status(dispatch_id, "sent", finished_at=datetime.now(), error=None)
+            return
+        error = f"쿠폰 발급 실패 {summary['failed']}건"
+        if summary["duplicated"]:
+            error += f" (TR_ID 중복으로 수동 확인 필요 {summary['duplicated']}건)"
+        if attempts < settings.DISPATCH_MAX_ATTEMPTS and summary["failed"] > summary["duplicated"]:
+            retry_at = _retry_at(attempts)
+            await _set_status(dispatch_id, "scheduled", claimed_by=None, claimed_at=None, next_attempt_at=retry_at, error=error)
+            print(f"{dispatch_id}번 발송 건 {error}, {retry_at:%H:%M:%S}에 다시 시도합니다.")
+            return
+        status = "partial" if await _issued_count(dispatch_id) else "failed"
+        await _set_status(dispatch_id, status, finished_at=datetime.now(), error=error)
+    except Exception as e:
+        # 재시도 횟수가 남아 있으면 점유를 풀어 백오프 후 다시 점유되도록 합니다.
+        if attempts >= settings.DISPATCH_MAX_ATTEMPTS:
+            status = "failed"
+        else:
+            status = "loading" if job.stage == "load" else "scheduled"
+        await _set_status(
+            dispatch_id, status, claimed_by=None, claimed_at=None, next_attempt_at=_retry_at(attempts), error=str(e)[:500],
+        )
+        raise
+    finally:
+        heartbeat.cancel()
+        _running.discard(dispatch_id)
+
+
+async def _issued_count(dispatch_id: int) -> int:
+    async with SessionLocal() as session:
+        return await session.scalar(
+            select(func.count())
+            .select_from(models.Recipient)
+            .filter(models.Recipient.dispatch_id == dispatch_id, models.Recipient.coupon_code.is_not(None))
+        )
+
+
+async def claim_due_dispatches(limit: int) -> list[dict]:
+    """
+    처리할 발송 건을 최대 limit건 점유하고 (id, status, attempts, quantity) 목록을 반환합니다.
+    - 발송 시각(DISPATCH_LEAD_SEC 전)이 된 scheduled 건 (발송 시각 순, 실패 후 재시도 대기 중인 건은 next_attempt_at 이후)
+    - 점유 갱신이 DISPATCH_LEASE_SEC 이상 끊긴 loading/running 건 (워커 재시작 등으로 중단된 작업)
+    SELECT ... FOR UPDATE SKIP LOCKED로 잠그므로 여러 워커가 동시에 조회해도 같은 건을 점유하지 않습니다.
+    """
+    now = datetime.now()
+    Dispatch = models.Dispatch
+    claimed = []
+    async with SessionLocal() as session:
+        result = await session.execute(
+            select(Dispatch)
+            .filter(
+                Dispatch.status == "scheduled",
+                Dispatch.dispatch_datetime <= now + timedelta(seconds=settings.DISPATCH_LEAD_SEC),
+                or_(Dispatch.next_attempt_at.is_(None), Dispatch.next_attempt_at <= now),
+            )
+            .order_by(Dispatch.dispatch_datetime, Dispatch.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        dispatches = list(result.scalars().all())
+        if len(dispatches) < limit:
+            result = await session.execute(
+                select(Dispatch)
+                .filter(
+                    Dispatch.status.in_(("loading", "running")),
+                    or_(Dispatch.claimed_at.is_(None), Dispatch.claimed_at < now - timedelta(seconds=settings.DISPATCH_LEASE_SEC)),
+                    or_(Dispatch.next_attempt_at.is_(None), Dispatch.next_attempt_at <= now),
+                )
+                .order_by(Dispatch.dispatch_datetime, Dispatch.id)
+                .limit(limit - len(dispatches))
+                .with_for_update(skip_locked=True)
+            )
+            dispatches.extend(result.scalars().all())
+
+        for dispatch in dispatches:
+            if (dispatch.attempts or 0) >= settings.DISPATCH_MAX_ATTEMPTS:
+                dispatch.status = "failed"
+                dispatch.error = dispatch.error or "재시도 횟수를 초과했습니다."
+                dispatch.claimed_by = None
+                continue
+            if dispatch.status == "loading" and dispatch.upload_id is None:
+                # 요청 본문으로 받은 수신자 목록은 메모리에만 있었으므로 이어서 적재할 수 없습니다.
+                dispatch.status = "failed"
+                dispatch.error = "수신자 목록 적재가 중단되었습니다. 발송을 다시 요청해 주세요."
+                dispatch.claimed_by = None
+                continue
+            if dispatch.status == "scheduled":
+                dispatch.status = "running"
+            dispatch.claimed_by = WORKER_ID
+            dispatch.claimed_at = now
+            dispatch.attempts = (dispatch.attempts or 0) + 1
+            claimed.append({"id": dispatch.id, "status": dispatch.status, "attempts": dispatch.attempts, "quantity": dispatch.quantity or 0})
+        await session.commit()
+    return claimed
+
+
+async def run_due_dispatches():
+    """
+    처리할 발송 건을 점유하여 백그라운드 작업으로 실행합니다. 스케줄러가 주기적으로 호출합니다.
+    워커당 동시에 DISPATCH_MAX_CONCURRENT건까지만 실행하고 나머지는 다음 주기나 다른 워커가 처리하므로,
+    같은 시각에 예약된 발송이 몰려도 쿠폰 발급/UMS 적재 부하가 한꺼번에 몰리지 않습니다.
+    """
+    slots = settings.DISPATCH_MAX_CONCURRENT - len(_running)
+    if slots <= 0:
+        return
+    for dispatch in await claim_due_dispatches(slots):
+        _running.add(dispatch["id"])
+        resume_load = dispatch["status"] == "loading"
+        if resume_load:
+            print(f"{dispatch['id']}번 발송 건의 중단된 수신자 적재를 이어서 진행합니다.")
+        jobs.start("dispatch", execute_dispatch, dispatch["id"], dispatch["attempts"], resume_load, total=dispatch["quantity"])
+
+
+def schedule_dispatch_executor(scheduler):
+    scheduler.add_job(
+        run_due_dispatches,
+        "interval",
+        seconds=settings.DISPATCH_POLL_INTERVAL_SEC,
+        id=EXECUTOR_JOB_ID,
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True,
+    )
+
+
+def wake_executor():
+    """
+    다음 주기를 기다리지 않고 발송 실행을 바로 확인하도록 스케줄러 작업을 앞당깁니다.
+    """
+    job = scheduler.get_job(EXECUTOR_JOB_ID)
+    if job is not None:
+        job.modify(next_run_time=datetime.now(job.trigger.timezone))
@@ -0,0 +1,280 @@
+import asyncio
+import fcntl
+import glob
+import json
+import os
+import socket
+import time
+import uuid
+from datetime import datetime
+from urllib.parse import parse_qsl
+
+from . import crud
+from .config import settings
+from .database import SessionLocal
+
+# 교환정보 STATUS -> 수신자 쿠폰 상태 (MyDocuments/01_쿠폰공급사API/5.교환정보)
+EXCHANGE_STATUS = {
+    "000": "미교환",  # 미사용 (사용취소)
+    "001": "교환",    # 사용
+    "100": "폐기",    # 취소
+}
+
+# 응답 코드
+RESULT_OK = "00"
+RESULT_IP_NOT_ALLOWED = "01"
+RESULT_ERROR = "99"
+
+
+def parse_exchange_body(body: bytes) -> dict[str, str]:
+    """
+    application/x-www-form-urlencoded 요청 본문을 파싱합니다. 지점명 등은 EUC-KR로 인코딩되어 전달됩니다.
+    """
+    return dict(parse_qsl(body.decode("latin-1"), encoding="euc-kr", errors="replace"))
+
+
+def _parse_exchange_date(value: str | None) -> datetime | None:
+    try:
+        return datetime.strptime(value, "%Y%m%d%H%M%S") if value else None
+    except ValueError:
+        return None
+
+
+def exchange_response(result_code: str, result_msg: str, exchange_id: str | None = None) -> bytes:
+    exchange_id_tag = f"<EXCHANGE_ID>{exchange_id}</EXCHANGE_ID>" if exchange_id else ""
+    return (
+        '<?xml version="1.0" encoding="EUC-KR"?>'
+        f"<COUPONEXCHANGE><RESULTCODE>{result_code}</RESULTCODE><RESULTMSG>{result_msg}</RESULTMSG>{exchange_id_tag}</COUPONEXCHANGE>"
+    ).encode("euc-kr")
+
+
+class ExchangeQueue:
+    """
+    쿠펀 교환정보 콜백을 모아 두었다가 주기적으로 한꺼번에 DB에 반영하는 큐입니다.
+
+    쿠폰번호(BARCODE_NUM)를 키로 가장 최근(EXCHANGE_DATE 기준) 이벤트만 남기므로 재전송이나 같은 쿠폰의 연속된 이벤트는
+    하나로 합쳐지고, 반영은 flush_batch_size건씩 crud.apply_recipient_status_changes로 처리합니다.
+    journal_dir을 지정하면 받은 이벤트를 JSONL 파일에 먼저 기록하여 프로세스가 재시작되어도 반영되지 않은 이벤트를 복구합니다.
+    저널 파일 쓰기는 이벤트 루프를 막지 않도록 별도 스레드에서 수행합니다.
+
+    여러 워커가 같은 journal_dir을 사용할 수 있도록 저널 파일 이름에 프로세스(호스트명-PID)를 넣고,
+    프로세스는 실행되는 동안 자신의 잠금 파일(exchange-<호스트명-PID>.lock)을 flock으로 잠가 둡니다.
+    복구 시에는 잠금을 얻을 수 있는(프로세스가 종료된) 소유자의 저널 파일만 가져옵니다.
+    """
+    def __init__(self, journal_dir: str = "", flush_batch_size: int = 1000):
+        self.journal_dir = journal_dir
+        self.flush_batch_size = flush_batch_size
+        self.owner = f"{socket.gethostname()}-{os.getpid()}"
+        self._pending: dict[str, dict] = {}
+        self._lock = asyncio.Lock()
+        # 저널 쓰기와 _pending 반영, 저널 파일 교체(flush)를 직렬화합니다.
+        self._journal_lock = asyncio.Lock()
+        self._journal = None
+        self._owner_lock = None
+        # 반영이 끝나면 삭제할 닫힌 저널 파일
+        self._closed_segments: list[str] = []
+        self._flush_task: asyncio.Task | None = None
+        self.metrics = {
+            "received": 0,
+            "coalesced": 0,
+            "applied": 0,
+            "flushes": 0,
+            "last_flush_at": None,
+            "last_flush_seconds": None,
+            "last_error": None,
+        }
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def _merge(self, event: dict) -> bool:
+        # 같은 쿠폰의 이벤트는 EXCHANGE_DATE가 더 늦은(같으면 나중에 받은) 것만 남깁니다.
+        current = self._pending.get(event["barcode"])
+        if current is not None and (current["exchanged_at"] or "") > (event["exchanged_at"] or ""):
+            return True
+        self._pending[event["barcode"]] = event
+        return current is not None
+
+    def _write_journal(self, event: dict):
+        # 별도 스레드에서 실행됩니다.
+        if self._journal is None:
+            self._hold_owner_lock()
+            self._journal = open(self._segment_path(), "a", encoding="utf-8")
+        self._journal.write(json.dumps(event, ensure_ascii=False) + "\n")
+        self._journal.flush()
+
+    def _close_journal(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._closed_segments.append(self._journal.name)
+            self._journal = None
+
+    async def put(self, fields: dict[str, str]) -> str:
+        """
+        교환정보 이벤트를 큐에 넣고 처리 ID를 반환합니다. 검증에 실패하면 ValueError를 발생시킵니다.
+        """
+        barcode = (fields.get("BARCODE_NUM") or "").strip()
+        status = EXCHANGE_STATUS.get((fields.get("STATUS") or "").strip())
+        if not barcode or status is None:
+            raise ValueError("BARCODE_NUM 또는 STATUS가 올바르지 않습니다.")
+        exchanged_at = _parse_exchange_date(fields.get("EXCHANGE_DATE"))
+        event = {
+            "id": uuid.uuid4().hex,
+            "barcode": barcode,
+            "status": status,
+            "exchanged_at": exchanged_at.isoformat() if exchanged_at else None,
+        }
+        async with self._journal_lock:
+            # 저널에 기록한 이벤트는 같은 저널 파일을 닫는 flush의 반영 대상에 반드시 포함되도록 잠금 안에서 큐에 넣습니다.
+            if self.journal_dir:
+                await asyncio.to_thread(self._write_journal, event)
+            self.metrics["received"] += 1
+            if self._merge(event):
+                self.metrics["coalesced"] += 1
+        if len(self._pending) >= self.flush_batch_size and self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_soon())
+        return event["id"]
+
+    async def _flush_soon(self):
+        try:
+            await self.flush()
+        finally:
+            self._flush_task = None
+
+    def _segment_path(self) -> str:
+        return os.path.join(self.journal_dir, f"exchange-{self.owner}-{time.time_ns()}.jsonl")
+
+    def _owner_lock_path(self, owner: str) -> str:
+        return os.path.join(self.journal_dir, f"exchange-{owner}.lock")
+
+    def _hold_owner_lock(self):
+        # 잠금은 프로세스가 종료되면 운영체제가 해제합니다.
+        if self._owner_lock is None:
+            os.makedirs(self.journal_dir, exist_ok=True)
+            self._owner_lock = open(self._owner_lock_path(self.owner), "a")
+            fcntl.flock(self._owner_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def _owner_running(self, owner: str) -> bool:
+        if owner == self.owner:
+            # 복구는 이 프로세스가 저널을 쓰기 전(시작 시)에 실행되므로,
+            # 같은 이름의 저널은 같은 호스트명/PID로 재시작되기 전의 프로세스가 남긴 것입니다.
+            return False
+        try:
+            fd = os.open(self._owner_lock_path(owner), os.O_RDWR)
+        except FileNotFoundError:
+            return False
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        finally:
+            os.close(fd)
+        return False
+
+    def recover(self) -> int:
+        """
+        저널 디렉터리에 남은 이벤트 중 종료된 프로세스가 반영하지 못한 것을 큐에 다시 넣고 건수를 반환합니다.
+        실행 중인 다른 워커의 저널 파일은 건드리지 않으며, 가져온 파일은 이 프로세스 이름으로 바꿔
+        동시에 시작한 다른 워커가 같은 파일을 중복으로 가져가지 않도록 합니다.
+        """
+        if not self.journal_dir:
+            return 0
+        self._hold_owner_lock()
+        recovered = 0
+        running: dict[str, bool] = {}
+        for path in sorted(glob.glob(os.path.join(self.journal_dir, "exchange-*.jsonl"))):
+            # exchange-<소유자>-<생성 시각>.jsonl
+            owner = os.path.basename(path)[len("exchange-"):-len(".jsonl")].rsplit("-", 1)[0]
+            if owner not in running:
+                running[owner] = self._owner_running(owner)
+            if running[owner]:
+                continue
+            claimed = self._segment_path()
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue  # 다른 워커가 먼저 가져감
+            path = claimed
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self._merge(json.loads(line))
+                        recovered += 1
+                    except (ValueError, KeyError):
+                        continue  # 기록 중 중단된 마지막 줄
+            self._closed_segments.append(path)
+        # 종료된 프로세스의 잠금 파일은 저널을 가져온 뒤 삭제합니다.
+        for owner, is_running in running.items():
+            if not is_running and owner != self.owner:
+                try:
+                    os.remove(self._owner_lock_path(owner))
+                except FileNotFoundError:
+                    pass
+        return recovered
+
+    async def flush(self) -> int:
+        """
+        모아 둔 이벤트를 DB에 반영하고 반영된(상태가 바뀐) 수신자 수를 반환합니다.
+        실패하면 이벤트를 큐에 되돌려 다음 주기에 다시 시도합니다.
+        """
+        async with self._lock:
+            if not self._pending:
+                return 0
+            started = time.monotonic()
+            async with self._journal_lock:
+                batch, self._pending = self._pending, {}
+                await asyncio.to_thread(self._close_journal)
+            segments = list(self._closed_segments)
+
+            events = list(batch.values())
+            applied = 0
+            try:
+                async with SessionLocal() as session:
+                    for start in range(0, len(events), self.flush_batch_size):
+                        chunk = events[start:start + self.flush_batch_size]
+                        applied += await crud.apply_recipient_status_changes(
+                            session,
+                            {event["barcode"]: event["status"] for event in chunk},
+                            changed_at={
+                                event["barcode"]: datetime.fromisoformat(event["exchanged_at"])
+                                for event in chunk if event["exchanged_at"]
+                            },
+                        )
+                        # 반영된 이벤트는 큐에 되돌리지 않습니다.
+                        for event in chunk:
+                            del batch[event["barcode"]]
+            except Exception as e:
+                print(f"[교환정보] 반영 중 오류 발생: {e}")
+                self.metrics["last_error"] = str(e)
+                for event in batch.values():
+                    self._merge(event)
+                return applied
+
+            for path in segments:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            self._closed_segments = [path for path in self._closed_segments if path not in segments]
+            self.metrics["applied"] += applied
+            self.metrics["flushes"] += 1
+            self.metrics["last_flush_at"] = datetime.now()
+            self.metrics["last_flush_seconds"] = round(time.monotonic() - started, 3)
+            self.metrics["last_error"] = None
+            return applied
+
+
+exchange_queue = ExchangeQueue(settings.EXCHANGE_JOURNAL_DIR, settings.EXCHANGE_FLUSH_BATCH_SIZE)
+
+
+def schedule_exchange_flush(scheduler):
+    scheduler.add_job(
+        exchange_queue.flush,
+        "interval",
+        seconds=settings.EXCHANGE_FLUSH_INTERVAL_SEC,
+        id="coufun-exchange-flush",
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True,
+    )
@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .config import settings
+from .database import SessionLocal, engine
+from .migrate import LATEST_VERSION, current_version
+from .product_index import product_index
+
+# 준비 상태 확인 시 DB 응답을 기다리는 최대 시간(초)
+READY_DB_TIMEOUT_SEC = 2.0
+
+state = {
+    # 워커 시작 준비(커넥션 풀/캐시 예열)가 끝났는지
+    "warmed": False,
+    # DB 스키마 버전 (필요한 버전 이상이 확인된 뒤에는 다시 조회하지 않음)
+    "schema_version": None,
+    "warm_seconds": None,
+}
+
+# 시작 시 예열한 엔진 목록 (준비 상태 확인에서 재시도할 때 같은 엔진을 예열)
+_warm_engines: list[AsyncEngine] = [engine]
+
+
+async def warm_pool(target: AsyncEngine, connections: int):
+    """
+    커넥션 connections개를 동시에 열어 한 번씩 사용한 뒤 풀에 돌려놓습니다.
+    """
+    async def ping():
+        async with target.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(ping() for _ in range(connections)))
+
+
+async def check_schema() -> bool:
+    """
+    DB 스키마 버전이 이 코드가 요구하는 버전(LATEST_VERSION) 이상인지 확인합니다.
+    순차 배포 중에는 새 버전의 마이그레이션이 먼저 적용될 수 있으므로 더 높은 버전도 준비된 것으로 봅니다.
+    """
+    if state["schema_version"] is None or state["schema_version"] < LATEST_VERSION:
+        async with engine.connect() as conn:
+            state["schema_version"] = await current_version(conn)
+    return state["schema_version"] >= LATEST_VERSION
+
+
+async def warm_up(engines: list[AsyncEngine]):
+    """
+    워커 시작 시 스키마 버전을 확인하고, 커넥션 풀과 상품 색인을 미리 준비합니다.
+    실패해도 워커는 시작되며, 준비 상태 확인(/health/ready)이 성공할 때까지 트래픽을 받지 않습니다.
+    """
+    global _warm_engines
+    _warm_engines = engines
+    started = time.monotonic()
+    try:
+        if not await check_schema():
+            print(f"[시작] DB 스키마 버전({state['schema_version']})이 필요한 버전({LATEST_VERSION})보다 낮습니다. python -m app.migrate를 실행해 주세요.")
+            return
+        for target in engines:
+            await warm_pool(target, settings.DB_POOL_WARM)
+        async with SessionLocal() as session:
+            await product_index.refresh(session)
+        state["warmed"] = True
+        state["warm_seconds"] = round(time.monotonic() - started, 3)
+    except Exception as e:
+        print(f"[시작] 워커 준비 중 오류 발생: {e}")
+
+
+async def readiness() -> tuple[bool, dict]:
+    """
+    (준비 여부, 항목별 결과)를 반환합니다. DB 확인은 SELECT 1 한 번이며 READY_DB_TIMEOUT_SEC 안에 응답해야 합니다.
+    시작 준비가 실패했던 경우에는 여기서 다시 시도합니다.
+    """
+    checks = {}
+    try:
+        await asyncio.wait_for(warm_pool(engine, 1), READY_DB_TIMEOUT_SEC)
+        checks["db"] = "ok"
+    except Exception as e:
+        checks["db"] = f"error: {str(e) or type(e).__name__}"
+        return False, checks
+
+    if not await check_schema():
+        checks["schema"] = f"version {state['schema_version']} < {LATEST_VERSION}"
+        return False, checks
+    checks["schema"] = "ok"
+
+    if not state["warmed"]:
+        await warm_up(_warm_engines)
+    checks["warm"] = "ok" if state["warmed"] else "pending"
+    return state["warmed"], checks
@@ -0,0 +1,102 @@
+import hashlib
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException, Request, Response
+from pydantic import BaseModel
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+from .config import settings
+from .database import SessionLocal
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 100
+
+
+def request_key(request: Request) -> str | None:
+    """
+    요청의 Idempotency-Key 헤더 값을 반환합니다. 헤더가 없으면 None을 반환합니다.
+    """
+    key = request.headers.get(HEADER, "").strip()
+    if not key:
+        return None
+    if len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"{HEADER}는 {MAX_KEY_LENGTH}자 이하여야 합니다.")
+    return key
+
+
+def fingerprint(request: Request, body: BaseModel) -> str:
+    """
+    요청 메서드/경로와 검증된 요청 본문의 SHA-256을 반환합니다.
+    원본 JSON이 아닌 검증된 모델을 직렬화하므로 키 순서나 공백이 달라도 같은 요청으로 봅니다.
+    """
+    content = f"{request.method} {request.url.path}\n{body.model_dump_json()}"
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+async def find(db: AsyncSession, key: str) -> models.IdempotencyKey | None:
+    """
+    저장된 키를 조회합니다. 보관 기간(IDEMPOTENCY_KEY_TTL_HOURS)이 지난 키는 삭제하고 None을 반환합니다.
+    """
+    record = await db.get(models.IdempotencyKey, key)
+    if record is not None and record.created_at < datetime.now() - timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS):
+        await db.delete(record)
+        await db.commit()
+        return None
+    return record
+
+
+def save(db: AsyncSession, key: str, request_fingerprint: str, response: BaseModel, status_code: int, dispatch_id: int | None = None):
+    """
+    응답을 키와 함께 세션에 추가합니다. 요청 처리 결과와 같은 트랜잭션으로 커밋해야 하며,
+    같은 키의 요청이 동시에 처리되면 먼저 커밋한 쪽만 성공하고 나머지는 커밋 시 IntegrityError가 발생합니다.
+    """
+    db.add(models.IdempotencyKey(
+        key=key,
+        fingerprint=request_fingerprint,
+        dispatch_id=dispatch_id,
+        status_code=status_code,
+        response_body=response.model_dump_json(),
+        created_at=datetime.now(),
+    ))
+
+
+def replay(record: models.IdempotencyKey, request_fingerprint: str) -> Response:
+    """
+    저장된 응답을 그대로 반환합니다. 같은 키로 내용이 다른 요청을 보낸 경우에는 422를 반환합니다.
+    """
+    if record.fingerprint != request_fingerprint:
+        raise HTTPException(status_code=422, detail=f"같은 {HEADER}로 내용이 다른 요청이 이미 처리되었습니다.")
+    return Response(
+        content=record.response_body,
+        status_code=record.status_code,
+        media_type="application/json",
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+async def purge_expired():
+    """
+    보관 기간이 지난 키를 삭제합니다. 스케줄러가 주기적으로 호출합니다.
+    """
+    async with SessionLocal() as session:
+        result = await session.execute(
+            delete(models.IdempotencyKey)
+            .where(models.IdempotencyKey.created_at < datetime.now() - timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS))
+        )
+        await session.commit()
+    if result.rowcount:
+        print(f"[Idempotency-Key] 보관 기간이 지난 키 {result.rowcount}건을 삭제했습니다.")
+
+
+def schedule_idempotency_purge(scheduler):
+    scheduler.add_job(
+        purge_expired,
+        "interval",
+        hours=1,
+        id="idempotency-key-purge",
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True,
+    )
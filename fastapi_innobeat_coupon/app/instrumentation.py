@@ -0,0 +1,313 @@
+import cProfile
+import io
+import pstats
+import random
+import time
+import uuid
+from bisect import bisect_left
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+
+from . import db_metrics
+from .config import settings
+from .db_metrics import RequestStats, RouteStats, current_request, current_route
+
+# 히스토그램 구간 상한(초). Prometheus 기본 구간과 같습니다.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROFILE_HEADER = b"x-profile"
+
+
+class Histogram:
+    """
+    고정 구간 히스토그램. 관측마다 구간 카운터 하나만 증가시키므로 운영 중에도 부담이 작습니다.
+    """
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+
+class HttpRouteMetrics:
+    __slots__ = ("duration", "db_seconds", "python_seconds", "queries", "statuses")
+
+    def __init__(self):
+        self.duration = Histogram()
+        self.db_seconds = 0.0
+        self.python_seconds = 0.0
+        self.queries = 0
+        self.statuses: Counter = Counter()
+
+
+http_routes: dict[tuple[str, str], HttpRouteMetrics] = {}
+spans: dict[str, Histogram] = {}
+slow_requests: deque[dict] = deque(maxlen=settings.SLOW_REQUEST_LOG_SIZE)
+profiles: deque[dict] = deque(maxlen=settings.PROFILE_KEEP)
+# cProfile은 스레드당 하나만 실행할 수 있으므로 동시에 한 요청만 프로파일링합니다.
+_profiling = False
+
+
+def record_span(name: str, seconds: float):
+    """
+    구간(span) 소요 시간을 전체 히스토그램과 현재 요청의 구간별 합계에 기록합니다.
+    """
+    histogram = spans.get(name)
+    if histogram is None:
+        histogram = spans[name] = Histogram()
+    histogram.observe(seconds)
+    request = current_request.get()
+    if request is not None:
+        if request.spans is None:
+            request.spans = {}
+        request.spans[name] = request.spans.get(name, 0.0) + seconds * 1000
+
+
+@contextmanager
+def span(name: str):
+    """
+    with span("coufun.coufunCreate"): 블록의 소요 시간을 기록합니다. (await를 포함한 블록도 사용 가능)
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - start)
+
+
+# ORM flush/commit 소요 시간 (commit 시간에는 commit 중 수행된 flush가 포함됩니다)
+@event.listens_for(Session, "before_flush")
+def _before_flush(session, flush_context, instances):
+    session.info["flush_start"] = time.perf_counter()
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _after_flush(session, flush_context):
+    start = session.info.pop("flush_start", None)
+    if start is not None:
+        record_span("orm.flush", time.perf_counter() - start)
+
+
+@event.listens_for(Session, "before_commit")
+def _before_commit(session):
+    session.info["commit_start"] = time.perf_counter()
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    start = session.info.pop("commit_start", None)
+    if start is not None:
+        record_span("orm.commit", time.perf_counter() - start)
+
+
+def _route_name(scope) -> str:
+    # 라우트 템플릿 (예: /api/dispatches/{dispatch_id}). 매칭되지 않은 경로는 하나로 묶어 레이블 수가 늘지 않도록 합니다.
+    route = scope.get("route")
+    return getattr(route, "path", None) or "<unmatched>"
+
+
+def _profile_reason(scope) -> str | None:
+    if settings.PROFILE_HEADER_TOKEN:
+        for name, value in scope.get("headers", ()):
+            if name == PROFILE_HEADER and value.decode("latin-1") == settings.PROFILE_HEADER_TOKEN:
+                return "header"
+    if settings.PROFILE_SAMPLE_RATE and random.random() < settings.PROFILE_SAMPLE_RATE:
+        return "sampled"
+    return None
+
+
+def _profile_text(profiler: cProfile.Profile, limit: int = 40) -> str:
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(limit)
+    return stream.getvalue()
+
+
+class InstrumentationMiddleware:
+    """
+    요청마다 소요 시간, 실행된 쿼리 수, DB 시간(나머지는 Python 시간), 구간(span)별 시간을 라우트별로 집계하는 ASGI 미들웨어입니다.
+    SLOW_REQUEST_MS 이상 걸린 요청은 구간별 시간과 함께 slow_requests에 남기고,
+    X-Profile 헤더(PROFILE_HEADER_TOKEN) 또는 PROFILE_SAMPLE_RATE 비율로 선택된 요청은 cProfile로 프로파일링합니다.
+    프로파일러는 같은 스레드의 다른 요청 처리도 함께 기록하므로 동시 요청이 많을 때는 결과에 섞일 수 있습니다.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global _profiling
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = RequestStats()
+        request_token = current_request.set(request)
+        route_token = current_route.set(f"{scope.get('method', '')} {scope.get('path', '')}")
+        status = 500
+
+        profiler = None
+        profile_id = None
+        reason = _profile_reason(scope)
+        if reason and not _profiling:
+            _profiling = True
+            profile_id = uuid.uuid4().hex
+            profiler = cProfile.Profile()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if reason == "header" and profiler is not None:
+                    message["headers"] = [*message.get("headers", ()), (b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            if profiler is not None:
+                profiler.enable()
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+                _profiling = False
+            current_request.reset(request_token)
+            current_route.reset(route_token)
+            route = _route_name(scope)
+            self._record(scope.get("method", ""), route, status, duration, request)
+            if profiler is not None and (reason == "header" or duration * 1000 >= settings.SLOW_REQUEST_MS):
+                self._keep_profile(profile_id, route, scope, status, duration, reason, profiler)
+            if duration * 1000 >= settings.SLOW_REQUEST_MS:
+                slow_requests.append({
+                    "method": scope.get("method", ""),
+                    "route": route,
+                    "path": scope.get("path", ""),
+                    "status": status,
+                    "duration_ms": round(duration * 1000, 3),
+                    "db_ms": round(request.db_ms, 3),
+                    "python_ms": round(max(duration * 1000 - request.db_ms, 0.0), 3),
+                    "queries": request.queries,
+                    "spans": {name: round(ms, 3) for name, ms in (request.spans or {}).items()},
+                    "profile_id": profile_id,
+                    "at": datetime.now().isoformat(timespec="seconds"),
+                })
+
+    @staticmethod
+    def _record(method: str, route: str, status: int, duration: float, request: RequestStats):
+        metrics = http_routes.get((method, route))
+        if metrics is None:
+            metrics = http_routes[(method, route)] = HttpRouteMetrics()
+        db_seconds = request.db_ms / 1000
+        metrics.duration.observe(duration)
+        metrics.db_seconds += db_seconds
+        metrics.python_seconds += max(duration - db_seconds, 0.0)
+        metrics.queries += request.queries
+        metrics.statuses[status] += 1
+
+        # /api/metrics/db의 라우트별 쿼리 수
+        stats = db_metrics.routes.setdefault(f"{method} {route}", RouteStats())
+        stats.requests += 1
+        stats.queries += request.queries
+        stats.max_queries = max(stats.max_queries, request.queries)
+        stats.db_ms += request.db_ms
+
+    @staticmethod
+    def _keep_profile(profile_id, route, scope, status, duration, reason, profiler):
+        profiles.append({
+            "id": profile_id,
+            "method": scope.get("method", ""),
+            "route": route,
+            "status": status,
+            "duration_ms": round(duration * 1000, 3),
+            "reason": reason,
+            "at": datetime.now().isoformat(timespec="seconds"),
+            "stats": _profile_text(profiler),
+        })
+
+
+def get_profile(profile_id: str) -> dict | None:
+    return next((profile for profile in profiles if profile["id"] == profile_id), None)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+def _histogram_lines(name: str, histogram: Histogram, labels: str) -> list[str]:
+    lines = []
+    cumulative = 0
+    prefix = f"{labels}," if labels else ""
+    for bound, count in zip(BUCKETS, histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {histogram.count}')
+    lines.append(f"{name}_sum{{{labels}}} {histogram.sum:.6f}")
+    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+    return lines
+
+
+def render_metrics(engines: dict[str, AsyncEngine], gauges: dict[str, float] | None = None) -> str:
+    """
+    /metrics 응답 (Prometheus 텍스트 형식)
+    """
+    lines = [
+        "# HELP http_requests_total HTTP requests by route and status.",
+        "# TYPE http_requests_total counter",
+    ]
+    for (method, route), metrics in sorted(http_routes.items()):
+        for status, count in sorted(metrics.statuses.items()):
+            lines.append(f"http_requests_total{{{_labels(method=method, route=route, status=status)}}} {count}")
+
+    lines += [
+        "# HELP http_request_duration_seconds HTTP request latency by route.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for (method, route), metrics in sorted(http_routes.items()):
+        lines += _histogram_lines("http_request_duration_seconds", metrics.duration, _labels(method=method, route=route))
+
+    for name, attr, help_text in (
+        ("http_request_db_seconds_total", "db_seconds", "Time spent executing DB queries while handling requests."),
+        ("http_request_python_seconds_total", "python_seconds", "Request time not spent in DB queries."),
+        ("http_request_queries_total", "queries", "DB queries executed while handling requests."),
+    ):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        for (method, route), metrics in sorted(http_routes.items()):
+            value = getattr(metrics, attr)
+            formatted = f"{value:.6f}" if isinstance(value, float) else str(value)
+            lines.append(f"{name}{{{_labels(method=method, route=route)}}} {formatted}")
+
+    lines += [
+        "# HELP app_span_duration_seconds Duration of instrumented code spans (ORM flush/commit, serialization, vendor calls).",
+        "# TYPE app_span_duration_seconds histogram",
+    ]
+    for name, histogram in sorted(spans.items()):
+        lines += _histogram_lines("app_span_duration_seconds", histogram, _labels(span=name))
+
+    pool_lines = {"db_pool_checked_out": [], "db_pool_limit": [], "db_pool_checkout_timeouts_total": []}
+    for name, engine in engines.items():
+        pool = engine.sync_engine.pool
+        stats = db_metrics.pools.get(name)
+        if isinstance(pool, db_metrics.TimedQueuePool) and stats:
+            pool_lines["db_pool_checked_out"].append(f"db_pool_checked_out{{{_labels(pool=name)}}} {pool.checkedout()}")
+            pool_lines["db_pool_limit"].append(f"db_pool_limit{{{_labels(pool=name)}}} {stats.limit}")
+            pool_lines["db_pool_checkout_timeouts_total"].append(f"db_pool_checkout_timeouts_total{{{_labels(pool=name)}}} {stats.timeouts}")
+    for name, samples in pool_lines.items():
+        if samples:
+            lines += [f"# TYPE {name} {'counter' if name.endswith('_total') else 'gauge'}", *samples]
+
+    for name, value in (gauges or {}).items():
+        lines += [f"# TYPE {name} {'counter' if name.endswith('_total') else 'gauge'}", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
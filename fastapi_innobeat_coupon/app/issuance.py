@@ -0,0 +1,180 @@
+import asyncio
+
+from sqlalchemy import bindparam, delete, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from . import models
+from .config import settings
+from .coufun import MAX_CREATE_CNT, RESULT_TR_ID_DUPLICATED, CoufunClient, CoufunError
+
+# 한 번에 조회하여 발급을 진행할 수신자 수 (키셋 페이지 크기)
+ISSUE_PAGE_SIZE = 1000
+
+# coupon_issue_failures.reason
+REASON_UNKNOWN = "unknown"  # 응답을 받지 못해 발급 여부를 알 수 없음 (같은 TR_ID로 재시도)
+REASON_DUPLICATED = "duplicated"  # TR_ID 중복(12), 쿠펀 주문내역 확인 필요
+
+
+def make_tr_id(dispatch_id: int, first_recipient_id: int) -> str:
+    """
+    쿠폰생성 요청의 TR_ID를 만듭니다.
+    같은 수신자 묶음에는 항상 같은 TR_ID가 만들어지므로, 응답을 받지 못한 요청을 재실행해도
+    쿠펀 측의 TR_ID 중복 검사(12)에 걸려 쿠폰이 이중으로 발급되지 않습니다.
+    """
+    return f"{settings.COUFUN_TR_ID_PREFIX}-{dispatch_id}-{first_recipient_id}"
+
+
+async def _issue_group(client: CoufunClient, semaphore: asyncio.Semaphore, goods_id: str, tr_id: str, recipient_ids: list[int]):
+    """
+    수신자 묶음(최대 10명)에 대해 쿠폰생성 API를 한 번 호출하고
+    (TR_ID, 수신자 ID 목록, (수신자 ID, 쿠폰번호) 목록, 실패 사유, 오류 메시지)를 반환합니다.
+    실패 사유는 응답을 받지 못했거나 요청보다 적은 쿠폰번호를 받아 발급 여부를 알 수 없으면 unknown,
+    TR_ID 중복(12)이면 duplicated, 발급되지 않은 것이 확실하거나 모두 발급된 경우에는 None입니다.
+    """
+    async with semaphore:
+        try:
+            response = await client.create_coupons(goods_id, len(recipient_ids), tr_id)
+        except CoufunError as e:
+            print(f"[쿠폰발급] {tr_id} 요청 실패: {e}")
+            return tr_id, recipient_ids, [], REASON_UNKNOWN if e.maybe_processed else None, str(e)[:500]
+
+    if not response.ok:
+        error = f"{response.result_code} {response.result_msg}"
+        if response.result_code == RESULT_TR_ID_DUPLICATED:
+            # 이전 실행에서 발급은 되었으나 결과를 저장하지 못한 묶음. 수동 확인이 필요합니다.
+            print(f"[쿠폰발급] {tr_id} 이미 처리된 TR_ID입니다. 쿠펀 주문내역 확인이 필요합니다.")
+            return tr_id, recipient_ids, [], REASON_DUPLICATED, error
+        print(f"[쿠폰발급] {tr_id} 발급 실패: {error}")
+        return tr_id, recipient_ids, [], None, error
+
+    barcodes = [record["BARCODE_NUM"] for record in response.records if record.get("BARCODE_NUM")]
+    pairs = list(zip(recipient_ids, barcodes))
+    if len(barcodes) != len(recipient_ids):
+        # 받은 쿠폰번호만 저장하고, 나머지 수신자는 발급 여부를 알 수 없으므로 같은 TR_ID로 기록합니다.
+        error = f"요청 {len(recipient_ids)}건 중 {len(barcodes)}건의 쿠폰번호만 받았습니다."
+        print(f"[쿠폰발급] {tr_id} {error}")
+        return tr_id, recipient_ids, pairs, REASON_UNKNOWN, error
+    return tr_id, recipient_ids, pairs, None, None
+
+
+def _split_ids(value: str) -> list[int]:
+    return [int(item) for item in value.split(",")]
+
+
+async def issue_dispatch_coupons(
+    db: AsyncSession,
+    client: CoufunClient,
+    dispatch_id: int,
+    concurrency: int = settings.COUFUN_ISSUE_CONCURRENCY,
+    on_progress=None,
+) -> dict:
+    """
+    발송 건의 수신자에게 쿠폰을 발급하여 coupon_code에 저장하고 {"issued", "failed", "duplicated"} 건수를 반환합니다.
+
+    쿠폰번호가 없는 수신자만 ID 순서로 키셋 조회하여 10명씩 묶어 동시에 요청하고,
+    묶음마다 응답을 받는 즉시 결과를 저장(커밋)하므로 중단되어도 발급된 쿠폰번호를 잃지 않습니다.
+
+    발급 여부를 알 수 없는 묶음(응답을 받지 못했거나 쿠폰번호를 일부만 받음)과 TR_ID 중복(12) 묶음은
+    쿠폰번호를 받지 못한 수신자를 coupon_issue_failures에 기록합니다.
+    다음 실행에서 unknown 묶음은 같은 TR_ID로 다시 요청하여(발급되었다면 12가 됨) 결과를 확정하고,
+    duplicated 묶음의 수신자는 쿠펀 주문내역을 확인하기 전까지 새 TR_ID로 발급하지 않습니다.
+    """
+    result = await db.execute(
+        select(models.Product.goods_id)
+        .join(models.Dispatch, models.Dispatch.product_id == models.Product.id)
+        .filter(models.Dispatch.id == dispatch_id)
+    )
+    goods_id = result.scalar_one_or_none()
+    if goods_id is None:
+        raise ValueError(f"{dispatch_id}번 발송 건의 상품 정보를 찾을 수 없습니다.")
+
+    table = models.Recipient.__table__
+    failures = models.CouponIssueFailure.__table__
+    result = await db.execute(
+        select(failures.c.tr_id, failures.c.recipient_ids, failures.c.reason).where(failures.c.dispatch_id == dispatch_id)
+    )
+    # 기록된 묶음: TR_ID -> 실패 사유
+    recorded: dict[str, str] = {}
+    held: set[int] = set()
+    retry_groups: list[tuple[str, list[int]]] = []
+    skipped = 0
+    for row in result.all():
+        ids = _split_ids(row.recipient_ids)
+        recorded[row.tr_id] = row.reason
+        held.update(ids)
+        if row.reason == REASON_UNKNOWN:
+            retry_groups.append((row.tr_id, ids))
+        else:
+            skipped += len(ids)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    summary = {"issued": 0, "failed": 0, "duplicated": 0}
+
+    async def save(tr_id: str, recipient_ids: list[int], pairs: list[tuple[int, str]], reason: str | None, error: str | None):
+        # 기록하는 수신자는 쿠폰번호를 받지 못한 수신자만 (TR_ID는 처음 요청한 묶음 기준)
+        issued_ids = {rid for rid, _ in pairs}
+        missing = [rid for rid in recipient_ids if rid not in issued_ids]
+        if pairs:
+            await db.execute(
+                update(table).where(table.c.id == bindparam("recipient_id")).values(coupon_code=bindparam("code")),
+                [{"recipient_id": rid, "code": code} for rid, code in pairs],
+            )
+        if reason is None:
+            if recorded.pop(tr_id, None) is not None:
+                await db.execute(delete(failures).where(failures.c.tr_id == tr_id))
+        elif tr_id in recorded:
+            await db.execute(
+                update(failures)
+                .where(failures.c.tr_id == tr_id)
+                .values(recipient_ids=",".join(map(str, missing)), reason=reason, error=error, attempts=failures.c.attempts + 1)
+            )
+        else:
+            await db.execute(insert(failures).values(
+                tr_id=tr_id,
+                dispatch_id=dispatch_id,
+                recipient_ids=",".join(map(str, missing)),
+                reason=reason,
+                error=error,
+                attempts=1,
+            ))
+        if reason is not None:
+            recorded[tr_id] = reason
+        await db.commit()
+
+    async def issue(groups: list[tuple[str, list[int]]]):
+        tasks = [_issue_group(client, semaphore, goods_id, tr_id, group) for tr_id, group in groups]
+        for done in asyncio.as_completed(tasks):
+            tr_id, recipient_ids, pairs, reason, error = await done
+            await save(tr_id, recipient_ids, pairs, reason, error)
+            summary["issued"] += len(pairs)
+            summary["failed"] += len(recipient_ids) - len(pairs)
+            if reason == REASON_DUPLICATED:
+                summary["duplicated"] += len(recipient_ids) - len(pairs)
+            if on_progress:
+                on_progress(len(recipient_ids))
+
+    # 응답을 받지 못했던 묶음을 같은 TR_ID로 다시 요청
+    await issue(retry_groups)
+
+    last_id = 0
+    while True:
+        result = await db.execute(
+            select(table.c.id)
+            .where(table.c.dispatch_id == dispatch_id, table.c.coupon_code.is_(None), table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(ISSUE_PAGE_SIZE)
+        )
+        page = result.scalars().all()
+        if not page:
+            break
+        last_id = page[-1]
+
+        recipient_ids = [rid for rid in page if rid not in held]
+        groups = [recipient_ids[i:i + MAX_CREATE_CNT] for i in range(0, len(recipient_ids), MAX_CREATE_CNT)]
+        await issue([(make_tr_id(dispatch_id, group[0]), group) for group in groups])
+
+    # 수동 확인을 기다리는 묶음의 수신자는 발급하지 않았으므로 실패로 집계
+    summary["failed"] += skipped
+    summary["duplicated"] += skipped
+    return summary
@@ -0,0 +1,83 @@
+import asyncio
+import uuid
+from datetime import datetime
+
+from .db_metrics import current_request, current_route
+
+
+class Job:
+    """
+    백그라운드에서 실행 중인 작업 하나의 진행 상태를 나타냅니다.
+    """
+    def __init__(self, name: str, total: int = 0):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.status = "pending"  # pending, running, done, failed
+        self.stage: str | None = None
+        self.total = total
+        self.processed = 0
+        self.error: str | None = None
+        self.created_at = datetime.now()
+        self.finished_at: datetime | None = None
+
+    def advance(self, count: int):
+        self.processed += count
+
+    def set_stage(self, stage: str, total: int):
+        """
+        여러 단계로 이루어진 작업에서 다음 단계로 넘어가며 진행 카운터를 초기화합니다.
+        """
+        self.stage = stage
+        self.total = total
+        self.processed = 0
+
+
+class JobRegistry:
+    """
+    프로세스 내 백그라운드 작업을 실행하고 진행 상태를 추적합니다.
+    완료된 작업은 최근 max_finished 건까지만 보관합니다.
+    """
+    def __init__(self, max_finished: int = 200):
+        self.max_finished = max_finished
+        self._jobs: dict[str, Job] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    def start(self, name: str, func, *args, total: int = 0) -> Job:
+        """
+        func(job, *args) 코루틴을 백그라운드 태스크로 실행하고 Job을 반환합니다.
+        """
+        job = Job(name, total=total)
+        self._jobs[job.id] = job
+        self._tasks[job.id] = asyncio.create_task(self._run(job, func, args))
+        self._prune()
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        return self._jobs.get(job_id)
+
+    async def _run(self, job: Job, func, args):
+        # 작업을 시작한 API 요청의 쿼리 집계에 작업의 쿼리가 포함되지 않도록 분리합니다.
+        current_request.set(None)
+        current_route.set(f"job:{job.name}")
+        job.status = "running"
+        try:
+            await func(job, *args)
+            job.status = "done"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            print(f"[{job.name}] 작업 {job.id} 실패: {e}")
+        finally:
+            job.finished_at = datetime.now()
+            self._tasks.pop(job.id, None)
+
+    def _prune(self):
+        finished = [j for j in self._jobs.values() if j.finished_at is not None]
+        if len(finished) <= self.max_finished:
+            return
+        finished.sort(key=lambda j: j.finished_at)
+        for job in finished[:len(finished) - self.max_finished]:
+            del self._jobs[job.id]
+
+
+jobs = JobRegistry()
@@ -1,56 +1,63 @@
-from fastapi import FastAPI, Depends, Query
-from sqlalchemy.future import select
+from fastapi import FastAPI, Depends, File, Query, HTTPException, Request, Response, UploadFile
+from fastapi.responses import JSONResponse, PlainTextResponse
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-import asyncio
-import uuid
+import os
+from datetime import datetime
 from typing import List, Optional
 
 from . import models, schemas, crud
-from .database import engine, Base, get_db
+from .database import engine, read_engine, get_db, get_read_db
+from . import db_metrics, health, idempotency, instrumentation, migrate
+from .config import settings
+from .coufun import close_coufun_client
+from .coupon_sweep import claim_sweep, run_coupon_sweep
+from .dispatch_jobs import WORKER_ID, load_dispatch, schedule_dispatch_executor
+from .exchange import RESULT_ERROR, RESULT_IP_NOT_ALLOWED, RESULT_OK, exchange_queue, exchange_response, parse_exchange_body, schedule_exchange_flush
+from .jobs import jobs
+from .product_index import product_index
+from .recipient_upload import SUPPORTED_EXTENSIONS, process_upload, save_upload, schedule_upload_purge
+from .reconcile import metrics as reconcile_metrics, schedule_reconcile
+from .scheduler import scheduler
+from .sync_products import sync_products_from_coufun
+from .ums import ums_engine
 
 from fastapi.middleware.cors import CORSMiddleware
 
 # 애플리케이션 시작 시 실행될 이벤트 핸들러
 async def startup():
-    async with engine.begin() as conn:
-        # 개발 환경용: 기존 테이블을 모두 삭제하여 스키마 변경을 쉽게 적용합니다.
-        # 주의: 운영 환경에서는 이 코드를 반드시 제거해야 합니다.
-        # await conn.run_sync(Base.metadata.drop_all)
-        # 모든 테이블 생성 (Product, Dispatch, Recipient)
-        await conn.run_sync(Base.metadata.create_all)
-
-    # 비동기 세션을 사용하여 초기 데이터 삽입
-    async for session in get_db():
-        try:
-            # 상품 데이터가 비어있는지 확인
-            result = await session.execute(select(models.Product))
-            if result.scalars().first() is None:
-                # js/main.js의 샘플 데이터를 기반으로 초기 데이터 추가
-                sample_products = [
-                    { "goods_id": "P0001", "goods_name": "불고기 버거 세트", "valid_end_date": "60일", "goods_price": 7000, "exc_branch": "전국 모든 매장" },
-                    { "goods_id": "P0002", "goods_name": "새우 버거 세트", "valid_end_date": "60일", "goods_price": 6500, "exc_branch": "전국 모든 매장" },
-                    { "goods_id": "P0003", "goods_name": "아메리카노 (R)", "valid_end_date": "30일", "goods_price": 3000, "exc_branch": "카페 A, 카페 B 전 지점" },
-                    { "goods_id": "P0004", "goods_name": "영화 관람권 (1인)", "valid_end_date": "5년", "goods_price": 15000, "exc_branch": "CGV, 롯데시네마, 메가박스" },
-                    { "goods_id": "P0005", "goods_name": "치킨 콤보", "valid_end_date": "30일", "goods_price": 22000, "exc_branch": "BBQ, BHC" },
-                    { "goods_id": "P0006", "goods_name": "피자 L 사이즈", "valid_end_date": "30일", "goods_price": 30000, "exc_branch": "도미노피자, 피자헛" },
-                    { "goods_id": "P0007", "goods_name": "편의점 5천원권", "valid_end_date": "5년", "goods_price": 5000, "exc_branch": "GS25, CU, 세븐일레븐" },
-                    { "goods_id": "P0008", "goods_name": "베이커리 1만원권", "valid_end_date": "60일", "goods_price": 10000, "exc_branch": "파리바게뜨, 뚜레쥬르" },
-                    { "goods_id": "P0009", "goods_name": "아이스크림 파인트", "valid_end_date": "30일", "goods_price": 8200, "exc_branch": "배스킨라빈스" },
-                    { "goods_id": "P0010", "goods_name": "주유 5천원 할인권", "valid_end_date": "60일", "goods_price": 5000, "exc_branch": "SK, GS칼텍스" },
-                    { "goods_id": "P0011", "goods_name": "서점 1만원 도서상품권", "valid_end_date": "5년", "goods_price": 10000, "exc_branch": "교보문고, 영풍문고" },
-                    { "goods_id": "P0012", "goods_name": "음악 스트리밍 1개월권", "valid_end_date": "30일", "goods_price": 8900, "exc_branch": "멜론, 지니뮤직" },
-                    { "goods_id": "P0013", "goods_name": "OTT 1개월 이용권", "valid_end_date": "30일", "goods_price": 14000, "exc_branch": "넷플릭스, 왓챠" },
-                    { "goods_id": "P0014", "goods_name": "특급호텔 숙박권", "valid_end_date": "5년", "goods_price": 300000, "exc_branch": "신라호텔, 롯데호텔" },
-                    { "goods_id": "P0015", "goods_name": "백화점 5만원 상품권", "valid_end_date": "5년", "goods_price": 50000, "exc_branch": "신세계, 롯데, 현대백화점" }
-                ]
-                for prod_data in sample_products:
-                    session.add(models.Product(**prod_data))
-                await session.commit()
-        finally:
-            # 세션을 한 번만 사용하고 종료
-            break 
-
-app = FastAPI(on_startup=[startup])
+    # 스키마 마이그레이션은 워커 시작 전에 python -m app.migrate로 한 번 실행합니다. (로컬 개발 시에는 MIGRATE_ON_STARTUP=1)
+    if settings.MIGRATE_ON_STARTUP:
+        await migrate.run_migrations(engine)
+
+    # 커넥션 풀과 상품 검색 색인을 미리 준비
+    await health.warm_up([engine, *([read_engine] if read_engine is not engine else [])])
+
+    # 이전 프로세스에서 반영하지 못한 교환정보 복구
+    recovered = exchange_queue.recover()
+    if recovered:
+        print(f"[교환정보] 미반영 이벤트 {recovered}건을 복구했습니다.")
+
+    # 주기 작업 시작 (예약 발송 실행, 교환정보 반영, LG U+ 발송 결과 반영, 만료된 Idempotency-Key/업로드 번호 삭제)
+    schedule_dispatch_executor(scheduler)
+    schedule_exchange_flush(scheduler)
+    schedule_reconcile(scheduler)
+    idempotency.schedule_idempotency_purge(scheduler)
+    schedule_upload_purge(scheduler)
+    scheduler.start()
+
+# 애플리케이션 종료 시 실행될 이벤트 핸들러
+async def shutdown():
+    scheduler.shutdown(wait=False)
+    await exchange_queue.flush()
+    await close_coufun_client()
+    await ums_engine.dispose()
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
+
+app = FastAPI(on_startup=[startup], on_shutdown=[shutdown])
 
 # CORS 미들웨어 추가 (프론트엔드와 통신을 위함)
 app.add_middleware(
@@ -60,25 +67,107 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# 라우트별 응답 시간/쿼리 수/DB 시간 집계, 느린 요청 기록, 프로파일링
+app.add_middleware(instrumentation.InstrumentationMiddleware)
 
 @app.get("/")
 def read_root():
     return {"message": "쿠폰 관리 백엔드 API"}
 
 @app.get("/api/products", response_model=List[schemas.Product])
-async def get_products(q: Optional[str] = None, db: AsyncSession = Depends(get_db)):
+async def get_products(
+    request: Request,
+    q: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    db: AsyncSession = Depends(get_read_db),
+):
     """
     상품 목록을 조회합니다.
-    - q (query string): 상품명(goods_name)으로 검색할 수 있습니다.
+    - q (query string): 상품명(goods_name)으로 검색할 수 있습니다. 초성(예: ㅂㄱ)으로도 검색됩니다.
+    - offset, limit: 페이지 조회 (전체 건수는 X-Total-Count 헤더)
+    프로세스 내 색인에서 미리 직렬화된 응답을 반환하며, If-None-Match가 일치하면 304를 반환합니다.
+    """
+    index = await product_index.ensure_fresh(db)
+    headers = {"ETag": index.etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == index.etag:
+        return Response(status_code=304, headers=headers)
+
+    total, body = index.search(q, offset=offset, limit=limit)
+    headers["X-Total-Count"] = str(total)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.post("/api/products/sync", response_model=schemas.ProductSyncResult)
+async def sync_products(db: AsyncSession = Depends(get_db)):
+    """
+    쿠펀 상품목록을 DB에 동기화하고 변경 내역 요약을 반환합니다.
+    """
+    summary = await sync_products_from_coufun(db)
+    await product_index.refresh(db)
+    return summary
+
+
+async def _replay_processed(db: AsyncSession, idempotency_key: Optional[str], request_fingerprint: Optional[str]):
+    """
+    업로드를 사용할 수 없을 때, 같은 Idempotency-Key의 요청이 먼저 처리되어 업로드를 사용한 경우(중복 제출)이면
+    409 대신 처음 응답을 반환합니다. 트랜잭션을 새로 시작하여 다른 요청이 커밋한 키를 조회합니다.
     """
-    return await crud.search_products_by_name(db, product_name=q)
+    if idempotency_key is None:
+        return None
+    await db.rollback()
+    record = await idempotency.find(db, idempotency_key)
+    return idempotency.replay(record, request_fingerprint) if record is not None else None
 
 
 @app.post("/api/dispatches", response_model=schemas.Dispatch)
-async def create_dispatch(dispatch_data: schemas.DispatchCreate, db: AsyncSession = Depends(get_db)):
+async def create_dispatch(dispatch_data: schemas.DispatchCreate, request: Request, db: AsyncSession = Depends(get_db)):
     """
     새로운 쿠폰 발송 요청을 생성합니다.
+    Dispatch(발송) 정보만 즉시 저장하고 수신자 적재는 백그라운드 작업으로 진행합니다.
+    쿠폰 발급/MMS 발송 요청은 발송 시각(dispatch_datetime)이 되면 예약 발송 실행 작업이 진행합니다.
+    수신자는 recipients 목록 또는 검증이 끝난 수신자 파일 업로드(upload_id)로 지정합니다.
+    발송 건 안에서 중복된 번호와, 같은 이벤트명/상품으로 최근(DISPATCH_DEDUP_DAYS일) 발송한 번호는 적재하지 않습니다. (duplicate_count)
+
+    Idempotency-Key 헤더를 보내면 같은 키로 다시 요청했을 때 발송 건을 새로 만들지 않고 처음 응답을 그대로 반환합니다.
+    (다시 반환한 응답의 job_id는 비어 있으며, 진행 상황은 /api/dispatches/{id}로 확인합니다.)
     """
+    idempotency_key = idempotency.request_key(request)
+    request_fingerprint = None
+    if idempotency_key is not None:
+        request_fingerprint = idempotency.fingerprint(request, dispatch_data)
+        record = await idempotency.find(db, idempotency_key)
+        if record is not None:
+            return idempotency.replay(record, request_fingerprint)
+
+    # 발송 건 안에서 중복된 번호는 한 번만 적재합니다. (업로드 파일은 검증 단계에서 중복이 제외됨)
+    phone_numbers = list(dict.fromkeys(recipient.phone_number.replace("-", "").strip() for recipient in dispatch_data.recipients))
+    quantity = len(phone_numbers)
+    if dispatch_data.upload_id is not None:
+        upload = await db.get(models.RecipientUpload, dispatch_data.upload_id)
+        if upload is None:
+            raise HTTPException(status_code=404, detail="수신자 업로드를 찾을 수 없습니다.")
+        if upload.status != "ready":
+            upload_status = upload.status
+            replayed = await _replay_processed(db, idempotency_key, request_fingerprint)
+            if replayed is not None:
+                return replayed
+            raise HTTPException(status_code=409, detail=f"수신자 업로드가 사용 가능한 상태가 아닙니다. (status={upload_status})")
+        # 업로드는 발송 건 하나에만 사용합니다. (수신자 적재가 끝나면 업로드로 적재된 번호를 삭제함)
+        # 발송 건과 같은 트랜잭션에서 상태를 바꾸므로 같은 업로드로 동시에 요청해도 한 건만 생성됩니다.
+        claimed = await db.execute(
+            update(models.RecipientUpload)
+            .where(models.RecipientUpload.id == upload.id, models.RecipientUpload.status == "ready")
+            .values(status="used")
+        )
+        if claimed.rowcount != 1:
+            replayed = await _replay_processed(db, idempotency_key, request_fingerprint)
+            if replayed is not None:
+                return replayed
+            await db.rollback()
+            raise HTTPException(status_code=409, detail="수신자 업로드가 이미 다른 발송 요청에 사용되었습니다.")
+        quantity = upload.valid_count
+
     # 1. Dispatch(발송) 정보 생성
     db_dispatch = models.Dispatch(
         client_name=dispatch_data.client_name,
@@ -91,26 +180,318 @@ async def create_dispatch(dispatch_data: schemas.DispatchCreate, db: AsyncSessio
         mms_content=dispatch_data.mms_content,
         sender_phone=dispatch_data.sender_phone,
         dispatch_datetime=dispatch_data.dispatch_datetime,
-        quantity=len(dispatch_data.recipients)
+        quantity=quantity,
+        upload_id=dispatch_data.upload_id,
+        status="loading",
+        claimed_by=WORKER_ID,
+        claimed_at=datetime.now(),
+        duplicate_count=len(dispatch_data.recipients) - len(phone_numbers),
     )
     db.add(db_dispatch)
-    await db.flush() # db_dispatch의 id를 가져오기 위해 flush
-
-    # 2. Recipient(수신자) 정보 생성
-    for recipient in dispatch_data.recipients:
-        # 실제 쿠펀 API 연동 대신 UUID로 쿠폰 번호 생성
-        coupon_code = str(uuid.uuid4().hex)[:12].upper()
-        db_recipient = models.Recipient(
-            dispatch_id=db_dispatch.id,
-            phone_number=recipient.phone_number,
-            coupon_code=coupon_code
-        )
-        db.add(db_recipient)
+    await db.flush()
+    await db.refresh(db_dispatch)
+    response = schemas.Dispatch.model_validate(db_dispatch, from_attributes=True)
+
+    if idempotency_key is None:
+        await db.commit()
+    else:
+        # 발송 건과 키를 같은 트랜잭션으로 저장하므로, 같은 키의 요청이 동시에 들어와도 발송 건은 하나만 생성됩니다.
+        idempotency.save(db, idempotency_key, request_fingerprint, response, 200, dispatch_id=response.id)
+        try:
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            record = await idempotency.find(db, idempotency_key)
+            if record is None:
+                raise
+            return idempotency.replay(record, request_fingerprint)
 
+    # 2. Recipient(수신자) 적재 (백그라운드)
+    job = jobs.start("dispatch-load", load_dispatch, response.id, phone_numbers, dispatch_data.upload_id, total=quantity)
+    response.job_id = job.id
+    return response
+
+
+def _next_cursor(items, limit: int) -> Optional[int]:
+    # 한 페이지를 가득 채웠을 때만 다음 페이지가 있을 수 있습니다.
+    return items[-1].id if len(items) == limit else None
+
+
+def _dispatch_summary(row) -> schemas.DispatchSummary:
+    summary = schemas.DispatchSummary.model_validate(row.Dispatch, from_attributes=True)
+    summary.product_name = row.goods_name
+    summary.goods_price = row.goods_price
+    return summary
+
+
+@app.get("/api/dispatches", response_model=schemas.DispatchPage)
+async def list_dispatches(
+    cursor: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=500),
+    client_name: Optional[str] = None,
+    event_name: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    발송 내역을 최신순으로 조회합니다. 응답의 next_cursor를 cursor로 넘기면 다음 페이지를 조회합니다.
+    상태별 건수(미교환/교환/폐기)는 수신자를 다시 세지 않고 발송 건에 유지되는 값을 반환합니다.
+    """
+    rows = await crud.list_dispatches(
+        db, limit, cursor=cursor, client_name=client_name, event_name=event_name, date_from=date_from, date_to=date_to
+    )
+    items = [_dispatch_summary(row) for row in rows]
+    return {"items": items, "next_cursor": _next_cursor(items, limit)}
+
+
+@app.get("/api/dispatches/{dispatch_id}", response_model=schemas.DispatchSummary)
+async def get_dispatch(dispatch_id: int, db: AsyncSession = Depends(get_read_db)):
+    row = await crud.get_dispatch_summary(db, dispatch_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="발송 건을 찾을 수 없습니다.")
+    return _dispatch_summary(row)
+
+
+@app.get("/api/dispatches/{dispatch_id}/recipients", response_model=schemas.RecipientPage)
+async def list_dispatch_recipients(
+    dispatch_id: int,
+    cursor: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    status: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    발송 건의 수신자를 ID 순으로 조회합니다. status(미교환/교환/폐기)로 거를 수 있습니다.
+    """
+    rows = await crud.list_dispatch_recipients(db, dispatch_id, limit, cursor=cursor, status=status)
+    items = [schemas.Recipient.model_validate(row._mapping) for row in rows]
+    return {"items": items, "next_cursor": _next_cursor(items, limit)}
+
+
+@app.get("/api/dispatches/{dispatch_id}/issue-failures", response_model=List[schemas.CouponIssueFailure])
+async def list_coupon_issue_failures(dispatch_id: int, db: AsyncSession = Depends(get_read_db)):
+    """
+    발송 건에서 발급 결과를 확인하지 못한 쿠폰생성 요청을 조회합니다.
+    duplicated는 쿠펀 주문내역에서 TR_ID로 발급 여부를 확인해야 합니다.
+    """
+    return await crud.list_coupon_issue_failures(db, dispatch_id)
+
+
+@app.get("/api/recipients", response_model=schemas.CsRecipientPage)
+async def find_recipients(
+    phone_number: str = Query(..., min_length=10),
+    cursor: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    CS 조회: 휴대폰 번호로 받은 쿠폰 내역을 최신순으로 조회합니다. (하이픈은 무시)
+    """
+    rows = await crud.find_recipients_by_phone(db, phone_number.replace("-", "").strip(), limit, cursor=cursor)
+    items = [schemas.CsRecipient.model_validate(row._mapping) for row in rows]
+    return {"items": items, "next_cursor": _next_cursor(items, limit)}
+
+
+@app.post("/api/recipient-uploads", response_model=schemas.RecipientUpload, status_code=202)
+async def upload_recipients(file: UploadFile = File(...), db: AsyncSession = Depends(get_db)):
+    """
+    수신자 휴대폰 번호 파일(.xlsx 또는 .csv, 첫 번째 열)을 업로드합니다.
+    파일 검증과 적재는 백그라운드 작업으로 진행되며, status가 ready가 되면 발송 요청에 upload_id로 지정할 수 있습니다.
+    업로드는 발송 요청 한 건에만 사용할 수 있으며(used), RECIPIENT_UPLOAD_TTL_HOURS 안에 사용하지 않으면 만료(expired)됩니다.
+    """
+    extension = os.path.splitext(file.filename or "")[1].lower()
+    if extension not in SUPPORTED_EXTENSIONS:
+        raise HTTPException(status_code=400, detail="엑셀(.xlsx) 또는 CSV 파일만 업로드할 수 있습니다.")
+    path = await save_upload(file)
+
+    db_upload = models.RecipientUpload(filename=file.filename)
+    db.add(db_upload)
     await db.commit()
-    await db.refresh(db_dispatch)
+    await db.refresh(db_upload)
+
+    job = jobs.start("recipient-upload", process_upload, db_upload.id, path)
+    response = schemas.RecipientUpload.model_validate(db_upload, from_attributes=True)
+    response.job_id = job.id
+    return response
+
+
+@app.get("/api/recipient-uploads/{upload_id}", response_model=schemas.RecipientUpload)
+async def get_recipient_upload(upload_id: int, db: AsyncSession = Depends(get_db)):
+    """
+    수신자 파일 업로드의 검증 결과(전체/유효/오류/중복 건수, 오류 행 예시)를 조회합니다.
+    """
+    db_upload = await db.get(models.RecipientUpload, upload_id)
+    if db_upload is None:
+        raise HTTPException(status_code=404, detail="수신자 업로드를 찾을 수 없습니다.")
+    return db_upload
+
+
+async def _start_sweep(db: AsyncSession, db_sweep: models.CouponSweep) -> schemas.CouponSweep:
+    if not await claim_sweep(db_sweep.id):
+        raise HTTPException(status_code=409, detail="이미 완료되었거나 실행 중인 작업입니다.")
+    job = jobs.start("coupon-sweep", run_coupon_sweep, db_sweep.id)
+    await db.refresh(db_sweep)
+    response = schemas.CouponSweep.model_validate(db_sweep, from_attributes=True)
+    response.job_id = job.id
+    return response
 
-    # 3. [시뮬레이션] LG U+ MMS 발송 요청
-    # logger.info(f"{db_dispatch.id}번 발송 건에 대해 MMS 발송 요청을 시뮬레이션합니다.")
 
-    return db_dispatch
+@app.post("/api/coupon-sweeps", response_model=schemas.CouponSweep, status_code=202)
+async def create_coupon_sweep(sweep_data: schemas.CouponSweepCreate, db: AsyncSession = Depends(get_db)):
+    """
+    발송 건 또는 발송일시 구간의 쿠폰을 쿠펀 API로 일괄 상태조회(status)하거나 미교환 쿠폰을 일괄 취소(cancel)합니다.
+    작업은 백그라운드로 진행되며, 바뀐 상태는 수신자 쿠폰 상태(미교환/교환/폐기)에 반영됩니다.
+    """
+    db_sweep = models.CouponSweep(**sweep_data.model_dump(), status="pending")
+    db.add(db_sweep)
+    await db.commit()
+    await db.refresh(db_sweep)
+    return await _start_sweep(db, db_sweep)
+
+
+@app.get("/api/coupon-sweeps/{sweep_id}", response_model=schemas.CouponSweep)
+async def get_coupon_sweep(sweep_id: int, db: AsyncSession = Depends(get_db)):
+    """
+    쿠폰 상태조회/취소 작업의 진행 상황(체크포인트, 처리/변경/실패 건수)을 조회합니다.
+    """
+    db_sweep = await db.get(models.CouponSweep, sweep_id)
+    if db_sweep is None:
+        raise HTTPException(status_code=404, detail="쿠폰 작업을 찾을 수 없습니다.")
+    return db_sweep
+
+
+@app.post("/api/coupon-sweeps/{sweep_id}/resume", response_model=schemas.CouponSweep, status_code=202)
+async def resume_coupon_sweep(sweep_id: int, db: AsyncSession = Depends(get_db)):
+    """
+    실패했거나 중단된(점유 갱신이 COUPON_SWEEP_LEASE_SEC 이상 끊긴) 작업을 마지막 체크포인트부터 이어서 실행합니다.
+    """
+    db_sweep = await db.get(models.CouponSweep, sweep_id)
+    if db_sweep is None:
+        raise HTTPException(status_code=404, detail="쿠폰 작업을 찾을 수 없습니다.")
+    return await _start_sweep(db, db_sweep)
+
+
+@app.get("/api/jobs/{job_id}", response_model=schemas.Job)
+async def get_job(job_id: str):
+    """
+    백그라운드 작업(수신자 적재, 쿠폰 발급 등)의 진행 상황을 조회합니다.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다.")
+    return job
+
+
+@app.post("/api/coufun/exchange")
+async def receive_coufun_exchange(request: Request):
+    """
+    쿠펀 교환정보(쿠폰 사용/사용취소/취소) 콜백을 받습니다. (MyDocuments/01_쿠폰공급사API/5.교환정보)
+    이벤트는 큐에 넣고 바로 응답하며, 수신자 상태는 주기적으로 모아서 반영합니다.
+    같은 쿠폰의 재전송은 큐에서 하나로 합쳐지므로 중복 요청에도 '00'으로 응답합니다.
+    """
+    media_type = "application/xml; charset=EUC-KR"
+    if settings.EXCHANGE_ALLOWED_IPS and (request.client is None or request.client.host not in settings.EXCHANGE_ALLOWED_IPS):
+        return Response(exchange_response(RESULT_IP_NOT_ALLOWED, "IP Not Allowed"), media_type=media_type)
+    try:
+        exchange_id = await exchange_queue.put(parse_exchange_body(await request.body()))
+    except ValueError as e:
+        print(f"[교환정보] 잘못된 요청: {e}")
+        return Response(exchange_response(RESULT_ERROR, "Error"), media_type=media_type)
+    return Response(exchange_response(RESULT_OK, "Success", exchange_id), media_type=media_type)
+
+
+@app.get("/api/coufun/exchange/metrics")
+async def get_exchange_metrics():
+    """
+    교환정보 콜백 수신/반영 지표를 조회합니다. (pending: 아직 반영되지 않은 쿠폰 수)
+    """
+    return {**exchange_queue.metrics, "pending": exchange_queue.pending}
+
+
+@app.get("/api/metrics/db")
+async def get_db_metrics():
+    """
+    DB 커넥션 풀과 쿼리 지표를 조회합니다.
+    - pools: 엔진별 풀 크기, 사용 중 커넥션 수, 사용률(saturation), 체크아웃 대기 시간(p50/p99), 타임아웃 횟수
+    - slow_queries: DB_SLOW_QUERY_MS 이상 걸린 최근 쿼리
+    - routes: 라우트별 요청당 평균/최대 쿼리 수와 DB 시간
+    """
+    return db_metrics.snapshot(_engines())
+
+
+def _engines() -> dict:
+    engines = {"app": engine, "ums": ums_engine}
+    if read_engine is not engine:
+        engines["read"] = read_engine
+    return engines
+
+
+@app.get("/health/live")
+async def liveness():
+    """
+    프로세스가 요청을 처리할 수 있는지만 확인합니다. (DB를 조회하지 않음)
+    """
+    return {"status": "ok"}
+
+
+@app.get("/health/ready")
+async def readiness():
+    """
+    트래픽을 받을 준비가 되었는지 확인합니다. (DB 응답, 스키마 버전, 커넥션 풀/상품 색인 예열)
+    준비되지 않았으면 503을 반환합니다.
+    """
+    ready, checks = await health.readiness()
+    return JSONResponse(
+        {"status": "ok" if ready else "unavailable", "checks": checks},
+        status_code=200 if ready else 503,
+    )
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_prometheus_metrics():
+    """
+    Prometheus 수집용 지표 (라우트별 응답 시간 히스토그램, DB/Python 시간, 구간별 시간, 커넥션 풀, 교환정보 큐)
+    """
+    return instrumentation.render_metrics(_engines(), gauges={
+        "coufun_exchange_pending": exchange_queue.pending,
+        "coufun_exchange_received_total": exchange_queue.metrics["received"],
+        "coufun_exchange_applied_total": exchange_queue.metrics["applied"],
+    })
+
+
+@app.get("/api/metrics/slow-requests")
+async def get_slow_requests():
+    """
+    SLOW_REQUEST_MS 이상 걸린 최근 요청의 DB/Python 시간과 구간(span)별 시간을 조회합니다.
+    """
+    return list(instrumentation.slow_requests)
+
+
+@app.get("/api/metrics/profiles")
+async def list_profiles():
+    """
+    보관 중인 요청 프로파일 목록을 조회합니다.
+    X-Profile 헤더(PROFILE_HEADER_TOKEN)를 보낸 요청과, PROFILE_SAMPLE_RATE로 선택된 요청 중 느린 요청이 프로파일링됩니다.
+    """
+    return [{key: value for key, value in profile.items() if key != "stats"} for profile in instrumentation.profiles]
+
+
+@app.get("/api/metrics/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(profile_id: str):
+    """
+    요청 프로파일(cProfile, 누적 시간 순 상위 함수)을 텍스트로 조회합니다.
+    """
+    profile = instrumentation.get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="프로파일을 찾을 수 없습니다.")
+    return profile["stats"]
+
+
+@app.get("/api/reconcile/metrics")
+async def get_reconcile_metrics():
+    """
+    월별 로그 테이블(UMS_LOG_YYYYMM)별 발송 결과 반영 지표를 조회합니다.
+    - lag_seconds: 로그 테이블의 최신 결과와 반영 위치(워터마크)의 시간 차이
+    """
+    return reconcile_metrics
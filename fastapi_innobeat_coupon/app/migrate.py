@@ -0,0 +1,378 @@
+"""
+버전별 스키마 마이그레이션입니다. API 워커를 띄우기 전에 한 번 실행합니다. (Dockerfile CMD 참고)
+
+    python -m app.migrate
+
+적용한 버전은 schema_migrations 테이블에 기록하며, MariaDB에서는 GET_LOCK으로 잠그므로
+여러 컨테이너가 동시에 실행해도 한 곳에서만 적용됩니다.
+"""
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import (
+    Column, DateTime, ForeignKey, Index, Integer, MetaData, String, Table, Text, column, exists, func, inspect, insert, table, text, update,
+)
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from sqlalchemy.future import select
+from sqlalchemy.schema import CreateColumn
+
+from .database import engine
+
+LOCK_NAME = "innobeat_coupon_migrate"
+# 수신자 쿠폰 상태 -> 발송 건의 상태별 건수 컬럼
+_COUNTER_COLUMNS = {"미교환": "unexchanged_count", "교환": "exchanged_count", "폐기": "discarded_count"}
+LOCK_TIMEOUT_SEC = 300
+
+schema_migrations = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String(100), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+# js/main.js의 샘플 데이터를 기반으로 한 초기 상품
+SAMPLE_PRODUCTS = [
+    { "goods_id": "P0001", "goods_name": "불고기 버거 세트", "valid_end_date": "60일", "goods_price": 7000, "exc_branch": "전국 모든 매장" },
+    { "goods_id": "P0002", "goods_name": "새우 버거 세트", "valid_end_date": "60일", "goods_price": 6500, "exc_branch": "전국 모든 매장" },
+    { "goods_id": "P0003", "goods_name": "아메리카노 (R)", "valid_end_date": "30일", "goods_price": 3000, "exc_branch": "카페 A, 카페 B 전 지점" },
+    { "goods_id": "P0004", "goods_name": "영화 관람권 (1인)", "valid_end_date": "5년", "goods_price": 15000, "exc_branch": "CGV, 롯데시네마, 메가박스" },
+    { "goods_id": "P0005", "goods_name": "치킨 콤보", "valid_end_date": "30일", "goods_price": 22000, "exc_branch": "BBQ, BHC" },
+    { "goods_id": "P0006", "goods_name": "피자 L 사이즈", "valid_end_date": "30일", "goods_price": 30000, "exc_branch": "도미노피자, 피자헛" },
+    { "goods_id": "P0007", "goods_name": "편의점 5천원권", "valid_end_date": "5년", "goods_price": 5000, "exc_branch": "GS25, CU, 세븐일레븐" },
+    { "goods_id": "P0008", "goods_name": "베이커리 1만원권", "valid_end_date": "60일", "goods_price": 10000, "exc_branch": "파리바게뜨, 뚜레쥬르" },
+    { "goods_id": "P0009", "goods_name": "아이스크림 파인트", "valid_end_date": "30일", "goods_price": 8200, "exc_branch": "배스킨라빈스" },
+    { "goods_id": "P0010", "goods_name": "주유 5천원 할인권", "valid_end_date": "60일", "goods_price": 5000, "exc_branch": "SK, GS칼텍스" },
+    { "goods_id": "P0011", "goods_name": "서점 1만원 도서상품권", "valid_end_date": "5년", "goods_price": 10000, "exc_branch": "교보문고, 영풍문고" },
+    { "goods_id": "P0012", "goods_name": "음악 스트리밍 1개월권", "valid_end_date": "30일", "goods_price": 8900, "exc_branch": "멜론, 지니뮤직" },
+    { "goods_id": "P0013", "goods_name": "OTT 1개월 이용권", "valid_end_date": "30일", "goods_price": 14000, "exc_branch": "넷플릭스, 왓챠" },
+    { "goods_id": "P0014", "goods_name": "특급호텔 숙박권", "valid_end_date": "5년", "goods_price": 300000, "exc_branch": "신라호텔, 롯데호텔" },
+    { "goods_id": "P0015", "goods_name": "백화점 5만원 상품권", "valid_end_date": "5년", "goods_price": 50000, "exc_branch": "신세계, 롯데, 현대백화점" }
+]
+
+
+def _create_table(sync_conn, name: str, *columns):
+    """
+    테이블이 없으면 만듭니다. (마이그레이션 도입 전 create_all로 만들어진 테이블은 그대로 둠)
+    외래 키가 가리키는 테이블은 DDL 생성용으로만 같은 MetaData에 선언합니다.
+    """
+    metadata = MetaData()
+    for item in columns:
+        for foreign_key in getattr(item, "foreign_keys", ()):
+            referenced = foreign_key.target_fullname.split(".")[0]
+            if referenced not in metadata.tables:
+                Table(referenced, metadata, Column("id", Integer, primary_key=True))
+    Table(name, metadata, *columns).create(sync_conn, checkfirst=True)
+
+
+def _add_column(sync_conn, table_name: str, column: Column):
+    # 컬럼이 없을 때만 추가합니다.
+    if column.name in {c["name"] for c in inspect(sync_conn).get_columns(table_name)}:
+        return
+    Table(table_name, MetaData(), column)
+    ddl = CreateColumn(column).compile(dialect=sync_conn.dialect)
+    sync_conn.execute(text(f"ALTER TABLE {_quote(sync_conn, table_name)} ADD COLUMN {ddl}"))
+    print(f"[마이그레이션] {table_name}.{column.name} 컬럼 추가")
+
+
+def _add_foreign_key(sync_conn, table_name: str, column: str, referenced: str):
+    # SQLite는 ALTER TABLE로 제약 조건을 추가할 수 없으므로 MariaDB에서만 추가합니다.
+    if sync_conn.dialect.name not in ("mysql", "mariadb"):
+        return
+    if any(fk["constrained_columns"] == [column] for fk in inspect(sync_conn).get_foreign_keys(table_name)):
+        return
+    sync_conn.execute(text(
+        f"ALTER TABLE {_quote(sync_conn, table_name)} ADD FOREIGN KEY ({_quote(sync_conn, column)}) "
+        f"REFERENCES {_quote(sync_conn, referenced)} (id)"
+    ))
+
+
+def _create_index(sync_conn, name: str, table_name: str, *columns: str, unique: bool = False):
+    # 인덱스가 없을 때만 만듭니다.
+    if name in {index["name"] for index in inspect(sync_conn).get_indexes(table_name)}:
+        return
+    quoted = ", ".join(_quote(sync_conn, column) for column in columns)
+    sync_conn.execute(text(
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX {_quote(sync_conn, name)} ON {_quote(sync_conn, table_name)} ({quoted})"
+    ))
+    print(f"[마이그레이션] {name} 인덱스 추가")
+
+
+def _quote(sync_conn, name: str) -> str:
+    return sync_conn.dialect.identifier_preparer.quote(name)
+
+
+def _0001_baseline(sync_conn):
+    """
+    마이그레이션 도입 전 최초 스키마 (상품, 발송, 수신자)
+    """
+    _create_table(
+        sync_conn, "products",
+        Column("id", Integer, primary_key=True),
+        Column("cat_id", String(10)),
+        Column("goods_id", String(10)),
+        Column("goods_name", String(255)),
+        Column("goods_ori_price", Integer),
+        Column("goods_price", Integer),
+        Column("goods_info", String(4000)),
+        Column("use_guide", String(4000)),
+        Column("exc_branch", String(50)),
+        Column("valid_end_type", String(1)),
+        Column("valid_end_date", String(8)),
+        Column("send_type", String(1)),
+        Column("image_path_s", String(150)),
+        Column("image_path_m", String(150)),
+        Column("image_path_b", String(150)),
+        Column("image_size_s_w", Integer),
+        Column("image_size_s_h", Integer),
+        Column("image_size_m_w", Integer),
+        Column("image_size_m_h", Integer),
+        Column("image_size_b_w", Integer),
+        Column("image_size_b_h", Integer),
+        Index("ix_products_id", "id"),
+        Index("ix_products_goods_id", "goods_id", unique=True),
+        Index("ix_products_goods_name", "goods_name"),
+    )
+    _create_table(
+        sync_conn, "dispatches",
+        Column("id", Integer, primary_key=True),
+        Column("client_name", String(100), nullable=False),
+        Column("event_name", String(100), nullable=False),
+        Column("sales_manager", String(50)),
+        Column("client_requester", String(50)),
+        Column("requester_email", String(100)),
+        Column("product_id", Integer, ForeignKey("products.id")),
+        Column("mms_title", String(50)),
+        Column("mms_content", String(2000)),
+        Column("sender_phone", String(20)),
+        Column("quantity", Integer),
+        Column("dispatch_datetime", DateTime, nullable=False),
+        Column("created_at", DateTime, server_default=func.now()),
+        Index("ix_dispatches_id", "id"),
+    )
+    _create_table(
+        sync_conn, "recipients",
+        Column("id", Integer, primary_key=True),
+        Column("dispatch_id", Integer, ForeignKey("dispatches.id")),
+        Column("phone_number", String(20), nullable=False),
+        Column("coupon_code", String(50)),
+        Column("status", String(20)),
+        Index("ix_recipients_id", "id"),
+        Index("ix_recipients_phone_number", "phone_number"),
+        Index("ix_recipients_coupon_code", "coupon_code", unique=True),
+    )
+
+
+def _0002_dispatch_pipeline(sync_conn):
+    """
+    상품 동기화, 수신자 파일 업로드, 예약 발송 실행, 발송 결과/교환정보 반영, 쿠폰 상태조회/취소에 필요한 컬럼과 테이블을 추가하고
+    기존 발송 건의 상태와 상태별 건수를 채웁니다.
+    """
+    _add_column(sync_conn, "products", Column("content_hash", String(40)))
+    _add_column(sync_conn, "products", Column("deleted_at", DateTime))
+    _add_column(sync_conn, "products", Column("updated_at", DateTime, server_default=func.now()))
+
+    _create_table(
+        sync_conn, "recipient_uploads",
+        Column("id", Integer, primary_key=True),
+        Column("filename", String(255)),
+        Column("status", String(20)),
+        Column("total_rows", Integer),
+        Column("valid_count", Integer),
+        Column("invalid_count", Integer),
+        Column("duplicate_count", Integer),
+        Column("invalid_samples", String(2000)),
+        Column("error", String(500)),
+        Column("created_at", DateTime, server_default=func.now()),
+        Index("ix_recipient_uploads_id", "id"),
+    )
+    _create_table(
+        sync_conn, "staged_recipients",
+        Column("id", Integer, primary_key=True),
+        Column("upload_id", Integer, ForeignKey("recipient_uploads.id")),
+        Column("phone_number", String(20), nullable=False),
+        Index("ix_staged_recipients_upload_id", "upload_id"),
+    )
+
+    _add_column(sync_conn, "dispatches", Column("upload_id", Integer))
+    _add_foreign_key(sync_conn, "dispatches", "upload_id", "recipient_uploads")
+    _add_column(sync_conn, "dispatches", Column("status", String(20)))
+    _add_column(sync_conn, "dispatches", Column("claimed_by", String(100)))
+    _add_column(sync_conn, "dispatches", Column("claimed_at", DateTime))
+    _add_column(sync_conn, "dispatches", Column("attempts", Integer))
+    _add_column(sync_conn, "dispatches", Column("error", String(500)))
+    _add_column(sync_conn, "dispatches", Column("finished_at", DateTime))
+    for name in ("unexchanged_count", "exchanged_count", "discarded_count"):
+        _add_column(sync_conn, "dispatches", Column(name, Integer, server_default="0", nullable=False))
+    _create_index(sync_conn, "ix_dispatches_status_datetime", "dispatches", "status", "dispatch_datetime")
+
+    _add_column(sync_conn, "recipients", Column("exchanged_at", DateTime))
+    _add_column(sync_conn, "recipients", Column("client_key", String(40)))
+    _add_column(sync_conn, "recipients", Column("delivery_status", String(10)))
+    _add_column(sync_conn, "recipients", Column("done_code", String(10)))
+    _add_column(sync_conn, "recipients", Column("done_date", DateTime))
+    _create_index(sync_conn, "ix_recipients_client_key", "recipients", "client_key", unique=True)
+    _create_index(sync_conn, "ix_recipients_dispatch_status", "recipients", "dispatch_id", "status")
+
+    _create_table(
+        sync_conn, "ums_log_watermarks",
+        Column("log_table", String(20), primary_key=True),
+        Column("last_done_date", DateTime),
+        Column("last_client_key", String(40)),
+        Column("rows_applied", Integer),
+        Column("updated_at", DateTime, server_default=func.now()),
+    )
+    _create_table(
+        sync_conn, "coupon_sweeps",
+        Column("id", Integer, primary_key=True),
+        Column("mode", String(10), nullable=False),
+        Column("dispatch_id", Integer, ForeignKey("dispatches.id")),
+        Column("date_from", DateTime),
+        Column("date_to", DateTime),
+        Column("status", String(20)),
+        Column("claimed_by", String(100)),
+        Column("claimed_at", DateTime),
+        Column("last_recipient_id", Integer),
+        Column("scanned", Integer),
+        Column("changed", Integer),
+        Column("failed", Integer),
+        Column("error", String(500)),
+        Column("created_at", DateTime, server_default=func.now()),
+        Column("finished_at", DateTime),
+        Index("ix_coupon_sweeps_id", "id"),
+    )
+
+    dispatches = table("dispatches", column("id"), column("status"), *(column(name) for name in _COUNTER_COLUMNS.values()))
+    recipients = table("recipients", column("dispatch_id"), column("status"))
+    # 상태 컬럼이 없던 시기의 발송 건은 요청 시 처리가 끝난 건입니다.
+    sync_conn.execute(update(dispatches).where(dispatches.c.status.is_(None)).values(status="sent"))
+
+    def count(status: str):
+        return (
+            select(func.count())
+            .where(recipients.c.dispatch_id == dispatches.c.id, recipients.c.status == status)
+            .scalar_subquery()
+        )
+
+    sync_conn.execute(update(dispatches).values({name: count(status) for status, name in _COUNTER_COLUMNS.items()}))
+
+
+def _0003_seed_products(sync_conn):
+    # 상품이 하나도 없을 때만 샘플 상품을 넣습니다.
+    products = table("products", *(column(name) for name in SAMPLE_PRODUCTS[0]))
+    if not sync_conn.scalar(select(exists().select_from(products))):
+        sync_conn.execute(insert(products), SAMPLE_PRODUCTS)
+
+
+def _0004_idempotency_and_dedup(sync_conn):
+    """
+    발송 요청 Idempotency-Key 테이블과, 수신자 중복 제외용 컬럼(dispatches.duplicate_count)/인덱스를 추가합니다.
+    """
+    _create_table(
+        sync_conn, "idempotency_keys",
+        Column("key", String(100), primary_key=True),
+        Column("fingerprint", String(64), nullable=False),
+        Column("dispatch_id", Integer, ForeignKey("dispatches.id")),
+        Column("status_code", Integer, nullable=False),
+        Column("response_body", Text, nullable=False),
+        Column("created_at", DateTime, nullable=False),
+        Index("ix_idempotency_keys_created_at", "created_at"),
+    )
+    _add_column(sync_conn, "dispatches", Column("duplicate_count", Integer, server_default="0", nullable=False))
+    _create_index(sync_conn, "ix_dispatches_event_product_created", "dispatches", "event_name", "product_id", "created_at")
+    _create_index(sync_conn, "ix_recipients_dispatch_phone", "recipients", "dispatch_id", "phone_number")
+
+
+
+def _0005_coupon_issue_failures(sync_conn):
+    _create_table(
+        sync_conn, "coupon_issue_failures",
+        Column("tr_id", String(60), primary_key=True),
+        Column("dispatch_id", Integer, ForeignKey("dispatches.id"), nullable=False),
+        Column("recipient_ids", String(200), nullable=False),
+        Column("reason", String(20), nullable=False),
+        Column("error", String(500)),
+        Column("attempts", Integer, server_default="0", nullable=False),
+        Column("created_at", DateTime, server_default=func.now()),
+        Column("updated_at", DateTime, server_default=func.now()),
+        Index("ix_coupon_issue_failures_dispatch_id", "dispatch_id"),
+    )
+
+
+
+def _0006_dispatch_retry_backoff(sync_conn):
+    _add_column(sync_conn, "dispatches", Column("next_attempt_at", DateTime))
+
+
+MIGRATIONS = [
+    (1, "baseline", _0001_baseline),
+    (2, "dispatch_pipeline", _0002_dispatch_pipeline),
+    (3, "seed_products", _0003_seed_products),
+    (4, "idempotency_and_dedup", _0004_idempotency_and_dedup),
+    (5, "coupon_issue_failures", _0005_coupon_issue_failures),
+    (6, "dispatch_retry_backoff", _0006_dispatch_retry_backoff),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+async def current_version(conn: AsyncConnection) -> int:
+    """
+    적용된 마지막 마이그레이션 버전을 반환합니다. schema_migrations 테이블이 없으면 0을 반환합니다.
+    """
+    if not await conn.run_sync(lambda c: inspect(c).has_table(schema_migrations.name)):
+        return 0
+    return await conn.scalar(select(func.coalesce(func.max(schema_migrations.c.version), 0)))
+
+
+async def _acquire_lock(conn: AsyncConnection):
+    if conn.dialect.name in ("mysql", "mariadb"):
+        acquired = await conn.scalar(text("SELECT GET_LOCK(:name, :timeout)"), {"name": LOCK_NAME, "timeout": LOCK_TIMEOUT_SEC})
+        await conn.commit()
+        if acquired != 1:
+            raise RuntimeError(f"마이그레이션 잠금({LOCK_NAME})을 {LOCK_TIMEOUT_SEC}초 안에 얻지 못했습니다.")
+
+
+async def _release_lock(conn: AsyncConnection):
+    if conn.dialect.name in ("mysql", "mariadb"):
+        await conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": LOCK_NAME})
+        await conn.commit()
+
+
+async def run_migrations(engine: AsyncEngine = engine) -> list[int]:
+    """
+    적용되지 않은 마이그레이션을 버전 순서대로 적용하고 적용한 버전 목록을 반환합니다.
+    마이그레이션마다 별도 트랜잭션으로 실행하며 같은 트랜잭션에서 schema_migrations에 기록합니다.
+    (MariaDB의 DDL은 트랜잭션과 무관하게 즉시 반영되므로, 마이그레이션은 다시 실행해도 안전하게 작성합니다.)
+    """
+    applied = []
+    async with engine.connect() as conn:
+        await _acquire_lock(conn)
+        try:
+            await conn.run_sync(lambda c: schema_migrations.create(c, checkfirst=True))
+            await conn.commit()
+            version = await current_version(conn)
+            await conn.commit()
+            for number, name, migration in MIGRATIONS:
+                if number <= version:
+                    continue
+                async with conn.begin():
+                    await conn.run_sync(migration)
+                    await conn.execute(insert(schema_migrations).values(version=number, name=name, applied_at=datetime.now()))
+                print(f"[마이그레이션] {number:04d}_{name} 적용 완료")
+                applied.append(number)
+        finally:
+            await _release_lock(conn)
+    return applied
+
+
+async def main():
+    try:
+        applied = await run_migrations()
+        if not applied:
+            print(f"[마이그레이션] 최신 버전({LATEST_VERSION:04d})입니다.")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, func
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index, func
 from sqlalchemy.orm import relationship
 from .database import Base
 
@@ -26,6 +26,10 @@ class Product(Base):
     image_size_m_h = Column(Integer)
     image_size_b_w = Column(Integer)
     image_size_b_h = Column(Integer)
+    # 상품 동기화용: 쿠펀 상품정보의 내용 해시와 판매 중단(목록에서 사라진) 시각
+    content_hash = Column(String(40))
+    deleted_at = Column(DateTime)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
 class Dispatch(Base):
     __tablename__ = "dispatches"
@@ -45,11 +49,38 @@ class Dispatch(Base):
     sender_phone = Column(String(20))
     
     quantity = Column(Integer, default=0)
+    # 수신자 파일 업로드로 등록한 경우 업로드 ID (recipient_uploads.id)
+    upload_id = Column(Integer, ForeignKey("recipient_uploads.id"))
     dispatch_datetime = Column(DateTime, nullable=False)
     created_at = Column(DateTime, server_default=func.now())
 
+    # 발송 진행 상태: loading(수신자 적재) -> scheduled(발송 대기) -> running(쿠폰 발급/발송 요청) -> sent, partial(일부 발급 실패), failed
+    status = Column(String(20), default="loading")
+    # 작업을 점유한 워커와 점유 갱신 시각 (갱신이 끊기면 다른 워커가 이어서 처리)
+    claimed_by = Column(String(100))
+    claimed_at = Column(DateTime)
+    attempts = Column(Integer, default=0)
+    # 실패 후 다시 점유할 수 있는 시각 (재시도 백오프)
+    next_attempt_at = Column(DateTime)
+    error = Column(String(500))
+    finished_at = Column(DateTime)
+
+    # 수신자 쿠폰 상태별 건수 (수신자 적재/상태 변경 시 함께 갱신, crud.apply_recipient_status_changes)
+    unexchanged_count = Column(Integer, default=0, server_default="0", nullable=False)
+    exchanged_count = Column(Integer, default=0, server_default="0", nullable=False)
+    discarded_count = Column(Integer, default=0, server_default="0", nullable=False)
+    # 발송 건 안에서 중복되었거나 최근 같은 이벤트/상품 발송에 이미 포함되어 적재하지 않은 수신자 수
+    duplicate_count = Column(Integer, default=0, server_default="0", nullable=False)
+
     recipients = relationship("Recipient", back_populates="dispatch")
 
+    __table_args__ = (
+        # 발송 대기 건 조회용
+        Index("ix_dispatches_status_datetime", "status", "dispatch_datetime"),
+        # 같은 이벤트명/상품의 최근 발송 건 조회용 (수신자 중복 제외)
+        Index("ix_dispatches_event_product_created", "event_name", "product_id", "created_at"),
+    )
+
 class Recipient(Base):
     __tablename__ = "recipients"
 
@@ -58,5 +89,101 @@ class Recipient(Base):
     phone_number = Column(String(20), nullable=False, index=True)
     coupon_code = Column(String(50), unique=True, index=True)
     status = Column(String(20), default="미교환") # e.g., 미교환, 교환, 폐기
+    # 쿠펀 교환정보의 사용/취소 시각 (마지막으로 반영한 상태 변경 시각)
+    exchanged_at = Column(DateTime)
+    client_key = Column(String(40), unique=True, index=True) # UMS_MSG.CLIENT_KEY (MMS 발송 요청 시 기록)
+    # LG U+ 발송 결과 (UMS_LOG_YYYYMM에서 반영)
+    delivery_status = Column(String(10)) # e.g., 성공, 실패
+    done_code = Column(String(10))
+    done_date = Column(DateTime)
     
     dispatch = relationship("Dispatch", back_populates="recipients")
+
+    __table_args__ = (
+        # 발송 건별 수신자 목록/상태별 조회용
+        Index("ix_recipients_dispatch_status", "dispatch_id", "status"),
+        # 발송 건에 이미 포함된 번호 확인용 (수신자 중복 제외)
+        Index("ix_recipients_dispatch_phone", "dispatch_id", "phone_number"),
+    )
+
+class UmsLogWatermark(Base):
+    __tablename__ = "ums_log_watermarks"
+
+    # 월별 로그 테이블명 (UMS_LOG_YYYYMM)
+    log_table = Column(String(20), primary_key=True)
+    # 마지막으로 반영한 로그 행의 (DONE_DATE, CLIENT_KEY)
+    last_done_date = Column(DateTime)
+    last_client_key = Column(String(40))
+    rows_applied = Column(Integer, default=0)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+class RecipientUpload(Base):
+    __tablename__ = "recipient_uploads"
+
+    id = Column(Integer, primary_key=True, index=True)
+    filename = Column(String(255))
+    status = Column(String(20), default="processing") # e.g., processing, ready, used(발송 요청에 사용됨), expired, failed
+    total_rows = Column(Integer, default=0) # 빈 행을 제외한 행 수
+    valid_count = Column(Integer, default=0)
+    invalid_count = Column(Integer, default=0)
+    duplicate_count = Column(Integer, default=0)
+    # 유효하지 않은 번호 일부 (JSON: [{"row": 행 번호, "value": 값}, ...])
+    invalid_samples = Column(String(2000))
+    error = Column(String(500))
+    created_at = Column(DateTime, server_default=func.now())
+
+class StagedRecipient(Base):
+    __tablename__ = "staged_recipients"
+
+    id = Column(Integer, primary_key=True)
+    upload_id = Column(Integer, ForeignKey("recipient_uploads.id"), index=True)
+    phone_number = Column(String(20), nullable=False)
+
+class CouponSweep(Base):
+    __tablename__ = "coupon_sweeps"
+
+    id = Column(Integer, primary_key=True, index=True)
+    mode = Column(String(10), nullable=False) # e.g., status(상태조회), cancel(미교환 쿠폰 취소)
+    # 대상: 발송 건 또는 발송일시 구간
+    dispatch_id = Column(Integer, ForeignKey("dispatches.id"))
+    date_from = Column(DateTime)
+    date_to = Column(DateTime)
+    status = Column(String(20), default="running") # e.g., running, done, failed
+    # 실행 중인 워커와 점유(체크포인트) 갱신 시각
+    claimed_by = Column(String(100))
+    claimed_at = Column(DateTime)
+    # 체크포인트: 처리를 마친 마지막 수신자 ID
+    last_recipient_id = Column(Integer, default=0)
+    scanned = Column(Integer, default=0)
+    changed = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    error = Column(String(500))
+    created_at = Column(DateTime, server_default=func.now())
+    finished_at = Column(DateTime)
+
+class CouponIssueFailure(Base):
+    __tablename__ = "coupon_issue_failures"
+
+    # 쿠폰생성 요청의 TR_ID (같은 수신자 묶음은 항상 같은 TR_ID)
+    tr_id = Column(String(60), primary_key=True)
+    dispatch_id = Column(Integer, ForeignKey("dispatches.id"), nullable=False, index=True)
+    # 묶음에서 쿠폰번호를 받지 못한 수신자 ID (쉼표로 구분, 최대 10개)
+    recipient_ids = Column(String(200), nullable=False)
+    reason = Column(String(20), nullable=False) # e.g., unknown(응답을 받지 못함, 같은 TR_ID로 재시도), duplicated(TR_ID 중복, 수동 확인 필요)
+    error = Column(String(500))
+    attempts = Column(Integer, server_default="0", nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    # 클라이언트가 보낸 Idempotency-Key 헤더 값
+    key = Column(String(100), primary_key=True)
+    # 요청 메서드/경로/본문의 SHA-256 (같은 키로 다른 내용을 요청하면 거절)
+    fingerprint = Column(String(64), nullable=False)
+    dispatch_id = Column(Integer, ForeignKey("dispatches.id"))
+    # 처음 요청에 반환한 응답
+    status_code = Column(Integer, nullable=False)
+    response_body = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False, index=True)
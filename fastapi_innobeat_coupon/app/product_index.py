@@ -0,0 +1,157 @@
+import asyncio
+import hashlib
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from . import models, schemas
+from .config import settings
+from .database import SessionLocal
+from .instrumentation import record_span, span
+
+# 한글 음절의 초성 (유니코드 '가'(0xAC00)부터 초성마다 588자씩 배치됨)
+CHOSEONG = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+_CHOSEONG_SET = frozenset(CHOSEONG)
+
+
+def normalize(text: str) -> str:
+    """
+    검색용 정규화: 공백을 제거하고 영문은 소문자로 바꿉니다.
+    """
+    return "".join(text.split()).lower()
+
+
+def to_choseong(text: str) -> str:
+    """
+    한글 음절을 초성으로 바꿉니다. (예: '불고기' -> 'ㅂㄱㄱ') 한글이 아닌 문자는 그대로 둡니다.
+    """
+    return "".join(
+        CHOSEONG[(ord(ch) - 0xAC00) // 588] if "가" <= ch <= "힣" else ch
+        for ch in text
+    )
+
+
+def _grams(text: str) -> set[str]:
+    # 검색어: 한 글자는 그대로, 두 글자 이상은 2-gram으로 후보를 찾습니다.
+    if len(text) < 2:
+        return {text} if text else set()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def _index_grams(text: str) -> set[str]:
+    # 색인: 한 글자 검색어(입력 중 첫 글자)도 찾을 수 있도록 1-gram과 2-gram을 함께 색인합니다.
+    return set(text) | _grams(text)
+
+
+class _Snapshot:
+    """
+    특정 시점의 상품 목록으로 만든 읽기 전용 색인입니다. 갱신 시에는 새 스냅샷으로 통째로 교체합니다.
+    """
+    def __init__(self, products: list[models.Product]):
+        self.names: list[str] = []
+        self.choseongs: list[str] = []
+        self.payloads: list[bytes] = []
+        self.name_grams: dict[str, set[int]] = {}
+        self.choseong_grams: dict[str, set[int]] = {}
+        digest = hashlib.sha1()
+        serialize_seconds = 0.0
+        for position, product in enumerate(products):
+            name = normalize(product.goods_name or "")
+            choseong = to_choseong(name)
+            started = time.perf_counter()
+            payload = schemas.Product.model_validate(product, from_attributes=True).model_dump_json(by_alias=True).encode()
+            serialize_seconds += time.perf_counter() - started
+            self.names.append(name)
+            self.choseongs.append(choseong)
+            self.payloads.append(payload)
+            digest.update(payload)
+            for gram in _index_grams(name):
+                self.name_grams.setdefault(gram, set()).add(position)
+            for gram in _index_grams(choseong):
+                self.choseong_grams.setdefault(gram, set()).add(position)
+        # 내용 기반 ETag이므로 같은 상품 목록을 가진 워커끼리는 ETag가 같습니다.
+        self.etag = f'"{digest.hexdigest()}"'
+        self.built_at = time.monotonic()
+        # 상품 전체를 schemas.Product로 직렬화하는 데 걸린 시간
+        record_span("serialize.schemas.Product", serialize_seconds)
+
+
+class ProductIndex:
+    """
+    /api/products 응답용 프로세스 내 상품 검색 색인입니다.
+
+    상품명과 초성 문자열을 1-gram/2-gram 역색인으로 만들어 두고, 상품별 JSON 응답을 미리 직렬화해 둡니다.
+    검색 시에는 후보를 역색인 교집합으로 좁힌 뒤 부분 문자열로 확인하고, 직렬화된 바이트를 이어 붙여 반환합니다.
+
+    상품 동기화 후에는 refresh()로 즉시 다시 만들고, 다른 워커의 동기화를 반영하기 위해 ttl초가 지나면
+    기존 색인으로 응답하면서 백그라운드에서 다시 만듭니다. 색인 생성은 별도 스레드에서 수행하여 이벤트 루프를 막지 않습니다.
+    """
+    def __init__(self, ttl: float = settings.PRODUCT_INDEX_TTL_SEC):
+        self.ttl = ttl
+        self._snapshot: _Snapshot | None = None
+        self._lock = asyncio.Lock()
+        self._refresh_task: asyncio.Task | None = None
+
+    @property
+    def etag(self) -> str | None:
+        return self._snapshot.etag if self._snapshot else None
+
+    @property
+    def is_fresh(self) -> bool:
+        return self._snapshot is not None and time.monotonic() - self._snapshot.built_at < self.ttl
+
+    async def refresh(self, db: AsyncSession):
+        """
+        DB에서 판매 중인 상품을 읽어 색인을 다시 만듭니다.
+        """
+        result = await db.execute(
+            select(models.Product).filter(models.Product.deleted_at.is_(None)).order_by(models.Product.id)
+        )
+        products = result.scalars().all()
+        with span("product_index.build"):
+            self._snapshot = await asyncio.to_thread(_Snapshot, products)
+
+    async def _refresh_in_background(self):
+        try:
+            async with SessionLocal() as session:
+                await self.refresh(session)
+        except Exception as e:
+            print(f"상품 색인 갱신 중 오류 발생: {e}")
+        finally:
+            self._refresh_task = None
+
+    async def ensure_fresh(self, db: AsyncSession) -> "ProductIndex":
+        if self._snapshot is None:
+            async with self._lock:
+                if self._snapshot is None:
+                    await self.refresh(db)
+        elif not self.is_fresh and self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_in_background())
+        return self
+
+    def search(self, q: str | None, offset: int = 0, limit: int | None = None) -> tuple[int, bytes]:
+        """
+        상품명에 q가 포함된 상품을 찾아 (전체 건수, JSON 배열 바이트)를 반환합니다.
+        q가 초성으로만 이루어져 있으면 초성 문자열에서 찾습니다. (예: 'ㅂㄱ' -> '불고기 버거 세트')
+        """
+        snapshot = self._snapshot
+        query = normalize(q or "")
+        if not query:
+            positions = range(len(snapshot.payloads))
+        else:
+            if all(ch in _CHOSEONG_SET for ch in query):
+                texts, grams = snapshot.choseongs, snapshot.choseong_grams
+            else:
+                texts, grams = snapshot.names, snapshot.name_grams
+            postings = sorted((grams.get(gram, set()) for gram in _grams(query)), key=len)
+            candidates = set.intersection(*postings) if postings else set()
+            positions = sorted(p for p in candidates if query in texts[p])
+
+        total = len(positions)
+        end = None if limit is None else offset + limit
+        page = positions[offset:end]
+        return total, b"[" + b",".join(snapshot.payloads[p] for p in page) + b"]"
+
+
+product_index = ProductIndex()
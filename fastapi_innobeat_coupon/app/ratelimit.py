@@ -0,0 +1,36 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    초당 rate개의 토큰이 채워지는 토큰 버킷 방식의 비동기 속도 제한기입니다.
+    burst는 한 번에 소비할 수 있는 최대 토큰 수(버킷 크기)입니다.
+    """
+    def __init__(self, rate: float, burst: float | None = None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0):
+        """
+        토큰을 확보할 때까지 대기합니다. 요청량이 버킷 크기보다 크면 버킷 크기만큼 나누어 확보합니다.
+        """
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while tokens > 0:
+                take = min(tokens, self.capacity)
+                self._refill()
+                if self._tokens < take:
+                    await asyncio.sleep((take - self._tokens) / self.rate)
+                    self._refill()
+                self._tokens -= take
+                tokens -= take
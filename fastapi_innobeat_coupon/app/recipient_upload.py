@@ -0,0 +1,228 @@
+import asyncio
+import codecs
+import csv
+import itertools
+import json
+import os
+import re
+import tempfile
+from datetime import datetime, timedelta
+
+from fastapi import UploadFile
+from sqlalchemy import and_, exists, or_, update
+from sqlalchemy.future import select
+
+from . import crud, models
+from .config import settings
+from .database import SessionLocal
+from .jobs import Job
+
+SUPPORTED_EXTENSIONS = (".xlsx", ".csv")
+
+# js/main.js와 같은 휴대폰 번호 규칙 (하이픈 제거 후)
+# - '01'로 시작, '010'은 11자리, 그 외 '01x'는 10~11자리
+_VALID_PHONE_LINE = re.compile(r"^(01(?:0\d{8}|[1-9]\d{7,8}))$", re.M)
+_VALID_PHONE = re.compile(r"01(?:0\d{8}|[1-9]\d{7,8})")
+_REMOVE_HYPHEN = str.maketrans("", "", "-")
+
+MAX_INVALID_SAMPLES = 20
+
+
+def _cell_text(value) -> str:
+    """
+    엑셀/CSV 셀 값을 앞뒤 공백을 제거한 문자열로 바꿉니다.
+    엑셀에서 숫자로 저장되어 앞자리 0이 사라진 휴대폰 번호(예: 1012345678)는 0을 다시 붙입니다.
+    공백이나 쉼표만 있는 셀은 빈 행으로 보고 ""를 반환합니다. (빈 행은 이 함수에서만 판단합니다)
+    """
+    if value is None:
+        return ""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        text = str(int(value))
+        return f"0{text}" if text.startswith("1") and 9 <= len(text) <= 10 else text
+    text = str(value).replace("\r", " ").replace("\n", " ").strip()
+    return text if text.replace(",", "").strip() else ""
+
+
+def validate_batch(cells: list[str]) -> tuple[list[str], int]:
+    """
+    _cell_text로 정규화한 셀 목록을 한 번에 검증하여 (유효한 번호 목록, 유효하지 않은 행 수)를 반환합니다. 빈 행("")은 무시합니다.
+    행마다 정규식을 호출하지 않고, 줄바꿈으로 이어 붙인 텍스트에 하이픈 제거와 정규식 검색을 한 번씩만 수행합니다.
+    """
+    text = "\n".join(cells).translate(_REMOVE_HYPHEN)
+    valid = _VALID_PHONE_LINE.findall(text)
+    non_blank = sum(1 for cell in cells if cell)
+    return valid, non_blank - len(valid)
+
+
+def _invalid_rows(cells: list[str], first_row: int) -> list[dict]:
+    return [
+        {"row": first_row + i, "value": cell[:30]}
+        for i, cell in enumerate(cells)
+        if cell and not _VALID_PHONE.fullmatch(cell.translate(_REMOVE_HYPHEN))
+    ]
+
+
+def _detect_encoding(path: str) -> str:
+    """
+    CSV 인코딩을 판별합니다. UTF-8로 읽히지 않으면 엑셀 기본 저장 형식인 CP949로 간주합니다.
+    """
+    with open(path, "rb") as f:
+        head = f.read(64 * 1024)
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(head)
+        return "utf-8-sig"
+    except UnicodeDecodeError:
+        return "cp949"
+
+
+def _iter_first_column(path: str, extension: str):
+    """
+    파일 전체를 메모리에 올리지 않고 첫 번째 열의 값을 한 행씩 반환합니다.
+    """
+    if extension == ".xlsx":
+        import openpyxl
+
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            for (value,) in workbook.worksheets[0].iter_rows(min_col=1, max_col=1, values_only=True):
+                yield value
+        finally:
+            workbook.close()
+    else:
+        with open(path, newline="", encoding=_detect_encoding(path)) as f:
+            for row in csv.reader(f):
+                yield row[0] if row else None
+
+
+async def save_upload(file: UploadFile) -> str:
+    """
+    업로드 파일을 임시 파일로 복사하고 경로를 반환합니다. (요청이 끝나면 UploadFile이 닫히므로)
+    """
+    extension = os.path.splitext(file.filename or "")[1].lower()
+    # 파일 쓰기는 이벤트 루프를 막지 않도록 별도 스레드에서 수행합니다.
+    fd, path = await asyncio.to_thread(tempfile.mkstemp, suffix=extension)
+    out = await asyncio.to_thread(os.fdopen, fd, "wb")
+    try:
+        while chunk := await file.read(1024 * 1024):
+            await asyncio.to_thread(out.write, chunk)
+    finally:
+        await asyncio.to_thread(out.close)
+    return path
+
+
+async def process_upload(job: Job, upload_id: int, path: str, batch_size: int = settings.RECIPIENT_UPLOAD_BATCH_SIZE):
+    """
+    업로드 파일을 batch_size 행씩 읽어 검증하고, 중복을 제거한 유효 번호를 staged_recipients에 적재합니다.
+    파일 읽기는 별도 스레드에서 수행하며, 중복 검사는 번호를 정수로 바꾼 집합으로 합니다.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    rows = _iter_first_column(path, extension)
+    seen: set[int] = set()
+    # 파일의 행 번호 (빈 행 포함, 유효하지 않은 번호의 위치 표시용)
+    row_number = 0
+    counts = {"total_rows": 0, "valid_count": 0, "invalid_count": 0, "duplicate_count": 0}
+    samples: list[dict] = []
+
+    try:
+        async with SessionLocal() as session:
+            while batch := await asyncio.to_thread(lambda: list(itertools.islice(rows, batch_size))):
+                cells = [_cell_text(value) for value in batch]
+                valid, invalid_count = validate_batch(cells)
+                if invalid_count and len(samples) < MAX_INVALID_SAMPLES:
+                    samples.extend(_invalid_rows(cells, row_number + 1)[:MAX_INVALID_SAMPLES - len(samples)])
+
+                new_numbers = []
+                for phone_number in valid:
+                    # '01'로 시작하므로 정수로 바꿔도 서로 다른 번호가 같은 값이 되지 않습니다.
+                    key = int(phone_number)
+                    if key not in seen:
+                        seen.add(key)
+                        new_numbers.append(phone_number)
+
+                # 빈 행은 집계하지 않으므로 total_rows = valid_count + invalid_count + duplicate_count
+                row_number += len(batch)
+                counts["total_rows"] += len(valid) + invalid_count
+                counts["valid_count"] += len(new_numbers)
+                counts["invalid_count"] += invalid_count
+                counts["duplicate_count"] += len(valid) - len(new_numbers)
+                if counts["total_rows"] > settings.RECIPIENT_UPLOAD_MAX_ROWS:
+                    raise ValueError(f"업로드 가능한 최대 행 수({settings.RECIPIENT_UPLOAD_MAX_ROWS:,})를 초과했습니다.")
+
+                await crud.bulk_insert_staged_recipients(session, upload_id, new_numbers)
+                job.advance(len(batch))
+
+            await session.execute(
+                update(models.RecipientUpload)
+                .where(models.RecipientUpload.id == upload_id)
+                .values(status="ready", invalid_samples=json.dumps(samples, ensure_ascii=False), **counts)
+            )
+            await session.commit()
+        print(f"{upload_id}번 수신자 업로드 처리 완료: {counts}")
+    except Exception as e:
+        async with SessionLocal() as session:
+            await session.execute(
+                update(models.RecipientUpload)
+                .where(models.RecipientUpload.id == upload_id)
+                .values(status="failed", error=str(e)[:500], **counts)
+            )
+            await session.commit()
+        # 실패한 업로드는 사용할 수 없으므로 그때까지 적재한 번호를 삭제합니다.
+        await delete_staged(upload_id)
+        raise
+    finally:
+        rows.close()
+        await asyncio.to_thread(os.remove, path)
+
+
+async def delete_staged(upload_id: int):
+    """
+    업로드로 적재된 수신자 번호를 삭제합니다. 발송 건으로 복사가 끝났거나 업로드가 실패/만료된 경우에 호출합니다.
+    실패해도 purge_staged_recipients가 다음 주기에 다시 삭제합니다.
+    """
+    try:
+        async with SessionLocal() as session:
+            await crud.delete_staged_recipients(session, upload_id, settings.RECIPIENT_INSERT_CHUNK_SIZE)
+    except Exception as e:
+        print(f"{upload_id}번 수신자 업로드 번호 삭제 중 오류 발생: {e}")
+
+
+async def purge_staged_recipients():
+    """
+    사용되지 않고 RECIPIENT_UPLOAD_TTL_HOURS가 지난 업로드를 만료(expired) 처리하고,
+    더 이상 필요 없는 업로드(만료/실패, 또는 사용된 업로드 중 수신자 적재가 끝난 업로드)의 남은 번호를 삭제합니다.
+    스케줄러가 주기적으로 호출합니다.
+    """
+    Upload, Dispatch, Staged = models.RecipientUpload, models.Dispatch, models.StagedRecipient
+    async with SessionLocal() as session:
+        await session.execute(
+            update(Upload)
+            .where(Upload.status == "ready", Upload.created_at < datetime.now() - timedelta(hours=settings.RECIPIENT_UPLOAD_TTL_HOURS))
+            .values(status="expired")
+        )
+        await session.commit()
+        result = await session.execute(
+            select(Upload.id).where(
+                or_(
+                    Upload.status.in_(("expired", "failed")),
+                    and_(Upload.status == "used", ~exists().where(Dispatch.upload_id == Upload.id, Dispatch.status == "loading")),
+                ),
+                exists().where(Staged.upload_id == Upload.id),
+            )
+        )
+        upload_ids = result.scalars().all()
+    for upload_id in upload_ids:
+        await delete_staged(upload_id)
+    if upload_ids:
+        print(f"[수신자 업로드] 업로드 {len(upload_ids)}건의 적재 번호를 삭제했습니다.")
+
+
+def schedule_upload_purge(scheduler):
+    scheduler.add_job(
+        purge_staged_recipients,
+        "interval",
+        hours=1,
+        id="recipient-upload-purge",
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True,
+    )
@@ -0,0 +1,192 @@
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, case, func, inspect, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.future import select
+
+from . import models
+from .config import settings
+from .database import SessionLocal, engine
+from .ums import DONE_CODE_SUCCESS, recent_log_tables, ums_log_table
+
+# 워터마크가 없는 로그 테이블의 시작 위치
+_MIN_DONE_DATE = datetime(1970, 1, 1)
+
+# 로그 테이블별 결과 반영 지표 (/api/reconcile/metrics)
+metrics: dict[str, dict] = {}
+
+
+async def _log_table_exists(name: str) -> bool:
+    # 결과 반영은 UPDATE ... JOIN으로 수행하므로 로그 테이블은 애플리케이션 DB 연결에서 접근 가능해야 합니다.
+    async with engine.connect() as conn:
+        return await conn.run_sync(lambda c: inspect(c).has_table(name, schema=settings.UMS_LOG_SCHEMA or None))
+
+
+def _after(log, done_date: datetime, client_key: str):
+    # (DONE_DATE, CLIENT_KEY) > (done_date, client_key)
+    return or_(log.c.DONE_DATE > done_date, and_(log.c.DONE_DATE == done_date, log.c.CLIENT_KEY > client_key))
+
+
+def _not_after(log, done_date: datetime, client_key: str):
+    # (DONE_DATE, CLIENT_KEY) <= (done_date, client_key)
+    return or_(log.c.DONE_DATE < done_date, and_(log.c.DONE_DATE == done_date, log.c.CLIENT_KEY <= client_key))
+
+
+def _not_applied(log, recipients):
+    # 아직 반영되지 않았거나 더 최근 결과인 로그
+    return or_(recipients.c.done_date.is_(None), recipients.c.done_date < log.c.DONE_DATE)
+
+
+def _overlap_start(watermark: models.UmsLogWatermark) -> datetime:
+    return watermark.last_done_date - timedelta(seconds=settings.RECONCILE_OVERLAP_SEC)
+
+
+async def reconcile_log_table(name: str, batch_size: int = settings.RECONCILE_BATCH_SIZE) -> int:
+    """
+    월별 로그 테이블 하나의 새 결과를 recipients에 반영하고 반영한 행 수를 반환합니다.
+
+    (DONE_DATE, CLIENT_KEY) 순서의 키셋 페이지로 워터마크 이후의 로그를 읽고,
+    페이지마다 UPDATE ... JOIN 한 번으로 수신자의 발송 결과를 갱신한 뒤 같은 트랜잭션에서 워터마크를 전진시킵니다.
+    DONE_DATE는 기록 순서와 일치하지 않으므로(워터마크보다 이전 DONE_DATE의 로그가 늦게 기록될 수 있음)
+    매 실행마다 워터마크보다 RECONCILE_OVERLAP_SEC만큼 앞부터 다시 읽으며, 이미 반영된 수신자는 갱신하지 않습니다.
+    워터마크 행을 SELECT ... FOR UPDATE SKIP LOCKED로 잠그므로 여러 워커가 동시에 실행해도 한 곳에서만 처리됩니다.
+    로그 테이블에 (DONE_DATE, CLIENT_KEY) 인덱스가 있어야 키셋 조회가 효율적입니다.
+    """
+    log = ums_log_table(name)
+    recipients = models.Recipient.__table__
+    key_prefix = f"{settings.UMS_CLIENT_KEY_PREFIX}-%"
+    applied = 0
+    # 이번 실행에서 마지막으로 읽은 (DONE_DATE, CLIENT_KEY)
+    cursor = None
+
+    async with SessionLocal() as session:
+        if await session.get(models.UmsLogWatermark, name) is None:
+            session.add(models.UmsLogWatermark(log_table=name, last_done_date=_MIN_DONE_DATE, last_client_key="", rows_applied=0))
+            try:
+                await session.commit()
+            except IntegrityError:
+                # 다른 워커가 먼저 생성함
+                await session.rollback()
+
+        while True:
+            result = await session.execute(
+                select(models.UmsLogWatermark)
+                .filter(models.UmsLogWatermark.log_table == name)
+                .with_for_update(skip_locked=True)
+            )
+            watermark = result.scalars().first()
+            if watermark is None:
+                # 다른 워커가 처리 중
+                break
+            if cursor is None:
+                cursor = (_overlap_start(watermark), "")
+
+            result = await session.execute(
+                select(log.c.DONE_DATE, log.c.CLIENT_KEY)
+                .where(
+                    log.c.CLIENT_KEY.like(key_prefix),
+                    log.c.DONE_DATE.is_not(None),
+                    _after(log, *cursor),
+                )
+                .order_by(log.c.DONE_DATE, log.c.CLIENT_KEY)
+                .limit(batch_size)
+            )
+            keys = result.all()
+            if not keys:
+                await session.rollback()
+                break
+            upper_date, upper_key = keys[-1]
+
+            result = await session.execute(
+                update(recipients)
+                .where(
+                    recipients.c.client_key == log.c.CLIENT_KEY,
+                    log.c.CLIENT_KEY.like(key_prefix),
+                    _after(log, *cursor),
+                    _not_after(log, upper_date, upper_key),
+                    _not_applied(log, recipients),
+                )
+                .values(
+                    delivery_status=case((log.c.DONE_CODE == DONE_CODE_SUCCESS, "성공"), else_="실패"),
+                    done_code=log.c.DONE_CODE,
+                    done_date=log.c.DONE_DATE,
+                )
+            )
+            if (upper_date, upper_key) > (watermark.last_done_date, watermark.last_client_key):
+                watermark.last_done_date = upper_date
+                watermark.last_client_key = upper_key
+            watermark.rows_applied = (watermark.rows_applied or 0) + result.rowcount
+            await session.commit()
+
+            applied += result.rowcount
+            cursor = (upper_date, upper_key)
+            if len(keys) < batch_size:
+                break
+
+    return applied
+
+
+async def _lag_seconds(name: str) -> float | None:
+    """
+    로그 테이블의 가장 최근 DONE_DATE와 아직 반영되지 않은 가장 오래된 로그의 DONE_DATE 차이(초)를 반환합니다.
+    워터마크 이후의 로그뿐 아니라 재확인 구간(RECONCILE_OVERLAP_SEC)에 늦게 기록된 로그도 포함하며,
+    반영되지 않은 로그가 없으면 0을 반환합니다.
+    """
+    log = ums_log_table(name)
+    recipients = models.Recipient.__table__
+    key_prefix = f"{settings.UMS_CLIENT_KEY_PREFIX}-%"
+    async with SessionLocal() as session:
+        watermark = await session.get(models.UmsLogWatermark, name)
+        if watermark is None:
+            return None
+        newest = await session.scalar(select(func.max(log.c.DONE_DATE)).where(log.c.CLIENT_KEY.like(key_prefix)))
+        oldest_pending = await session.scalar(
+            select(func.min(log.c.DONE_DATE))
+            .join(recipients, recipients.c.client_key == log.c.CLIENT_KEY)
+            .where(
+                log.c.CLIENT_KEY.like(key_prefix),
+                log.c.DONE_DATE > _overlap_start(watermark),
+                _not_applied(log, recipients),
+            )
+        )
+    if newest is None or oldest_pending is None:
+        return None if newest is None else 0.0
+    return max((newest - oldest_pending).total_seconds(), 0.0)
+
+
+async def run_reconcile():
+    """
+    최근 월별 로그 테이블의 발송 결과를 반영합니다. 스케줄러가 주기적으로 호출합니다.
+    """
+    for name in recent_log_tables():
+        if not await _log_table_exists(name):
+            continue
+        started = time.monotonic()
+        try:
+            applied = await reconcile_log_table(name)
+        except Exception as e:
+            print(f"[발송결과] {name} 반영 중 오류 발생: {e}")
+            metrics.setdefault(name, {})["last_error"] = str(e)
+            continue
+        entry = metrics.setdefault(name, {"rows_applied_total": 0})
+        entry["last_run_at"] = datetime.now()
+        entry["last_run_seconds"] = round(time.monotonic() - started, 3)
+        entry["last_batch_rows"] = applied
+        entry["rows_applied_total"] = entry.get("rows_applied_total", 0) + applied
+        entry["lag_seconds"] = await _lag_seconds(name)
+        entry["last_error"] = None
+        if applied:
+            print(f"[발송결과] {name} 결과 {applied}건 반영 완료.")
+
+
+def schedule_reconcile(scheduler):
+    scheduler.add_job(
+        run_reconcile,
+        "interval",
+        seconds=settings.RECONCILE_INTERVAL_SEC,
+        id="ums-reconcile",
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True,
+    )
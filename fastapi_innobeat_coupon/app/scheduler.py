@@ -0,0 +1,4 @@
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+# 프로세스 내 주기 작업(발송 결과 반영 등)을 실행하는 스케줄러
+scheduler = AsyncIOScheduler()
@@ -1,6 +1,8 @@
-from pydantic import BaseModel, Field, computed_field
+from pydantic import BaseModel, Field, Json, computed_field, model_validator
 from datetime import datetime
-from typing import Optional
+from typing import Literal, Optional
+
+from .ums import MMS_CONTENT_MAX_LENGTH, MSG_MAX_LENGTH, PHONE_MAX_LENGTH
 
 # 상품 생성을 위한 스키마
 class ProductCreate(BaseModel):
@@ -58,6 +60,14 @@ class Product(ProductBase):
         orm_mode = True # SQLAlchemy 모델과 매핑을 위함
         populate_by_name = True # alias를 사용하여 필드 매핑 활성화
 
+# 상품 동기화 결과 스키마
+class ProductSyncResult(BaseModel):
+    inserted: int
+    updated: int
+    unchanged: int
+    deleted: int
+    error: Optional[str] = None
+
 # 수신자 생성 스키마
 class RecipientCreate(BaseModel):
     phone_number: str
@@ -76,13 +86,188 @@ class DispatchBase(BaseModel):
     dispatch_datetime: datetime
 
 # 발송 생성 스키마 (API 요청 본문)
+# 수신자는 recipients(JSON 목록) 또는 upload_id(/api/recipient-uploads로 업로드한 파일) 중 하나로 지정합니다.
 class DispatchCreate(DispatchBase):
-    recipients: list[RecipientCreate]
+    recipients: list[RecipientCreate] = []
+    upload_id: Optional[int] = None
+
+    @model_validator(mode="after")
+    def check_recipient_source(self):
+        if bool(self.recipients) == (self.upload_id is not None):
+            raise ValueError("recipients와 upload_id 중 하나만 지정해야 합니다.")
+        return self
+
+    @model_validator(mode="after")
+    def check_message_lengths(self):
+        # 쿠폰번호를 붙인 메시지와 번호가 UMS_MSG 컬럼 길이를 넘지 않아야 합니다.
+        if len(self.mms_content) > MMS_CONTENT_MAX_LENGTH:
+            raise ValueError(f"mms_content는 {MMS_CONTENT_MAX_LENGTH}자 이하여야 합니다. (쿠폰번호 포함 {MSG_MAX_LENGTH}자)")
+        if len(self.sender_phone) > PHONE_MAX_LENGTH:
+            raise ValueError(f"sender_phone은 {PHONE_MAX_LENGTH}자 이하여야 합니다.")
+        for recipient in self.recipients:
+            if len(recipient.phone_number.replace("-", "").strip()) > PHONE_MAX_LENGTH:
+                raise ValueError(f"수신 번호는 {PHONE_MAX_LENGTH}자 이하여야 합니다: {recipient.phone_number}")
+        return self
 
 # 발송 응답 스키마
 class Dispatch(DispatchBase):
     id: int
     quantity: int
+    upload_id: Optional[int] = None
+    # 발송 진행 상태 (loading, scheduled, running, sent, partial, failed)
+    status: Optional[str] = None
+    error: Optional[str] = None
+    # 중복으로 적재하지 않은 수신자 수 (발송 건 내 중복, 최근 같은 이벤트/상품 발송의 수신자)
+    duplicate_count: int = 0
+    # 수신자 적재 백그라운드 작업 ID (/api/jobs/{job_id}로 진행 상황 조회)
+    job_id: Optional[str] = None
+
+    class Config:
+        orm_mode = True
+
+# 발송 내역 조회 스키마 (상품명, 상태별 건수 포함)
+class DispatchSummary(BaseModel):
+    id: int
+    client_name: str
+    event_name: str
+    sales_manager: Optional[str] = None
+    client_requester: Optional[str] = None
+    product_id: Optional[int] = None
+    product_name: Optional[str] = None
+    goods_price: Optional[int] = None
+    sender_phone: Optional[str] = None
+    quantity: int
+    dispatch_datetime: datetime
+    created_at: Optional[datetime] = None
+    status: Optional[str] = None
+    unexchanged_count: int = 0
+    exchanged_count: int = 0
+    discarded_count: int = 0
+    duplicate_count: int = 0
+
+    class Config:
+        orm_mode = True
+
+# 발송 내역 페이지 (next_cursor를 cursor로 넘겨 다음 페이지 조회)
+class DispatchPage(BaseModel):
+    items: list[DispatchSummary]
+    next_cursor: Optional[int] = None
+
+# 수신자 조회 스키마
+class Recipient(BaseModel):
+    id: int
+    dispatch_id: int
+    phone_number: str
+    coupon_code: Optional[str] = None
+    status: Optional[str] = None
+    delivery_status: Optional[str] = None
+    done_code: Optional[str] = None
+    done_date: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
+
+class RecipientPage(BaseModel):
+    items: list[Recipient]
+    next_cursor: Optional[int] = None
+
+# 발급 결과를 확인하지 못한 쿠폰생성 요청
+class CouponIssueFailure(BaseModel):
+    tr_id: str
+    dispatch_id: int
+    # 묶음에서 쿠폰번호를 받지 못한 수신자 ID (쉼표로 구분)
+    recipient_ids: str
+    # unknown(응답을 받지 못함, 다음 실행에서 같은 TR_ID로 재시도), duplicated(TR_ID 중복, 수동 확인 필요)
+    reason: str
+    error: Optional[str] = None
+    attempts: int = 0
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
+
+# CS 조회 스키마 (수신자 + 발송 건/상품 정보)
+class CsRecipient(Recipient):
+    client_name: str
+    event_name: str
+    dispatch_datetime: datetime
+    sender_phone: Optional[str] = None
+    goods_name: Optional[str] = None
+
+class CsRecipientPage(BaseModel):
+    items: list[CsRecipient]
+    next_cursor: Optional[int] = None
+
+# 백그라운드 작업 진행 상태 스키마
+class Job(BaseModel):
+    id: str
+    name: str
+    status: str
+    stage: Optional[str] = None
+    total: int
+    processed: int
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
+
+# 유효하지 않은 업로드 행
+class InvalidRow(BaseModel):
+    row: int
+    value: str
+
+# 수신자 파일 업로드 응답 스키마
+class RecipientUpload(BaseModel):
+    id: int
+    filename: Optional[str] = None
+    status: str
+    total_rows: int
+    valid_count: int
+    invalid_count: int
+    duplicate_count: int
+    invalid_samples: Optional[Json[list[InvalidRow]]] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    # 파일 검증/적재 백그라운드 작업 ID
+    job_id: Optional[str] = None
+
+    class Config:
+        orm_mode = True
+
+# 쿠폰 상태조회/취소 일괄 작업 요청 스키마 (dispatch_id 또는 발송일시 구간 지정)
+class CouponSweepCreate(BaseModel):
+    mode: Literal["status", "cancel"]
+    dispatch_id: Optional[int] = None
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+
+    @model_validator(mode="after")
+    def check_target(self):
+        if self.dispatch_id is None and self.date_from is None and self.date_to is None:
+            raise ValueError("dispatch_id 또는 발송일시 구간(date_from, date_to)을 지정해야 합니다.")
+        return self
+
+# 쿠폰 상태조회/취소 일괄 작업 응답 스키마
+class CouponSweep(BaseModel):
+    id: int
+    mode: str
+    dispatch_id: Optional[int] = None
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+    # 작업 상태 (running, done, failed)
+    status: str
+    last_recipient_id: int = 0
+    scanned: int = 0
+    changed: int = 0
+    failed: int = 0
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    # 작업 실행 백그라운드 작업 ID
+    job_id: Optional[str] = None
 
     class Config:
         orm_mode = True
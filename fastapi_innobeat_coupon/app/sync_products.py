@@ -1,76 +1,129 @@
+import hashlib
+import json
+import xml.etree.ElementTree as ET
+from datetime import datetime
 
 import httpx
+from sqlalchemy import update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import delete
 
-from . import models, schemas
-from .config import settings  # 설정 파일에서 API 키 등을 가져오도록 구성
+from . import crud, models
+from .config import settings
+from .coufun import RESULT_SUCCESS, CoufunClient, get_coufun_client
+
+# 쿠펀 상품정보 필드 -> models.Product 컬럼 (MyDocuments/01_쿠폰공급사API/1.상품정보)
+STRING_FIELDS = {
+    "CAT_ID": "cat_id",
+    "GOODS_NAME": "goods_name",
+    "GOODS_INFO": "goods_info",
+    "USE_GUIDE": "use_guide",
+    "EXC_BRANCH": "exc_branch",
+    "VALID_END_TYPE": "valid_end_type",
+    "VALID_END_DATE": "valid_end_date",
+    "SEND_TYPE": "send_type",
+    "IMAGE_PATH_S": "image_path_s",
+    "IMAGE_PATH_M": "image_path_m",
+    "IMAGE_PATH_B": "image_path_b",
+}
+INT_FIELDS = {
+    "GOODS_ORI_PRICE": "goods_ori_price",
+    "GOODS_PRICE": "goods_price",
+    "IMAGE_SIZE_S_W": "image_size_s_w",
+    "IMAGE_SIZE_S_H": "image_size_s_h",
+    "IMAGE_SIZE_M_W": "image_size_m_w",
+    "IMAGE_SIZE_M_H": "image_size_m_h",
+    "IMAGE_SIZE_B_W": "image_size_b_w",
+    "IMAGE_SIZE_B_H": "image_size_b_h",
+}
+
+
+def _to_int(value: str | None) -> int:
+    try:
+        return int(value) if value else 0
+    except ValueError:
+        return 0
+
+
+def product_row(item: dict[str, str]) -> dict:
+    """
+    상품목록 API의 PRODUCT_INFO 블록을 products 테이블 행으로 변환하고 내용 해시를 붙입니다.
+    """
+    row = {"goods_id": item.get("GOODS_ID")}
+    row.update({column: item.get(field) or None for field, column in STRING_FIELDS.items()})
+    row.update({column: _to_int(item.get(field)) for field, column in INT_FIELDS.items()})
+    row["content_hash"] = hashlib.sha1(json.dumps(row, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+    return row
+
+
+async def _soft_delete(db: AsyncSession, goods_ids: list[str], batch_size: int):
+    now = datetime.now()
+    for start in range(0, len(goods_ids), batch_size):
+        await db.execute(
+            update(models.Product)
+            .where(models.Product.goods_id.in_(goods_ids[start:start + batch_size]))
+            .values(deleted_at=now)
+        )
+        await db.commit()
+
 
 # 동기화 함수
-async def sync_products_from_coufun(db: AsyncSession):
+async def sync_products_from_coufun(db: AsyncSession, client: CoufunClient | None = None, batch_size: int = settings.PRODUCT_SYNC_BATCH_SIZE) -> dict:
     """
     쿠펀 API에서 상품 정보를 가져와 DB에 동기화합니다.
+
+    상품목록 응답을 스트리밍으로 파싱하면서 goods_id별 내용 해시를 기존 값과 비교하여
+    신규/변경된 상품만 batch_size 단위의 INSERT ... ON DUPLICATE KEY UPDATE로 반영합니다.
+    목록에서 사라진 상품은 삭제하지 않고 deleted_at을 기록하므로, 발송 이력이 참조하는 상품 ID가 유지됩니다.
+    변경 내역 요약(inserted/updated/unchanged/deleted)을 반환합니다.
     """
     print("상품 정보 동기화를 시작합니다...")
+    client = client or get_coufun_client()
+    summary = {"inserted": 0, "updated": 0, "unchanged": 0, "deleted": 0, "error": None}
 
-    # API 호출을 위한 정보 (설정 파일에서 가져와야 함)
-    api_url = "https://api.coufun.co.kr/v2/b2c/goods/list" # 예시 URL
-    headers = {
-        "Authorization": f"Bearer {settings.COUPON_API_KEY}" 
-    }
-    params = {
-        "cp_id": settings.COUPON_CP_ID,
-        # 필요한 다른 파라미터들 추가
-    }
+    result = await db.execute(select(models.Product.goods_id, models.Product.content_hash, models.Product.deleted_at))
+    existing = {goods_id: (content_hash, deleted_at) for goods_id, content_hash, deleted_at in result.all()}
+    seen: set[str] = set()
+    fields: dict[str, str] = {}
+    batch: list[dict] = []
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(api_url, headers=headers, params=params)
-            response.raise_for_status() # 오류 발생 시 예외 처리
-            
-            api_data = response.json()
-            
-            if api_data.get("res_code") == "0000":
-                products_data = api_data.get("goods_list", [])
-                
-                # 1. 기존 상품 정보 모두 삭제
-                await db.execute(delete(models.Product))
-                
-                # 2. 새로운 상품 정보 추가
-                for item in products_data:
-                    product = models.Product(
-                        cat_id=item.get("CAT_ID"),
-                        goods_id=item.get("GOODS_ID"),
-                        goods_name=item.get("GOODS_NAME"),
-                        goods_ori_price=int(item.get("GOODS_ORI_PRICE", 0)),
-                        goods_price=int(item.get("GOODS_PRICE", 0)),
-                        goods_info=item.get("GOODS_INFO"),
-                        use_guide=item.get("USE_GUIDE"),
-                        exc_branch=item.get("EXC_BRANCH"),
-                        valid_end_type=item.get("VALID_END_TYPE"),
-                        valid_end_date=item.get("VALID_END_DATE"),
-                        send_type=item.get("SEND_TYPE"),
-                        image_path_s=item.get("IMAGE_PATH_S"),
-                        image_path_m=item.get("IMAGE_PATH_M"),
-                        image_path_b=item.get("IMAGE_PATH_B"),
-                        image_size_s_w=int(item.get("IMAGE_SIZE_S_W", 0)),
-                        image_size_s_h=int(item.get("IMAGE_SIZE_S_H", 0)),
-                        image_size_m_w=int(item.get("IMAGE_SIZE_M_W", 0)),
-                        image_size_m_h=int(item.get("IMAGE_SIZE_M_H-", 0)), # 문서 오타 수정
-                        image_size_b_w=int(item.get("IMAGE_SIZE_B_W", 0)),
-                        image_size_b_h=int(item.get("IMAGE_SIZE_B_H", 0)),
-                    )
-                    db.add(product)
-                
-                await db.commit()
-                print(f"상품 {len(products_data)}개 동기화 완료.")
+        async for item in client.iter_records("/coufunProduct.do", {}, "PRODUCT_INFO", fields=fields):
+            row = product_row(item)
+            goods_id = row["goods_id"]
+            if not goods_id or goods_id in seen:
+                continue
+            seen.add(goods_id)
+
+            previous = existing.get(goods_id)
+            if previous is None:
+                summary["inserted"] += 1
+            elif previous[0] != row["content_hash"] or previous[1] is not None:
+                summary["updated"] += 1
             else:
-                print(f"API 오류: {api_data.get('res_msg')}")
+                summary["unchanged"] += 1
+                continue
 
-    except httpx.RequestError as e:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                await crud.bulk_upsert_products(db, batch)
+                batch = []
+        await crud.bulk_upsert_products(db, batch)
+    except (httpx.HTTPError, ET.ParseError) as e:
+        # 목록을 끝까지 받지 못했으므로 판매 중단 처리는 하지 않습니다.
         print(f"API 요청 중 오류 발생: {e}")
-    except Exception as e:
-        print(f"동기화 중 알 수 없는 오류 발생: {e}")
         await db.rollback()
+        summary["error"] = str(e)
+        return summary
+
+    if fields.get("RESULT_CODE") != RESULT_SUCCESS:
+        print(f"API 오류: {fields.get('RESULT_MSG')}")
+        summary["error"] = fields.get("RESULT_MSG") or "상품목록 조회 실패"
+        return summary
+
+    removed = [goods_id for goods_id, (_, deleted_at) in existing.items() if goods_id not in seen and deleted_at is None]
+    await _soft_delete(db, removed, batch_size)
+    summary["deleted"] = len(removed)
 
+    print(f"상품 동기화 완료: {summary}")
+    return summary
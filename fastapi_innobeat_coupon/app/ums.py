@@ -0,0 +1,254 @@
+from datetime import date, datetime
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, bindparam, insert, inspect, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from . import models
+from .config import settings
+from .database import DATABASE_URL, create_engine, engine
+from .ratelimit import TokenBucket
+
+# LG U+ SNAP Agent가 관리하는 테이블은 애플리케이션의 Base.metadata와 분리하여
+# create_all 대상에서 제외합니다. (MyDocuments/02_LG유플러스/1.UMS_MSG_테이블_매뉴얼)
+ums_metadata = MetaData()
+
+ums_msg = Table(
+    "UMS_MSG",
+    ums_metadata,
+    Column("CLIENT_KEY", String(40), primary_key=True),
+    Column("REQ_CH", String(10), nullable=False),
+    Column("TRAFFIC_TYPE", String(10)),
+    Column("MSG_STATUS", String(10), nullable=False),
+    Column("REQ_DATE", DateTime, nullable=False),
+    Column("CALLBACK_NUMBER", String(16), nullable=False),
+    Column("CAMPAIGN_ID", String(20)),
+    Column("PHONE", String(16)),
+    Column("MSG", String(2000)),
+    Column("TITLE", String(100)),
+    Column("MMS_FILE_LIST", String(450)),
+    Column("ETC1", String(50)),
+    Column("ETC2", String(50)),
+)
+
+# 발송 결과 코드: 성공 (MyDocuments/02_LG유플러스/4.추가결과코드)
+DONE_CODE_SUCCESS = "10000"
+
+
+def recent_log_tables(today: date | None = None, months: int = settings.RECONCILE_MONTHS) -> list[str]:
+    """
+    이번 달부터 거슬러 올라가며 months개의 월별 로그 테이블명을 반환합니다. (예: UMS_LOG_202510)
+    """
+    today = today or date.today()
+    year, month = today.year, today.month
+    names = []
+    for _ in range(months):
+        names.append(f"UMS_LOG_{year:04d}{month:02d}")
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return names
+
+
+def ums_log_table(name: str) -> Table:
+    """
+    발송 완료 후 메시지가 이관되는 월별 로그 테이블(UMS_LOG_YYYYMM)에서 결과 반영에 필요한 컬럼만 정의합니다.
+    """
+    return Table(
+        name,
+        MetaData(),
+        Column("CLIENT_KEY", String(40), primary_key=True),
+        Column("DONE_DATE", DateTime),
+        Column("DONE_CODE", String(10)),
+        Column("DONE_CODE_DESC", String(200)),
+        schema=settings.UMS_LOG_SCHEMA or None,
+    )
+
+
+# UMS_MSG 적재 전용 엔진. API 요청을 처리하는 engine과 커넥션 풀을 공유하지 않으므로
+# 대량 발송 중에도 API 요청이 커넥션을 기다리지 않습니다.
+ums_engine = create_engine(
+    settings.UMS_DATABASE_URL or DATABASE_URL,
+    "ums",
+    pool_size=settings.UMS_POOL_SIZE,
+    max_overflow=0,
+)
+
+# 프로세스 단위 초당 메시지 적재 상한
+ums_rate_limiter = TokenBucket(settings.UMS_MAX_PER_SEC, burst=settings.UMS_INSERT_BATCH_SIZE)
+
+
+def make_client_key(recipient_id: int) -> str:
+    """
+    수신자 ID로 UMS_MSG의 CLIENT_KEY를 만듭니다.
+    수신자 ID가 유일하므로 키가 충돌하지 않고, 같은 수신자에 대해 항상 같은 키가 만들어지므로
+    재실행 시 INSERT IGNORE로 중복 적재를 막을 수 있습니다.
+    """
+    return f"{settings.UMS_CLIENT_KEY_PREFIX}-{recipient_id:015d}"
+
+
+# UMS_MSG 컬럼 길이 (발송 요청 생성 시 검증, schemas.DispatchCreate)
+MSG_MAX_LENGTH = 2000
+PHONE_MAX_LENGTH = 16
+COUPON_LINE = "\n\n쿠폰번호: "
+# 쿠폰번호(recipients.coupon_code 최대 50자)를 붙여도 MSG 길이를 넘지 않는 본문 길이
+MMS_CONTENT_MAX_LENGTH = MSG_MAX_LENGTH - len(COUPON_LINE) - models.Recipient.__table__.c.coupon_code.type.length
+
+
+def build_message(mms_content: str, coupon_code: str) -> str:
+    return f"{mms_content}{COUPON_LINE}{coupon_code}"
+
+
+def _invalid_reason(message: dict) -> str | None:
+    if len(message["MSG"]) > MSG_MAX_LENGTH:
+        return f"메시지 길이 {len(message['MSG'])}자 (최대 {MSG_MAX_LENGTH}자)"
+    if len(message["PHONE"]) > PHONE_MAX_LENGTH:
+        return f"수신 번호 길이 {len(message['PHONE'])}자 (최대 {PHONE_MAX_LENGTH}자)"
+    return None
+
+
+async def _insert_messages(messages: list[dict]):
+    await ums_rate_limiter.acquire(len(messages))
+    async with ums_engine.begin() as conn:
+        await conn.execute(
+            insert(ums_msg).prefix_with("IGNORE", dialect="mysql").prefix_with("OR IGNORE", dialect="sqlite").values(messages)
+        )
+
+
+async def _written_client_keys(keys: list[str]) -> set[str]:
+    """
+    UMS_MSG 또는 최근 월별 로그 테이블(발송 후 Agent가 이관)에 이미 있는 CLIENT_KEY를 반환합니다.
+    Agent가 UMS_MSG에서 로그 테이블로 옮기는 중에도 놓치지 않도록 UMS_MSG를 먼저 확인합니다.
+    """
+    async with ums_engine.connect() as conn:
+        found = set((await conn.execute(select(ums_msg.c.CLIENT_KEY).where(ums_msg.c.CLIENT_KEY.in_(keys)))).scalars().all())
+    # 로그 테이블은 결과 반영(UPDATE ... JOIN)과 마찬가지로 애플리케이션 DB 연결에서 조회합니다.
+    async with engine.connect() as conn:
+        for name in recent_log_tables():
+            if len(found) == len(keys):
+                break
+            if not await conn.run_sync(lambda c: inspect(c).has_table(name, schema=settings.UMS_LOG_SCHEMA or None)):
+                continue
+            log = ums_log_table(name)
+            found.update((await conn.execute(select(log.c.CLIENT_KEY).where(log.c.CLIENT_KEY.in_(keys)))).scalars().all())
+    return found
+
+
+def _message(dispatch, dispatch_id: int, req_date: datetime, recipient) -> dict:
+    return {
+        "CLIENT_KEY": make_client_key(recipient.id),
+        "REQ_CH": "MMS",
+        "TRAFFIC_TYPE": settings.UMS_TRAFFIC_TYPE,
+        "MSG_STATUS": "ready",
+        "REQ_DATE": req_date,
+        "CALLBACK_NUMBER": dispatch.sender_phone,
+        "CAMPAIGN_ID": str(dispatch_id),
+        "PHONE": recipient.phone_number,
+        "MSG": build_message(dispatch.mms_content, recipient.coupon_code),
+        "TITLE": dispatch.mms_title,
+        "MMS_FILE_LIST": dispatch.image_path_b,
+        "ETC1": str(dispatch_id),
+        "ETC2": str(recipient.id),
+    }
+
+
+async def write_dispatch_messages(db: AsyncSession, dispatch_id: int, batch_size: int = settings.UMS_INSERT_BATCH_SIZE, on_progress=None) -> int:
+    """
+    쿠폰이 발급된 수신자를 UMS_MSG 테이블에 MSG_STATUS=ready 상태로 적재하여 MMS 발송을 요청합니다.
+
+    아직 CLIENT_KEY가 없는 수신자만 ID 순서로 키셋 조회하여, 수신자에 CLIENT_KEY를 먼저 기록(커밋)한 뒤
+    batch_size 단위의 다중 행 INSERT로 적재합니다. 발송 시각이 미래이면 REQ_DATE로 예약 발송됩니다.
+    INSERT IGNORE는 메시지가 UMS_MSG에 남아 있는 동안만 중복을 막으므로, 적재 후 키를 기록하면 그 사이에 중단되었을 때
+    (Agent가 이미 발송하여 로그 테이블로 옮긴) 메시지를 다시 적재하게 됩니다.
+    반대로 키를 기록한 뒤 적재 전에 중단된 수신자는, 다음 실행에서 결과가 없는 수신자의 CLIENT_KEY가
+    UMS_MSG와 최근 로그 테이블 어디에도 없으면 다시 적재합니다.
+    메시지/수신 번호가 UMS_MSG 컬럼 길이를 넘는 수신자는 적재하지 않고 발송 결과를 실패로 기록합니다.
+    적재한 메시지 수를 반환합니다.
+    """
+    result = await db.execute(
+        select(
+            models.Dispatch.dispatch_datetime,
+            models.Dispatch.sender_phone,
+            models.Dispatch.mms_title,
+            models.Dispatch.mms_content,
+            models.Product.image_path_b,
+        )
+        .outerjoin(models.Product, models.Dispatch.product_id == models.Product.id)
+        .filter(models.Dispatch.id == dispatch_id)
+    )
+    dispatch = result.first()
+    if dispatch is None:
+        raise ValueError(f"{dispatch_id}번 발송 건을 찾을 수 없습니다.")
+    req_date = max(dispatch.dispatch_datetime, datetime.now())
+
+    table = models.Recipient.__table__
+    columns = (table.c.id, table.c.phone_number, table.c.coupon_code, table.c.client_key)
+    written = 0
+
+    # 1. 이전 실행에서 CLIENT_KEY를 기록한 뒤 적재 전에 중단된 수신자
+    last_id = 0
+    while True:
+        result = await db.execute(
+            select(*columns)
+            .where(
+                table.c.dispatch_id == dispatch_id,
+                table.c.client_key.is_not(None),
+                table.c.delivery_status.is_(None),
+                table.c.id > last_id,
+            )
+            .order_by(table.c.id)
+            .limit(batch_size)
+        )
+        recipients = result.all()
+        if not recipients:
+            break
+        last_id = recipients[-1].id
+        found = await _written_client_keys([r.client_key for r in recipients])
+        missing = [_message(dispatch, dispatch_id, req_date, r) for r in recipients if r.client_key not in found]
+        if missing:
+            print(f"[UMS] {dispatch_id}번 발송 건 적재가 중단된 메시지 {len(missing)}건을 다시 적재합니다.")
+            await _insert_messages(missing)
+            written += len(missing)
+
+    # 2. 아직 적재하지 않은 수신자
+    last_id = 0
+    while True:
+        result = await db.execute(
+            select(*columns)
+            .where(
+                table.c.dispatch_id == dispatch_id,
+                table.c.coupon_code.is_not(None),
+                table.c.client_key.is_(None),
+                table.c.id > last_id,
+            )
+            .order_by(table.c.id)
+            .limit(batch_size)
+        )
+        recipients = result.all()
+        if not recipients:
+            break
+        last_id = recipients[-1].id
+
+        messages, rejected = [], []
+        for r in recipients:
+            message = _message(dispatch, dispatch_id, req_date, r)
+            reason = _invalid_reason(message)
+            if reason is None:
+                messages.append(message)
+            else:
+                print(f"[UMS] {dispatch_id}번 발송 건 수신자 {r.id} 적재 제외: {reason}")
+                rejected.append(r.id)
+
+        await db.execute(
+            update(table).where(table.c.id == bindparam("recipient_id")).values(client_key=bindparam("key")),
+            [{"recipient_id": r.id, "key": make_client_key(r.id)} for r in recipients],
+        )
+        if rejected:
+            await db.execute(update(table).where(table.c.id.in_(rejected)).values(delivery_status="실패"))
+        await db.commit()
+
+        if messages:
+            await _insert_messages(messages)
+        written += len(messages)
+        if on_progress:
+            on_progress(len(recipients))
+
+    return written
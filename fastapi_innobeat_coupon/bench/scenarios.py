@@ -0,0 +1,251 @@
+"""
+성능 측정 시나리오. bench.run이 시나리오/규모마다 새 프로세스에서 하나씩 실행합니다.
+이 모듈은 DATABASE_URL 등 환경 변수가 설정된 뒤에 import되어야 합니다.
+"""
+import asyncio
+import random
+import resource
+import time
+from datetime import datetime
+
+import httpx
+from sqlalchemy import event, func
+from sqlalchemy.future import select
+
+from app import coufun, database, models, ums
+from app.database import Base, SessionLocal
+from app.db_metrics import LatencyStats
+from app.dispatch_jobs import run_due_dispatches
+from app.jobs import jobs
+from app.main import app
+from app.product_index import product_index
+from app.reconcile import metrics as reconcile_metrics, run_reconcile
+from app.sync_products import sync_products_from_coufun
+from stubs import coufun_stub
+from stubs.ums_stub import deliver_messages
+
+# 합성 데이터 난수 시드 (같은 규모는 항상 같은 데이터로 측정)
+SEED = 20251110
+
+
+class QueryCounter:
+    """
+    엔진에서 실행된 쿼리(executemany는 1건) 수를 셉니다.
+    """
+    def __init__(self, engines):
+        self.count = 0
+        for engine in {id(e): e for e in engines}.values():
+            event.listen(engine.sync_engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+class Recorder:
+    """
+    시나리오의 단계별 소요 시간, 처리 행 수, 쿼리 수를 기록합니다.
+    """
+    def __init__(self, counter: QueryCounter):
+        self.counter = counter
+        self.stages: dict[str, dict] = {}
+        self.latency: dict[str, LatencyStats] = {}
+        self.checks: dict[str, int] = {}
+
+    def start(self) -> tuple[float, int]:
+        return time.perf_counter(), self.counter.count
+
+    def record(self, name: str, started: tuple[float, int], rows: int):
+        seconds = time.perf_counter() - started[0]
+        self.stages[name] = {
+            "seconds": round(seconds, 3),
+            "rows": rows,
+            "rows_per_sec": round(rows / seconds, 1) if seconds else None,
+            "queries": self.counter.count - started[1],
+        }
+
+    async def request(self, name: str, client: httpx.AsyncClient, method: str, url: str, **kwargs) -> httpx.Response:
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.latency.setdefault(name, LatencyStats(max_samples=100_000)).add((time.perf_counter() - started) * 1000)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{method} {url} 실패: {response.status_code} {response.text[:200]}")
+        return response
+
+    def result(self) -> dict:
+        return {
+            "stages": self.stages,
+            "latency": {name: stats.summary() for name, stats in self.latency.items()},
+            "queries": self.counter.count,
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "checks": self.checks,
+        }
+
+
+async def _prepare_database():
+    """
+    벤치마크용 DB의 테이블을 모두 삭제하고 다시 만듭니다. (반드시 전용 DB에서 실행)
+    """
+    async with database.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    async with ums.ums_engine.begin() as conn:
+        await conn.run_sync(ums.ums_metadata.drop_all)
+        await conn.run_sync(ums.ums_metadata.create_all)
+
+
+def _setup_coufun(coufun_url: str | None):
+    # coufun_url이 없으면 스텁 서버를 프로세스 내에서 호출합니다.
+    if coufun_url:
+        coufun._client = coufun.CoufunClient(base_url=coufun_url, rate_per_sec=0)
+    else:
+        coufun._client = coufun.CoufunClient(
+            base_url="http://coufun-stub/b2c_api",
+            rate_per_sec=0,
+            transport=httpx.ASGITransport(app=coufun_stub.app),
+        )
+
+
+def _phone_numbers(size: int) -> list[str]:
+    return [f"010{n:08d}" for n in random.Random(SEED).sample(range(10 ** 8), size)]
+
+
+async def _sync_products(size: int) -> dict:
+    coufun_stub.PRODUCT_COUNT = size
+    async with SessionLocal() as session:
+        summary = await sync_products_from_coufun(session, coufun.get_coufun_client())
+    if summary.get("error"):
+        raise RuntimeError(f"상품 동기화 실패: {summary['error']}")
+    return summary
+
+
+async def _wait_job(job, recorder: Recorder, rows_by_stage: dict[str, int] | None = None):
+    """
+    백그라운드 작업이 끝날 때까지 기다리며 단계(job.stage)가 바뀔 때마다 이전 단계를 기록합니다.
+    """
+    # 단계가 없는 작업은 작업 이름으로 기록합니다.
+    stage, started = job.stage or job.name, recorder.start()
+    while job.status in ("pending", "running"):
+        await asyncio.sleep(0.01)
+        if job.stage and job.stage != stage:
+            if stage != job.name:
+                recorder.record(stage, started, (rows_by_stage or {}).get(stage, job.total))
+            stage, started = job.stage, recorder.start()
+    if job.status == "failed":
+        raise RuntimeError(f"{job.name} 작업 실패: {job.error}")
+    recorder.record(stage, started, (rows_by_stage or {}).get(stage, job.processed))
+
+
+async def product_sync(recorder: Recorder, size: int, options: dict):
+    """
+    상품목록 API 응답 size건을 동기화합니다. (최초 동기화 후 변경 없는 재동기화)
+    """
+    started = recorder.start()
+    summary = await _sync_products(size)
+    recorder.record("sync", started, size)
+    recorder.checks["inserted"] = summary.get("inserted", 0)
+
+    started = recorder.start()
+    summary = await _sync_products(size)
+    recorder.record("resync", started, size)
+    recorder.checks["resync_updated"] = summary.get("updated", 0)
+
+
+async def product_list(recorder: Recorder, size: int, options: dict):
+    """
+    상품 size건이 있을 때 GET /api/products의 응답 시간을 측정합니다. (전체/페이지/검색/초성 검색/304)
+    """
+    await _sync_products(size)
+    async with SessionLocal() as session:
+        started = recorder.start()
+        await product_index.refresh(session)
+        recorder.record("index_refresh", started, size)
+
+    requests = options["requests"]
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        etag = (await recorder.request("warmup", client, "GET", "/api/products", params={"limit": 1})).headers["ETag"]
+        started = recorder.start()
+        for i in range(requests):
+            await recorder.request("page", client, "GET", "/api/products", params={"offset": i * 100 % max(size, 1), "limit": 100})
+            await recorder.request("search", client, "GET", "/api/products", params={"q": f"상품 {i % 1000}", "limit": 100})
+            await recorder.request("choseong", client, "GET", "/api/products", params={"q": "ㅅㅌ", "limit": 100})
+            await recorder.request("not_modified", client, "GET", "/api/products", headers={"If-None-Match": etag})
+        recorder.record("list", started, requests * 4)
+        if size <= 10_000:
+            await recorder.request("full", client, "GET", "/api/products")
+
+
+async def dispatch(recorder: Recorder, size: int, options: dict):
+    """
+    수신자 size명 발송 건을 생성하여 적재, 쿠폰 발급, UMS_MSG 적재, (UMS 스텁 이관 후) 발송 결과 반영까지 측정합니다.
+    options["source"]가 upload이면 수신자를 CSV 파일 업로드(/api/recipient-uploads)로 전달합니다.
+    """
+    async with SessionLocal() as session:
+        product = models.Product(goods_id="G0000001", goods_name="벤치마크 상품", goods_price=1000)
+        session.add(product)
+        await session.flush()
+        product_id = product.id
+        await session.commit()
+
+    phone_numbers = _phone_numbers(size)
+    body = {
+        "client_name": "벤치마크", "event_name": f"bench-{size}", "sales_manager": "bench", "client_requester": "bench",
+        "requester_email": "bench@example.com", "product_id": product_id, "mms_title": "쿠폰",
+        "mms_content": "쿠폰이 도착했습니다.", "sender_phone": "0215990000", "dispatch_datetime": datetime.now().isoformat(),
+    }
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+        if options["source"] == "upload":
+            content = "\n".join(phone_numbers).encode()
+            upload = (await recorder.request("upload", client, "POST", "/api/recipient-uploads", files={"file": ("bench.csv", content)})).json()
+            await _wait_job(jobs.get(upload["job_id"]), recorder)
+            body["upload_id"] = upload["id"]
+        else:
+            body["recipients"] = [{"phone_number": phone_number} for phone_number in phone_numbers]
+
+        created = (await recorder.request("create_dispatch", client, "POST", "/api/dispatches", json=body)).json()
+    await _wait_job(jobs.get(created["job_id"]), recorder)
+
+    # 스케줄러 대신 예약 발송 실행을 직접 호출
+    before = set(jobs._jobs)
+    await run_due_dispatches()
+    for job_id in set(jobs._jobs) - before:
+        await _wait_job(jobs.get(job_id), recorder)
+
+    moved = await deliver_messages(ums.ums_engine)
+    started = recorder.start()
+    await run_reconcile()
+    applied = sum(entry.get("last_batch_rows", 0) for entry in reconcile_metrics.values())
+    recorder.record("reconcile", started, applied)
+
+    async with SessionLocal() as session:
+        table = models.Recipient.__table__
+        result = await session.execute(
+            select(func.count(), func.count(table.c.coupon_code), func.count(table.c.client_key), func.count(table.c.delivery_status))
+            .where(table.c.dispatch_id == created["id"])
+        )
+        recipients, issued, sent, reconciled = result.one()
+    recorder.checks.update(recipients=recipients, issued=issued, sent=sent, delivered=moved, reconciled=reconciled)
+
+
+SCENARIOS = {
+    "product_sync": (product_sync, {}),
+    "product_list": (product_list, {}),
+    "dispatch": (dispatch, {"source": "json"}),
+    "dispatch_upload": (dispatch, {"source": "upload"}),
+}
+
+
+async def run(name: str, size: int, options: dict) -> dict:
+    func_, defaults = SCENARIOS[name]
+    if database.engine.url.get_backend_name() == "sqlite":
+        # SQLite는 쓰기 연결이 하나뿐이므로 UMS_MSG 적재도 같은 엔진으로 처리합니다.
+        ums.ums_engine = database.engine
+    _setup_coufun(options.get("coufun_url"))
+    await _prepare_database()
+
+    recorder = Recorder(QueryCounter([database.engine, database.read_engine, ums.ums_engine]))
+    started = time.perf_counter()
+    try:
+        await func_(recorder, size, {**defaults, **options})
+    finally:
+        await coufun.close_coufun_client()
+    return {"scenario": name, "size": size, "seconds": round(time.perf_counter() - started, 3), **recorder.result()}
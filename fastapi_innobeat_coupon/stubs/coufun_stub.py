@@ -0,0 +1,135 @@
+"""
+오프라인 테스트/성능 측정용 쿠펀 B2C API 스텁 서버입니다.
+
+    python -m stubs.coufun_stub                # 0.0.0.0:9001
+    COUFUN_BASE_URL=http://localhost:9001/b2c_api uvicorn app.main:app
+
+환경 변수
+- STUB_LATENCY_MS: 요청당 인위적인 지연 시간 (기본 0)
+- STUB_PRODUCT_COUNT: 상품목록 API가 반환할 상품 수 (기본 100)
+"""
+import asyncio
+import itertools
+import os
+from urllib.parse import parse_qsl
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import StreamingResponse
+
+LATENCY = int(os.getenv("STUB_LATENCY_MS", "0")) / 1000
+PRODUCT_COUNT = int(os.getenv("STUB_PRODUCT_COUNT", "100"))
+
+app = FastAPI()
+_barcode_seq = itertools.count(100000000000)
+_seen_tr_ids: set[str] = set()
+# 취소된 쿠폰번호 (번호가 7로 끝나는 쿠폰은 사용된 것으로 응답)
+_cancelled: set[str] = set()
+
+
+def _coupon_status(barcode: str) -> str:
+    if barcode in _cancelled:
+        return "100"
+    return "001" if barcode.endswith("7") else "000"
+
+
+async def _params(request: Request) -> dict[str, str]:
+    body = await request.body()
+    params = dict(parse_qsl(body.decode("euc-kr")))
+    params.update(request.query_params)
+    return params
+
+
+def _xml(root: str, body: str) -> Response:
+    content = f'<?xml version="1.0" encoding="EUC-KR"?>\n<{root}>{body}</{root}>'
+    return Response(content=content.encode("euc-kr"), media_type="application/xml; charset=EUC-KR")
+
+
+def _result(code: str, msg: str) -> str:
+    return f"<RESULT_CODE>{code}</RESULT_CODE><RESULT_MSG>{msg}</RESULT_MSG>"
+
+
+def _product_info(i: int) -> str:
+    return (
+        f"<PRODUCT_INFO><CAT_ID>{i % 20:03d}</CAT_ID><GOODS_ID>G{i:07d}</GOODS_ID>"
+        f"<GOODS_NAME>스텁 상품 {i}</GOODS_NAME><GOODS_ORI_PRICE>{1000 + i}</GOODS_ORI_PRICE>"
+        f"<GOODS_PRICE>{900 + i}</GOODS_PRICE><GOODS_INFO>상품 정보</GOODS_INFO><USE_GUIDE>이용 안내</USE_GUIDE>"
+        f"<EXC_BRANCH>전국 매장</EXC_BRANCH><VALID_END_TYPE>D</VALID_END_TYPE><VALID_END_DATE>60</VALID_END_DATE>"
+        f"<SEND_TYPE>M</SEND_TYPE></PRODUCT_INFO>"
+    )
+
+
+@app.api_route("/b2c_api/coufunProduct.do", methods=["GET", "POST"])
+async def product_list(request: Request):
+    await asyncio.sleep(LATENCY)
+    count = PRODUCT_COUNT
+
+    # 상품 수가 많아도(성능 측정용 1M건 등) 응답 전체를 메모리에 만들지 않도록 1000건씩 나누어 보냅니다.
+    def body():
+        yield (
+            '<?xml version="1.0" encoding="EUC-KR"?>\n<PRODUCTLIST>'
+            + _result("00", "SUCCESS") + f"<LIST_CNT>{count}</LIST_CNT>"
+        ).encode("euc-kr")
+        for start in range(0, count, 1000):
+            yield "".join(_product_info(i) for i in range(start, min(start + 1000, count))).encode("euc-kr")
+        yield b"</PRODUCTLIST>"
+
+    return StreamingResponse(body(), media_type="application/xml; charset=EUC-KR")
+
+
+@app.post("/b2c_api/coufunCreate.do")
+async def create(request: Request):
+    params = await _params(request)
+    await asyncio.sleep(LATENCY)
+    count = int(params.get("CREATE_CNT", "0"))
+    if not 0 < count <= 10:
+        return _xml("COUFUNCREATE", _result("08", "상품수량 오류"))
+    tr_id = params.get("TR_ID", "")
+    if tr_id:
+        if tr_id in _seen_tr_ids:
+            return _xml("COUFUNCREATE", _result("12", "TR_ID 중복 오류"))
+        _seen_tr_ids.add(tr_id)
+    orders = "".join(
+        f"<ORDER_INFO><BARCODE_NUM>{next(_barcode_seq)}</BARCODE_NUM><STAMP_DUTY>인지세 없음</STAMP_DUTY></ORDER_INFO>"
+        for _ in range(count)
+    )
+    return _xml(
+        "COUFUNCREATE",
+        _result("00", "SUCCESS")
+        + f"<GOODS_ID>{params.get('GOODS_ID', '')}</GOODS_ID><TR_ID>{tr_id}</TR_ID><ORDER_CNT>{count}</ORDER_CNT>"
+        + orders,
+    )
+
+
+@app.post("/b2c_api/coufunPartAmountStatus.do")
+async def coupon_status(request: Request):
+    params = await _params(request)
+    await asyncio.sleep(LATENCY)
+    barcode = params.get("BARCODE_NUM", "")
+    if not barcode:
+        return _xml("COUFUNSEARCH", _result("99", "ERROR MESSAGE"))
+    status = _coupon_status(barcode)
+    return _xml(
+        "COUFUNSEARCH",
+        _result("00", "SUCCESS")
+        + f"<COUPON_TYPE>BARCODE</COUPON_TYPE><ORDER_DATE>20261001</ORDER_DATE><STATUS>{status}</STATUS>"
+        + f"<BARCODE_NUM>{barcode}</BARCODE_NUM><VALID_END_DATE>20261231</VALID_END_DATE>"
+        + f"<EXCHANGE_DATE>{'20261010120000' if status == '001' else ''}</EXCHANGE_DATE>"
+        + f"<CANCEL_DATE>{'20261011120000' if status == '100' else ''}</CANCEL_DATE>",
+    )
+
+
+@app.post("/b2c_api/coufunPartCancel.do")
+async def cancel(request: Request):
+    params = await _params(request)
+    await asyncio.sleep(LATENCY)
+    barcode = params.get("BARCODE_NUM", "")
+    if _coupon_status(barcode) != "000":
+        return _xml("COUFUNCANCEL", _result("99", "ERROR MESSAGE"))
+    _cancelled.add(barcode)
+    return _xml("COUFUNCANCEL", _result("00", "SUCCESS") + f"<BARCODE_NUM>{barcode}</BARCODE_NUM>")
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("STUB_PORT", "9001")))
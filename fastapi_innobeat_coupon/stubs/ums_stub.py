@@ -0,0 +1,88 @@
+"""
+오프라인 테스트/성능 측정용 LG U+ SNAP Agent 스텁입니다.
+UMS_MSG에 적재된 메시지를 발송 처리한 것처럼 월별 로그 테이블(UMS_LOG_YYYYMM)로 이관합니다.
+
+    python -m stubs.ums_stub                   # UMS_DATABASE_URL(없으면 DATABASE_URL)을 주기적으로 처리
+
+환경 변수
+- STUB_UMS_INTERVAL_SEC: 이관 주기 (기본 5)
+- STUB_UMS_FAIL_EVERY: N건마다 한 건을 실패(29003)로 처리 (기본 0: 모두 성공)
+"""
+import asyncio
+import os
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Index, MetaData, String, Table, delete, insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.future import select
+
+from app.ums import DONE_CODE_SUCCESS, ums_msg
+
+INTERVAL = float(os.getenv("STUB_UMS_INTERVAL_SEC", "5"))
+FAIL_EVERY = int(os.getenv("STUB_UMS_FAIL_EVERY", "0"))
+
+DONE_CODE_FAILED = "29003"
+
+
+def log_table(name: str) -> Table:
+    """
+    스텁이 사용하는 월별 로그 테이블. 결과 반영(reconcile)이 키셋 조회에 쓰는 (DONE_DATE, CLIENT_KEY) 인덱스를 포함합니다.
+    """
+    return Table(
+        name,
+        MetaData(),
+        Column("CLIENT_KEY", String(40), primary_key=True),
+        Column("PHONE", String(16)),
+        Column("DONE_DATE", DateTime),
+        Column("DONE_CODE", String(10)),
+        Column("DONE_CODE_DESC", String(200)),
+        Index(f"IX_{name}_DONE", "DONE_DATE", "CLIENT_KEY"),
+    )
+
+
+async def deliver_messages(engine: AsyncEngine, batch_size: int = 5000, fail_every: int = FAIL_EVERY) -> int:
+    """
+    UMS_MSG의 메시지를 batch_size건씩 이번 달 로그 테이블로 옮기고 이관한 건수를 반환합니다.
+    """
+    now = datetime.now()
+    log = log_table(f"UMS_LOG_{now:%Y%m}")
+    async with engine.begin() as conn:
+        await conn.run_sync(lambda c: log.create(c, checkfirst=True))
+
+    moved = 0
+    while True:
+        async with engine.begin() as conn:
+            result = await conn.execute(
+                select(ums_msg.c.CLIENT_KEY, ums_msg.c.PHONE).order_by(ums_msg.c.CLIENT_KEY).limit(batch_size)
+            )
+            rows = result.all()
+            if not rows:
+                break
+            done_date = datetime.now().replace(microsecond=0)
+            await conn.execute(insert(log), [
+                {
+                    "CLIENT_KEY": row.CLIENT_KEY,
+                    "PHONE": row.PHONE,
+                    "DONE_DATE": done_date,
+                    "DONE_CODE": DONE_CODE_FAILED if fail_every and (moved + i + 1) % fail_every == 0 else DONE_CODE_SUCCESS,
+                    "DONE_CODE_DESC": "",
+                }
+                for i, row in enumerate(rows)
+            ])
+            await conn.execute(delete(ums_msg).where(ums_msg.c.CLIENT_KEY.in_([row.CLIENT_KEY for row in rows])))
+        moved += len(rows)
+    return moved
+
+
+async def main():
+    from app.ums import ums_engine
+
+    while True:
+        moved = await deliver_messages(ums_engine)
+        if moved:
+            print(f"[UMS 스텁] 메시지 {moved}건 발송 처리")
+        await asyncio.sleep(INTERVAL)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -212,68 +212,54 @@ document.addEventListener('DOMContentLoaded', function() {
     if (excelFileInput && excelPreviewContainer && excelPreviewBody && excelRecipientCount && resetExcelFileBtn) {
         excelFileInput.addEventListener('change', async (event) => {
             const file = event.target.files[0];
-            const MAX_EXCEL_RECIPIENTS = 20000;
 
             // 파일 미선택 시 초기화
             if (!file) {
                 resetExcelUpload();
                 return;
             }
-            
-            const reader = new FileReader();
-            reader.onload = (e) => {
-                try {
-                    const data = new Uint8Array(e.target.result);
-                    const workbook = XLSX.read(data, { type: 'array' });
-                    const firstSheetName = workbook.SheetNames[0];
-                    const worksheet = workbook.Sheets[firstSheetName];
-                    const json = XLSX.utils.sheet_to_json(worksheet, { header: 1, defval: "" });
-
-                    if (json.length > MAX_EXCEL_RECIPIENTS) {
-                        alert('대량 업로드 가능 휴대폰 번호 개수는 20,000건입니다. 확인 후 재업로드 하세요.');
-                        throw new Error('Recipient count exceeded');
-                    }
-
-                    const validatedPhones = [];
-                    for (const row of json) {
-                        const originalPhone = String(row[0] || '').trim();
-                        if (originalPhone === '') continue; // 빈 행은 건너뜀
-
-                        // 규칙 2: 허용되지 않은 특수문자/공백 체크 (하이픈 제외)
-                        if (/[^0-9-]/.test(originalPhone)) throw new Error('휴대폰 번호에 허용되지 않은 문자(공백, 특수문자)가 포함되어 있습니다.');
-
-                        // 규칙 4: 하이픈 제거
-                        const phone = originalPhone.replace(/-/g, '');
-
-                        // 규칙 1: '01'로 시작하는지 체크
-                        if (!phone.startsWith('01')) throw new Error("'01'로 시작하지 않는 휴대폰 번호가 있습니다.");
-
-                        // 규칙 3: '010' 시작 시 11자리인지 체크
-                        if (phone.startsWith('010') && phone.length !== 11) throw new Error("'010'으로 시작하는 번호가 11자리가 아닙니다.");
 
-                        // (추가) 그 외 '01x' 번호는 10자리 또는 11자리인지 체크
-                        if (!phone.startsWith('010') && (phone.length < 10 || phone.length > 11)) throw new Error("휴대폰 번호의 길이가 올바르지 않습니다.");
-
-                        validatedPhones.push(phone);
-                    }
-
-                    // 모든 유효성 검사 통과 시 목록 표시
-                    excelPreviewBody.innerHTML = validatedPhones.map((phone, index) => `
-                        <tr>
-                            <td>${index + 1}</td>
-                            <td>${phone}</td>
-                        </tr>
-                    `).join('');
-                    excelRecipientCount.textContent = `총 ${validatedPhones.length}건`;
-                    excelPreviewContainer.style.display = 'block';
+            // 파일은 서버에서 행 단위로 읽어 검증/중복 제거 후 임시 저장하고, 발송 요청 시 upload_id로 지정합니다.
+            excelRecipientCount.textContent = '파일 확인 중...';
+            excelPreviewContainer.style.display = 'block';
+            try {
+                const formData = new FormData();
+                formData.append('file', file);
+                const response = await fetch('http://localhost:8089/api/recipient-uploads', {
+                    method: 'POST',
+                    body: formData,
+                });
+                let upload = await response.json();
+                if (!response.ok) throw new Error(upload.detail || '파일 업로드에 실패했습니다.');
+
+                while (upload.status === 'processing') {
+                    await new Promise(resolve => setTimeout(resolve, 1000));
+                    upload = await (await fetch(`http://localhost:8089/api/recipient-uploads/${upload.id}`)).json();
+                    excelRecipientCount.textContent = `파일 확인 중... (${upload.total_rows}행)`;
+                }
+                if (upload.status !== 'ready') throw new Error(upload.error || '파일 처리 중 오류가 발생했습니다.');
 
-                } catch (error) {
-                    // 유효성 검사 실패 또는 파일 처리 오류 시
-                    alert(error.message + '\n\n확인 후 재업로드 하세요.');
-                    resetExcelUpload();
+                // 유효하지 않은 번호가 있으면 기존과 같이 재업로드를 요청
+                if (upload.invalid_count > 0) {
+                    const samples = upload.invalid_samples.map(item => `${item.row}행: ${item.value}`).join('\n');
+                    throw new Error(`유효하지 않은 휴대폰 번호가 ${upload.invalid_count}건 있습니다.\n${samples}`);
                 }
-            };
-            reader.readAsArrayBuffer(file);
+
+                excelFileInput.dataset.uploadId = upload.id;
+                excelFileInput.dataset.recipientCount = upload.valid_count;
+                excelPreviewBody.innerHTML = `
+                    <tr>
+                        <td>-</td>
+                        <td>유효 ${upload.valid_count}건 (중복 제외 ${upload.duplicate_count}건)</td>
+                    </tr>
+                `;
+                excelRecipientCount.textContent = `총 ${upload.valid_count}건`;
+
+            } catch (error) {
+                // 유효성 검사 실패 또는 파일 처리 오류 시
+                alert(error.message + '\n\n확인 후 재업로드 하세요.');
+                resetExcelUpload();
+            }
         });
 
         // 초기화 버튼 클릭 이벤트
@@ -292,7 +278,11 @@ document.addEventListener('DOMContentLoaded', function() {
      * 엑셀 업로드 관련 UI를 초기화하는 함수
      */
     function resetExcelUpload() {
-        if (excelFileInput) excelFileInput.value = '';
+        if (excelFileInput) {
+            excelFileInput.value = '';
+            delete excelFileInput.dataset.uploadId;
+            delete excelFileInput.dataset.recipientCount;
+        }
         if (excelPreviewContainer) excelPreviewContainer.style.display = 'none';
         if (excelPreviewBody) excelPreviewBody.innerHTML = '';
         if (excelRecipientCount) excelRecipientCount.textContent = '총 0건';
@@ -458,6 +448,7 @@ document.addEventListener('DOMContentLoaded', function() {
             const activeTab = document.querySelector('#recipient-tabs .nav-link.active');
             let recipients = [];
             let recipientCount = 0;
+            let uploadId = null;
 
             if (activeTab.id === 'simple-reg-tab') {
                 const recipientListValue = document.getElementById('recipientList').value;
@@ -483,12 +474,16 @@ document.addEventListener('DOMContentLoaded', function() {
                     document.getElementById('excelFileInput').focus();
                     return;
                 }
-                // excelPreviewBody에서 전화번호 목록을 다시 읽어옴
-                const phoneCells = document.querySelectorAll('#excelPreviewBody td:nth-child(2)');
-                recipients = Array.from(phoneCells).map(cell => ({ phone_number: cell.textContent }));
+                // 서버에 업로드된 수신자 파일을 upload_id로 지정
+                const excelInput = document.getElementById('excelFileInput');
+                if (!excelInput.dataset.uploadId) {
+                    alert('대량등록(엑셀) 파일 확인이 끝나지 않았습니다.');
+                    return;
+                }
+                uploadId = parseInt(excelInput.dataset.uploadId, 10);
             }
             
-            recipientCount = recipients.length;
+            recipientCount = uploadId !== null ? parseInt(document.getElementById('excelFileInput').dataset.recipientCount, 10) : recipients.length;
             if (recipientCount === 0) {
                 alert('등록된 수신자 휴대폰 번호가 없습니다.');
                 return;
@@ -511,19 +506,31 @@ document.addEventListener('DOMContentLoaded', function() {
                     mms_title: document.getElementById('mmsTitle').value,
                     mms_content: document.getElementById('mmsContent').value,
                     sender_phone: document.getElementById('senderPhone').value,
-                    recipients: recipients
                 };
+                if (uploadId !== null) {
+                    dispatchData.upload_id = uploadId;
+                } else {
+                    dispatchData.recipients = recipients;
+                }
+
+                // 같은 발송 요청을 다시 보내도(더블클릭, 응답 지연 후 재시도) 발송 건이 하나만 생성되도록 요청 키를 함께 보냄
+                if (!dispatchIdempotencyKey) {
+                    dispatchIdempotencyKey = createIdempotencyKey();
+                }
 
                 try {
                     const response = await fetch('http://localhost:8089/api/dispatches', {
                         method: 'POST',
                         headers: {
                             'Content-Type': 'application/json',
+                            'Idempotency-Key': dispatchIdempotencyKey,
                         },
                         body: JSON.stringify(dispatchData),
                     });
 
                     if (!response.ok) {
+                        // 서버가 요청을 거절한 경우에는 발송 건이 생성되지 않았으므로 다음 요청에 새 키를 사용
+                        dispatchIdempotencyKey = null;
                         const errorData = await response.json();
                         throw new Error(errorData.detail || '알 수 없는 오류가 발생했습니다.');
                     }
@@ -559,7 +566,11 @@ function resetExcelUpload() {
     const excelPreviewBody = document.getElementById('excelPreviewBody');
     const excelRecipientCount = document.getElementById('excelRecipientCount');
 
-    if (excelFileInput) excelFileInput.value = '';
+    if (excelFileInput) {
+        excelFileInput.value = '';
+        delete excelFileInput.dataset.uploadId;
+        delete excelFileInput.dataset.recipientCount;
+    }
     if (excelPreviewContainer) excelPreviewContainer.style.display = 'none';
     if (excelPreviewBody) excelPreviewBody.innerHTML = '';
     if (excelRecipientCount) excelRecipientCount.textContent = '총 0건';
@@ -606,6 +617,20 @@ let availableProducts = [];
 // Bootstrap Modal 인스턴스를 저장할 변수
 let productModal;
 
+// 발송 요청 Idempotency-Key (발송 요청이 성공하거나 서버가 거절할 때까지 같은 키를 재사용)
+let dispatchIdempotencyKey = null;
+
+/**
+ * Idempotency-Key로 사용할 임의의 문자열을 생성합니다.
+ * crypto.randomUUID는 보안 컨텍스트(HTTPS, localhost)에서만 사용할 수 있으므로 그 외에는 시각과 난수를 조합합니다.
+ */
+function createIdempotencyKey() {
+    if (window.crypto && typeof window.crypto.randomUUID === 'function') {
+        return window.crypto.randomUUID();
+    }
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}${Math.random().toString(36).slice(2)}`;
+}
+
 /**
  * 상품 검색 버튼 클릭 시, API를 통해 상품 목록을 조회하고 모달에 표시하는 함수
  */